@@ -4,6 +4,19 @@ Analyze the fantasy hex tileset to understand its structure.
 """
 from PIL import Image
 from collections import Counter
+import argparse
+import json
+import os
+import numpy as np
+
+from sheet_stream import decode_sheet, iter_row_bands, read_sheet_rows, sheet_size
+import telemetry
+
+# Sidecar written next to each sheet; extract_fantasy_hex_tiles reads it
+LATTICE_SUFFIX = ".lattice.json"
+
+# Rows at the top of a streamed sheet the lattice is detected from
+DETECT_ROWS = 1024
 
 def analyze_image(image_path):
     """Analyze the tileset image structure."""
@@ -26,74 +39,211 @@ def analyze_image(image_path):
 
     return img
 
-def find_hex_centers(image_path):
-    """Try to find the centers of hexagonal tiles."""
-    img = Image.open(image_path).convert('RGBA')
-    width, height = img.size
+def lattice_path(image_path):
+    """Return the sidecar path holding the detected lattice for a tileset sheet."""
+    return os.path.splitext(image_path)[0] + LATTICE_SUFFIX
+
+def save_lattice(image_path, lattice):
+    """Write the lattice sidecar next to the sheet, unless it already holds this lattice."""
+    path = lattice_path(image_path)
+    text = json.dumps(lattice, indent=2, sort_keys=True) + "\n"
+    # Left alone when unchanged, so its mtime doesn't wake watchers or look like a fresh detection
+    if os.path.exists(path):
+        with open(path) as f:
+            if f.read() == text:
+                return path
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+def load_lattice(image_path):
+    """Read the lattice sidecar for a sheet, or None if it hasn't been detected yet."""
+    path = lattice_path(image_path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def lattice_centers(lattice, width, height, hex_width, hex_height):
+    """Return (rows, cols, xs, ys) of every lattice cell whose crop fits the sheet."""
+    h_spacing = lattice["h_spacing"]
+    v_spacing = lattice["v_spacing"]
+
+    # Rows stop at the first center too close to the bottom edge
+    rows = np.arange(int(height // v_spacing) + 1)
+    ys = np.rint(lattice["origin_y"] + rows * v_spacing).astype(int)
+    rows, ys = rows[ys < height - hex_height//2], ys[ys < height - hex_height//2]
+
+    # Offset every other row for hexagonal layout
+    cols = np.arange(int(width // h_spacing) + 1)
+    offsets = np.where(rows % 2 == 1, lattice["stagger"], 0)
+    xs = np.rint(lattice["origin_x"] + cols[None, :] * h_spacing + offsets[:, None]).astype(int)
+
+    rows = np.broadcast_to(rows[:, None], xs.shape).ravel()
+    cols = np.broadcast_to(cols[None, :], xs.shape).ravel()
+    ys = np.broadcast_to(ys[:, None], xs.shape).ravel()
+    xs = xs.ravel()
+
+    keep = (xs >= 0) & (xs < width - hex_width//2)
+    return rows[keep], cols[keep], xs[keep], ys[keep]
+
+def _refine_peak(values, i):
+    """Sub-pixel position of the peak at values[i] from a parabola through its neighbours."""
+    if i <= 0 or i >= len(values) - 1:
+        return float(i)
+    left, center, right = values[i - 1], values[i], values[i + 1]
+    denom = left - 2 * center + right
+    if denom >= 0:
+        return float(i)
+    return i + 0.5 * (left - right) / denom
+
+def _first_peak(profile, lo, hi):
+    """Index of the first local maximum in profile[lo:hi] that stands out from the rest."""
+    window = profile[lo:hi]
+    is_peak = (window[1:-1] > window[:-2]) & (window[1:-1] >= window[2:])
+    peaks = np.flatnonzero(is_peak) + 1
+    if len(peaks) == 0:
+        return None
+    strongest = window[peaks].max()
+    if strongest <= 0:
+        return None
+    return lo + peaks[window[peaks] >= 0.5 * strongest][0]
+
+@telemetry.traced("lattice_detection")
+def detect_hex_lattice(image_path, min_spacing=8, max_rows=None):
+    """Estimate hex spacing, origin and row stagger from the alpha mask's autocorrelation."""
+    if max_rows is not None:
+        # A window of rows from the top holds plenty of periods and bounds memory on tall sheets
+        alpha = read_sheet_rows(image_path, max_rows)[..., 3]
+    else:
+        alpha = decode_sheet(image_path)[..., 3]
+    height, width = alpha.shape
+    mask = (alpha > 128).astype(np.float64)
+
+    # Zero-padded autocorrelation of the mean-removed mask in one FFT round trip
+    centered = mask - mask.mean()
+    spectrum = np.fft.rfft2(centered, s=(2 * height, 2 * width))
+    autocorr = np.fft.irfft2(np.abs(spectrum) ** 2, s=(2 * height, 2 * width))
+    if autocorr[0, 0] <= 0:
+        return None
+    autocorr /= autocorr[0, 0]
+
+    # Horizontal spacing: first strong peak along the dy=0 axis
+    row_profile = autocorr[0, :width // 2]
+    peak_x = _first_peak(row_profile, min_spacing, width // 2)
+    if peak_x is None:
+        return None
+    h_spacing = _refine_peak(row_profile, peak_x)
+
+    # Vertical spacing: first strong peak over dy, whatever its horizontal shift
+    shifts = np.concatenate([autocorr[:height // 2, -(width // 2):], autocorr[:height // 2, :width // 2]], axis=1)
+    row_max = shifts.max(axis=1)
+    peak_y = _first_peak(row_max, min_spacing, height // 2)
+    if peak_y is None:
+        return None
+    v_spacing = _refine_peak(row_max, peak_y)
+
+    # Stagger: horizontal shift of that peak, folded into one period
+    shift_row = shifts[peak_y]
+    shift_x = _refine_peak(shift_row, int(np.argmax(shift_row))) - width // 2
+    stagger = shift_x % h_spacing
+    if min(stagger, h_spacing - stagger) < 1.0:
+        stagger = 0.0
+
+    # Origin: phase of the fundamental along each axis, rows unstaggered for x
+    ys, xs = np.nonzero(mask)
+    origin_y = (-np.angle(np.exp(-2j * np.pi * ys / v_spacing).sum()) * v_spacing / (2 * np.pi)) % v_spacing
+    row_index = np.floor((ys - origin_y + v_spacing / 2) / v_spacing)
+    unstaggered = xs - np.where(row_index % 2 == 1, stagger, 0.0)
+    origin_x = (-np.angle(np.exp(-2j * np.pi * unstaggered / h_spacing).sum()) * h_spacing / (2 * np.pi)) % h_spacing
+
+    return {
+        "h_spacing": round(float(h_spacing), 3),
+        "v_spacing": round(float(v_spacing), 3),
+        "origin_x": round(float(origin_x), 3),
+        "origin_y": round(float(origin_y), 3),
+        "stagger": round(float(stagger), 3),
+    }
+
+def _center_alpha(image_path, ys, xs, strip_rows):
+    """Alpha at each (y, x), decoding the sheet in strips and keeping only the rows holding centers."""
+    center_rows = np.unique(ys)
+    alpha = np.zeros(len(ys), dtype=np.uint8)
+    for index, row in iter_row_bands(image_path, [(y, y + 1) for y in center_rows], strip_rows):
+        in_row = ys == center_rows[index]
+        alpha[in_row] = row[0, xs[in_row], 3]
+    return alpha
+
+def find_hex_centers(image_path, stream=False):
+    """Find the centers of hexagonal tiles from the detected lattice."""
+    width, height = sheet_size(image_path)
 
     print(f"\nAnalyzing hex layout for: {image_path}")
 
-    # For hex tiles in flat-top orientation, try different spacings
-    best_centers = []
-    best_h = 0
-    best_v = 0
-
-    for h_spacing in range(28, 36):
-        for v_spacing in range(44, 52):  # Increased for flat-top hex
-            centers = []
-
-            for row in range(10):  # More rows to cover 288px height
-                y = 24 + row * v_spacing
-                if y >= height - 16:
-                    break
-
-                for col in range(10):  # More cols
-                    # Offset every other row for hexagonal layout
-                    offset = (h_spacing // 2) if row % 2 == 1 else 0
-                    x = 16 + col * h_spacing + offset
-
-                    if x >= width - 16:
-                        continue
-
-                    # Check if there's visible content here
-                    if x < width and y < height:
-                        try:
-                            pixel = img.getpixel((x, y))
-                            if pixel[3] > 128:  # Alpha > 128
-                                centers.append((x, y, row, col))
-                        except:
-                            pass
-
-            if len(centers) > len(best_centers):
-                best_centers = centers
-                best_h = h_spacing
-                best_v = v_spacing
-
-    if best_centers:
-        return best_centers, best_h, best_v
+    lattice = detect_hex_lattice(image_path, max_rows=DETECT_ROWS if stream else None)
+    if lattice is None:
+        return None, None, None
+
+    hex_width = round(lattice["h_spacing"]) - 1
+    hex_height = round(lattice["v_spacing"]) + 1
+    rows, cols, xs, ys = lattice_centers(lattice, width, height, hex_width, hex_height)
+
+    # Keep the cells with visible content at their center
+    if stream:
+        alpha = _center_alpha(image_path, ys, xs, max(1, round(lattice["v_spacing"])))
+    else:
+        alpha = decode_sheet(image_path)[ys, xs, 3]
+    occupied = alpha > 128
+    centers = [(int(x), int(y), int(row), int(col))
+               for x, y, row, col in zip(xs[occupied], ys[occupied], rows[occupied], cols[occupied])]
+
+    if centers:
+        return centers, lattice["h_spacing"], lattice["v_spacing"]
 
     return None, None, None
 
 def main():
+    parser = argparse.ArgumentParser(description="Analyze the hex tilesets and write their lattice sidecars.")
+    parser.add_argument("--stream", action="store_true",
+                        help="decode sheets in strips and detect the lattice from the top rows, for very large sheets")
+    telemetry.add_telemetry_arguments(parser)
+    args = parser.parse_args()
+    telemetry.configure_from_args(args)
+
     print("="*60)
     print("FANTASY HEX TILESET ANALYSIS")
     print("="*60)
 
     bordered_path = "godot_project/assets/fantasyhextiles_v3.png"
+    borderless_path = "godot_project/assets/fantasyhextiles_v3_borderless.png"
 
     print("\n" + "="*60)
     print("BORDERED TILESET")
     print("="*60)
-    img1 = analyze_image(bordered_path)
-    centers1, h_space1, v_space1 = find_hex_centers(bordered_path)
+    # Sampling pixels decodes the whole sheet, which streaming mode avoids
+    img1 = None if args.stream else analyze_image(bordered_path)
+    centers1, h_space1, v_space1 = find_hex_centers(bordered_path, stream=args.stream)
 
     if centers1:
         print(f"\nOptimal spacing found: h={h_space1}, v={v_space1}")
         print(f"Detected {len(centers1)} hexes")
         print("\nFirst 15 hex centers:")
         for i, (x, y, row, col) in enumerate(centers1[:15]):
-            pixel = img1.getpixel((x, y))
-            print(f"  Hex {i}: center at ({x:3d}, {y:3d}), grid (row={row}, col={col}), color=RGBA{pixel}")
+            color = f", color=RGBA{img1.getpixel((x, y))}" if img1 is not None else ""
+            print(f"  Hex {i}: center at ({x:3d}, {y:3d}), grid (row={row}, col={col}){color}")
+
+    # Record the lattice for the extractor
+    print("\n" + "="*60)
+    print("LATTICE SIDECARS")
+    print("="*60)
+    for path in [bordered_path, borderless_path]:
+        if not os.path.exists(path):
+            continue
+        lattice = detect_hex_lattice(path, max_rows=DETECT_ROWS if args.stream else None)
+        if lattice is None:
+            print(f"  No lattice found in {path}")
+            continue
+        print(f"  {save_lattice(path, lattice)}: {lattice}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+A persistent SQLite catalog of every terrain tile the pipeline produces.
+
+One row per tile file of every tileset style, full size and each lod<size>/
+level: its style, terrain, variant, river flag and level, dimensions, content
+hash, the script that wrote it and the sheet cell it came from (recorded in
+the build cache by the extractors), the variant dedupe_tiles.py redirected it
+to, and pixel statistics (dominant color and alpha coverage). Rows are only
+re-hashed and re-decoded when a file's size or mtime changed, and only rows
+that differ are written, so updating the catalog after a pipeline run costs a
+directory listing per level.
+
+Tools query it through AssetCatalog instead of building paths and probing
+for files:
+
+    catalog = AssetCatalog()
+    catalog.variants("fantasy_bordered", "grass")    # every variant, in order
+    catalog.missing(["fantasy_bordered"])            # (style, terrain) with no tile
+    catalog.pick("fantasy_bordered", "lava", lod=32) # a path, falling back like the game
+"""
+import argparse
+import json
+import os
+import sqlite3
+import numpy as np
+from PIL import Image
+
+from build_cache import CACHE_FILENAME, hash_file
+from lod_pyramid import LOD_SIZES, lod_dir
+from pack_tile_atlas import load_redirects, parse_tile_name
+from parallel import add_workers_argument, parallel_map, resolve_workers
+from terrain_types import ALLOWS_RIVERS, TERRAIN_NAMES, TILESET_STYLES
+import telemetry
+
+CATALOG_PATH = "godot_project/assets/asset_catalog.sqlite"
+SCHEMA_VERSION = 1  # Bump when the columns change; older catalogs are rebuilt
+DOMINANT_BITS = 4  # Bits per channel when binning colors for the dominant color
+MIN_ALPHA = 128  # Pixels at least this opaque count as covered
+
+SCHEMA = """
+CREATE TABLE tiles (
+    path TEXT PRIMARY KEY,
+    style TEXT NOT NULL,
+    terrain TEXT NOT NULL,
+    terrain_id INTEGER NOT NULL,
+    variant INTEGER NOT NULL,
+    river INTEGER NOT NULL,
+    lod INTEGER,                -- Level size in pixels; NULL for the full-size tiles
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    file_size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    producer TEXT,              -- Script whose build cache holds these bytes; NULL for hand-made art
+    source_sheet TEXT,
+    source_row INTEGER,
+    source_col INTEGER,
+    duplicate_of TEXT,          -- File name dedupe_tiles.py redirects this variant to
+    dominant_r INTEGER,
+    dominant_g INTEGER,
+    dominant_b INTEGER,
+    dominant_share REAL,        -- Share of the covered pixels in the dominant color's bin
+    alpha_coverage REAL NOT NULL
+);
+CREATE INDEX tiles_by_terrain ON tiles (style, terrain, lod, river, variant);
+CREATE INDEX tiles_by_hash ON tiles (content_hash);
+"""
+COLUMNS = ["path", "style", "terrain", "terrain_id", "variant", "river", "lod", "width", "height", "content_hash",
+           "file_size", "mtime_ns", "producer", "source_sheet", "source_row", "source_col", "duplicate_of",
+           "dominant_r", "dominant_g", "dominant_b", "dominant_share", "alpha_coverage"]
+STATS = ["width", "height", "content_hash", "dominant_r", "dominant_g", "dominant_b", "dominant_share",
+         "alpha_coverage"]
+
+def connect(path=CATALOG_PATH):
+    """Open the catalog, creating or rebuilding its table if it is missing or from another schema version."""
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    if db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        db.executescript("DROP TABLE IF EXISTS tiles;" + SCHEMA + f"PRAGMA user_version = {SCHEMA_VERSION};")
+    return db
+
+def level_dirs(style_dir):
+    """(directory, level size or None) of a style's full-size tiles and each LOD level on disk."""
+    return [(style_dir, None)] + [(lod_dir(style_dir, size), size) for size in LOD_SIZES
+                                  if os.path.isdir(lod_dir(style_dir, size))]
+
+def load_manifest(directory):
+    """A directory's build cache manifest, or {} if it has none."""
+    path = os.path.join(directory, CACHE_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def tile_stats(path):
+    """Dimensions, content hash, dominant color and alpha coverage of one tile file."""
+    with Image.open(path) as img:
+        pixels = np.asarray(img.convert('RGBA'))
+    covered = pixels[..., 3] >= MIN_ALPHA
+    stats = {"width": pixels.shape[1], "height": pixels.shape[0], "content_hash": hash_file(path),
+             "alpha_coverage": float(covered.mean()), "dominant_r": None, "dominant_g": None, "dominant_b": None,
+             "dominant_share": None}
+    if covered.any():
+        # The most common color bin, reported as the mean color of the pixels in it
+        rgb = pixels[covered][:, :3]
+        shift = 8 - DOMINANT_BITS
+        bins = (rgb[:, 0] >> shift).astype(np.int32) << (2 * DOMINANT_BITS) | \
+            (rgb[:, 1] >> shift).astype(np.int32) << DOMINANT_BITS | (rgb[:, 2] >> shift)
+        counts = np.bincount(bins)
+        dominant = int(np.argmax(counts))
+        mean = rgb[bins == dominant].mean(axis=0)
+        stats.update(dominant_r=int(round(mean[0])), dominant_g=int(round(mean[1])), dominant_b=int(round(mean[2])),
+                     dominant_share=float(counts[dominant] / len(rgb)))
+    return stats
+
+def scan_tiles():
+    """{path: row without stats} of every terrain tile file of every style and level."""
+    found = {}
+    for style, style_dir in TILESET_STYLES.items():
+        redirects = load_redirects(style_dir)
+        # Where each tile came from is recorded once, beside the full-size tile
+        sources = {filename: entry["source"] for section in load_manifest(style_dir).values()
+                   for filename, entry in section.get("outputs", {}).items() if "source" in entry}
+        for directory, lod in level_dirs(style_dir):
+            if not os.path.isdir(directory):
+                continue
+            producers = {(filename, entry["hash"]): producer for producer, section in load_manifest(directory).items()
+                         for filename, entry in section.get("outputs", {}).items()}
+            for filename in sorted(os.listdir(directory)):
+                stem, ext = os.path.splitext(filename)
+                parsed = parse_tile_name(stem) if ext == ".png" else None
+                if parsed is None:
+                    continue
+                terrain_id, variant, river = parsed
+                path = os.path.join(directory, filename)
+                stat = os.stat(path)
+                source = sources.get(filename, {})
+                found[path] = {"path": path, "style": style, "terrain": TERRAIN_NAMES[terrain_id],
+                               "terrain_id": terrain_id, "variant": variant, "river": int(river), "lod": lod,
+                               "file_size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                               "source_sheet": source.get("sheet"), "source_row": source.get("row"),
+                               "source_col": source.get("col"), "duplicate_of": redirects.get(filename),
+                               "producers": producers}
+    return found
+
+def update_catalog(path=CATALOG_PATH, workers=1):
+    """Bring the catalog in line with the tiles on disk; returns (tiles, re-read)."""
+    db = connect(path)
+    known = {row["path"]: row for row in db.execute("SELECT * FROM tiles")}
+    rows = scan_tiles()
+
+    # Only files whose size or mtime moved are hashed and decoded again
+    changed = [tile_path for tile_path, row in rows.items() if tile_path not in known or
+               (known[tile_path]["file_size"], known[tile_path]["mtime_ns"]) != (row["file_size"], row["mtime_ns"])]
+    with telemetry.span("tile_stats"):
+        stats = dict(zip(changed, parallel_map(tile_stats, changed, workers)))
+    for tile_path, row in rows.items():
+        row.update(stats[tile_path] if tile_path in stats else {column: known[tile_path][column] for column in STATS})
+        # The producer is the script whose recorded hash these bytes still match; hand-made and hand-edited have none
+        row["producer"] = row.pop("producers").get((os.path.basename(tile_path), row["content_hash"]))
+
+    # Only rows that differ are written and only vanished files deleted; an unchanged tree touches nothing
+    upserts = [[row[column] for column in COLUMNS] for tile_path, row in rows.items()
+               if tile_path not in known or any(row[column] != known[tile_path][column] for column in COLUMNS)]
+    vanished = [(tile_path,) for tile_path in known if tile_path not in rows]
+    if upserts or vanished:
+        with db:
+            db.executemany("DELETE FROM tiles WHERE path = ?", vanished)
+            db.executemany(f"INSERT OR REPLACE INTO tiles ({', '.join(COLUMNS)}) "
+                           f"VALUES ({', '.join('?' * len(COLUMNS))})", upserts)
+    db.close()
+    return len(rows), len(changed)
+
+class AssetCatalog:
+    """Queries over the tile catalog written by update_catalog()."""
+
+    def __init__(self, path=CATALOG_PATH):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found; run asset_catalog.py first")
+        self.db = connect(path)
+
+    def close(self):
+        self.db.close()
+
+    def tiles(self, **where):
+        """Rows matching column=value filters (lod=None matches full-size tiles), ordered by path."""
+        clauses = [f"{column} IS ?" for column in where]
+        sql = "SELECT * FROM tiles" + (" WHERE " + " AND ".join(clauses) if clauses else "") + " ORDER BY path"
+        return self.db.execute(sql, list(where.values())).fetchall()
+
+    def variants(self, style, terrain, lod=None, river=False, include_duplicates=False):
+        """A style's tiles of one terrain at one level, in variant order, without redirected duplicates."""
+        rows = self.db.execute("SELECT * FROM tiles WHERE style = ? AND terrain = ? AND lod IS ? AND river = ? "
+                               "ORDER BY variant", (style, terrain, lod, int(river))).fetchall()
+        return [row for row in rows if include_duplicates or row["duplicate_of"] is None]
+
+    def missing(self, styles=None, lod=None, river=False):
+        """(style, terrain) pairs with no tile of their own at a level; river=True checks the ALLOWS_RIVERS terrains."""
+        styles = list(TILESET_STYLES) if styles is None else styles
+        terrains = [TERRAIN_NAMES[terrain_id] for terrain_id in (ALLOWS_RIVERS if river else TERRAIN_NAMES)]
+        present = set(map(tuple, self.db.execute(
+            "SELECT DISTINCT style, terrain FROM tiles WHERE lod IS ? AND river = ?", (lod, int(river))).fetchall()))
+        return [(style, terrain) for style in styles for terrain in terrains if (style, terrain) not in present]
+
+    def pick(self, style, terrain, variant=0, lod=None, river=False):
+        """Path of a tile, falling back to the original art's variant 0 (full size for a lod) like the game does."""
+        # The original art has no lod levels, so a level falls back to its full-size tile
+        candidates = [(style, variant, lod), ("original", 0, lod)] + ([("original", 0, None)] if lod else [])
+        for candidate_style, candidate_variant, candidate_lod in candidates:
+            row = self.db.execute("SELECT path FROM tiles WHERE style = ? AND terrain = ? AND variant = ? AND lod IS ? "
+                                  "AND river = ?", (candidate_style, terrain, candidate_variant, candidate_lod,
+                                                    int(river))).fetchone()
+            if row is not None:
+                return row["path"]
+        return None
+
+    def same_content(self, content_hash):
+        """Paths of every tile with exactly these bytes."""
+        return [row["path"] for row in self.db.execute("SELECT path FROM tiles WHERE content_hash = ? ORDER BY path",
+                                                       (content_hash,))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Update and query the catalog of generated terrain tiles.")
+    parser.add_argument("--catalog", default=CATALOG_PATH, help=f"catalog path (default {CATALOG_PATH})")
+    parser.add_argument("--missing", action="store_true", help="list (style, terrain) pairs with no tile")
+    parser.add_argument("--variants", metavar="TERRAIN", help="list every style's variants of a terrain")
+    add_workers_argument(parser)
+    telemetry.add_telemetry_arguments(parser)
+    args = parser.parse_args()
+    telemetry.configure_from_args(args)
+
+    print("=" * 70)
+    print("ASSET CATALOG")
+    print("=" * 70)
+
+    tiles, reread = update_catalog(args.catalog, resolve_workers(args.workers))
+    print(f"{args.catalog}: {tiles} tiles ({reread} re-read)")
+
+    catalog = AssetCatalog(args.catalog)
+    if args.missing:
+        for river in (False, True):
+            gaps = catalog.missing(river=river)
+            print(f"\nMissing {'river ' if river else ''}tiles: {len(gaps)}")
+            for style, terrain in gaps:
+                print(f"  {style:20s} {terrain}")
+    if args.variants:
+        for style in TILESET_STYLES:
+            rows = catalog.variants(style, args.variants)
+            print(f"\n{style}: {len(rows)} variant(s) of {args.variants}")
+            for row in rows:
+                source = f" from {row['source_sheet']} ({row['source_row']}, {row['source_col']})" \
+                    if row["source_sheet"] else ""
+                print(f"  {row['variant']:2d} {row['path']} by {row['producer'] or 'hand'}"
+                      f", RGB({row['dominant_r']},{row['dominant_g']},{row['dominant_b']}){source}")
+    catalog.close()
+
+    print("\n" + "=" * 70)
+    print("Done")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
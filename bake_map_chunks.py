@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Bake zoomed-out chunk textures of baked worlds.
+
+Zoomed far out, world_map.gd's TileMap still draws every 16px hex as its own
+cell. This composites a tileset style's art over each .world file the way the
+TileMap lays it out (render_minimaps.render_overview: stacked on the vertical
+offset axis, odd columns half a tile down, columns 3/4 of a tile apart), cuts
+the image into chunks of --chunk x --chunk cells and writes every chunk at
+each zoom level, each level half the size of the one before. A far zoom level
+can then draw a handful of chunk quads instead of thousands of cells.
+
+Hexes of neighboring rows and columns overlap, so chunks are cut on a
+rectangular pixel grid rather than along cell edges: chunk (cx, cy) owns the
+pixels from cell (cx * chunk, cy * chunk)'s tile corner to the next chunk's,
+and the last chunk of each row and column runs to the image edge. Chunks never
+overlap, so drawn side by side they reproduce the full overview exactly; fully
+transparent chunks are left out.
+
+Each world and style gets a directory under chunks/ beside the worlds with the
+chunk PNGs and index.json, which lists for every chunk its cell range, its
+rect in level-0 pixels (with (0, 0) the top-left corner of cell (0, 0)'s tile)
+and its file at each level.
+"""
+import argparse
+import glob
+import json
+import os
+import numpy as np
+
+import render_minimaps
+import world_format
+from bake_worlds import OUTPUT_DIR
+from build_cache import BuildCache, code_version, encode_png, hash_bytes, hash_file
+from lod_pyramid import LOD_CODE_VERSION, downsample_half
+from parallel import add_workers_argument, parallel_map, resolve_workers
+from render_minimaps import COLUMN_SPACING, render_overview, style_inputs_key
+from terrain_types import TILE_SIZE, TILESET_STYLES
+from world_format import WORLD_EXTENSION, read_world
+
+CODE_VERSION = hash_bytes(code_version(render_minimaps.__file__), code_version(world_format.__file__),
+                          code_version(__file__))[:16]
+
+CHUNKS_DIRNAME = "chunks"
+INDEX_FILENAME = "index.json"
+DEFAULT_CHUNK = 32  # Cells per chunk side
+DEFAULT_LEVELS = 4  # Zoom levels: full size, 1/2, 1/4 and 1/8
+
+def chunk_dir(world_path, style):
+    """Directory of one world's chunks in one style."""
+    stem = os.path.splitext(os.path.basename(world_path))[0]
+    return os.path.join(os.path.dirname(world_path), CHUNKS_DIRNAME, f"{stem}_{style}")
+
+def chunk_filename(cx, cy, level):
+    """File name of one chunk at one zoom level."""
+    return f"chunk_{cx}_{cy}_z{level}.png"
+
+def check_chunk(chunk, levels):
+    """Raise ValueError unless every chunk edge lands on a whole pixel at every level."""
+    factor = 1 << (levels - 1)
+    if chunk < 1 or (chunk * COLUMN_SPACING) % factor or (chunk * TILE_SIZE) % factor:
+        raise ValueError(f"a {chunk}-cell chunk is {chunk * COLUMN_SPACING}x{chunk * TILE_SIZE} px, "
+                         f"which doesn't halve evenly {levels - 1} time(s)")
+
+def chunk_edges(cells, chunk, step, end):
+    """Pixel edges of the chunks along one axis: a chunk every `chunk` cells, the last one running to `end`."""
+    count = -(-cells // chunk)
+    return [index * chunk * step for index in range(count)] + [end]
+
+def bake_chunks(job):
+    """Composite one world in one style and cut it into chunks; returns ({filename: PNG bytes}, index)."""
+    world_path, style, chunk, levels = job
+    _, arrays = read_world(world_path)
+    canvas = render_overview(arrays, style)
+    height, width = arrays["terrain"].shape
+
+    # Padded with transparency so every level halves evenly
+    factor = 1 << (levels - 1)
+    padded = np.zeros((-(-canvas.shape[0] // factor) * factor, -(-canvas.shape[1] // factor) * factor, 4),
+                      dtype=np.uint8)
+    padded[:canvas.shape[0], :canvas.shape[1]] = canvas
+    pyramid = [padded]
+    for _ in range(levels - 1):
+        pyramid.append(downsample_half(pyramid[-1][None])[0])
+
+    xs = chunk_edges(width, chunk, COLUMN_SPACING, padded.shape[1])
+    ys = chunk_edges(height, chunk, TILE_SIZE, padded.shape[0])
+    images = {}
+    chunks = []
+    for cy in range(len(ys) - 1):
+        for cx in range(len(xs) - 1):
+            left, right, top, bottom = xs[cx], xs[cx + 1], ys[cy], ys[cy + 1]
+            if not padded[top:bottom, left:right, 3].any():
+                continue
+            files = []
+            for level, image in enumerate(pyramid):
+                scale = 1 << level
+                filename = chunk_filename(cx, cy, level)
+                images[filename] = encode_png(image[top // scale:bottom // scale, left // scale:right // scale])
+                files.append(filename)
+            chunks.append({
+                "chunk": [cx, cy],
+                "cells": [cx * chunk, cy * chunk, min(width, (cx + 1) * chunk), min(height, (cy + 1) * chunk)],
+                "rect": [left, top, right - left, bottom - top],
+                "files": files,
+            })
+
+    index = {
+        "world": os.path.basename(world_path),
+        "style": style,
+        "cells": [width, height],
+        "chunk_cells": chunk,
+        "tile_size": TILE_SIZE,
+        "column_spacing": COLUMN_SPACING,
+        "size": [canvas.shape[1], canvas.shape[0]],
+        "levels": [1 / (1 << level) for level in range(levels)],
+        "chunks": chunks,
+    }
+    return images, index
+
+def main():
+    parser = argparse.ArgumentParser(description="Bake zoomed-out chunk textures of baked worlds.")
+    parser.add_argument("worlds", nargs="*", help=f"world files (default: every {WORLD_EXTENSION} in {OUTPUT_DIR})")
+    parser.add_argument("--styles", nargs="+", choices=list(TILESET_STYLES), default=["original"], metavar="STYLE",
+                        help="tileset styles to bake (default original)")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK,
+                        help=f"cells per chunk side (default {DEFAULT_CHUNK})")
+    parser.add_argument("--levels", type=int, default=DEFAULT_LEVELS,
+                        help=f"zoom levels, each half the size of the last (default {DEFAULT_LEVELS})")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+    if args.levels < 1:
+        parser.error("--levels must be at least 1")
+    try:
+        check_chunk(args.chunk, args.levels)
+    except ValueError as error:
+        parser.error(str(error))
+
+    print("=" * 70)
+    print("MAP CHUNK BAKER")
+    print("=" * 70)
+
+    worlds = args.worlds or sorted(glob.glob(os.path.join(OUTPUT_DIR, "*" + WORLD_EXTENSION)))
+    if not worlds:
+        print("No worlds found; bake some with bake_worlds.py first")
+        return
+
+    style_keys = {style: style_inputs_key(style) for style in args.styles}
+    jobs = []
+    for world_path in worlds:
+        world_key = hash_file(world_path)
+        for style in args.styles:
+            output_dir = chunk_dir(world_path, style)
+            os.makedirs(output_dir, exist_ok=True)
+            cache = BuildCache(output_dir, "bake_map_chunks")
+            inputs_key = hash_bytes(CODE_VERSION, LOD_CODE_VERSION, world_key, style_keys[style],
+                                    args.chunk, args.levels)
+            if cache.inputs_unchanged(inputs_key):
+                cache.finish(inputs_key)
+                continue
+            jobs.append((world_path, style, cache, inputs_key))
+    print(f"{len(jobs)} of {len(worlds) * len(args.styles)} world/style pair(s) need chunks")
+
+    work = [(world_path, style, args.chunk, args.levels) for world_path, style, _, _ in jobs]
+    written = 0
+    for (world_path, style, cache, inputs_key), (images, index) in zip(
+            jobs, parallel_map(bake_chunks, work, resolve_workers(args.workers))):
+        for filename, data in images.items():
+            written += cache.write(filename, inputs_key, data)
+        data = (json.dumps(index, indent=2) + "\n").encode()
+        written += cache.write(INDEX_FILENAME, inputs_key, data)
+        # Chunks of an earlier chunk size or level count are removed
+        cache.finish(inputs_key)
+        print(f"  {os.path.basename(world_path)} ({style}): {len(index['chunks'])} chunks "
+              f"at {args.levels} level(s), {index['size'][0]}x{index['size'][1]} px")
+
+    print("\n" + "=" * 70)
+    print(f"Done: {written} file(s) written")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Precompute hierarchical pathfinding tables for baked worlds.
+
+For each .world file written by bake_worlds.py this writes a .paths file
+beside it (see path_abstraction.py) with the cluster entrances, the
+entrance-to-entrance cost table of every cluster, and each civ's distance
+field to its capital. --check runs random queries through the hierarchical
+search and a plain A* and reports how they compare, failing if any path costs
+more than MAX_COST_RATIO times the optimum.
+"""
+import argparse
+import glob
+import os
+import random
+import time
+import numpy as np
+
+import path_abstraction
+import world_format
+from bake_worlds import OUTPUT_DIR
+from build_cache import BuildCache, code_version, hash_bytes, hash_file
+from parallel import add_workers_argument, parallel_map, resolve_workers
+from path_abstraction import (CLUSTER_SIZE, DISTANCE_QUANTUM, INF, PATHS_EXTENSION, HierarchicalPathfinder,
+                              build_abstraction, capital_distance_field, capital_distance_fields, decode_paths,
+                              encode_paths, find_path, movement_cost_grid, path_cost, walk_to_capital)
+from world_format import WORLD_EXTENSION, read_world
+
+CODE_VERSION = hash_bytes(code_version(path_abstraction.__file__), code_version(world_format.__file__),
+                          code_version(__file__))[:16]
+
+# --check fails if a hierarchical path costs more than this times the A* optimum
+MAX_COST_RATIO = 1.1
+
+def paths_filename(world_path):
+    """The .paths file that goes with a .world file."""
+    return os.path.splitext(os.path.basename(world_path))[0] + PATHS_EXTENSION
+
+def capitals_of(header):
+    """Civ capitals from a world header, in civ id order."""
+    return [tuple(header["civ_capitals"][civ]) for civ in sorted(header["civ_capitals"], key=int)]
+
+def bake_paths(job):
+    """Build and encode the pathfinding tables of one world file."""
+    world_path, cluster_size = job
+    header, arrays = read_world(world_path)
+    cost = movement_cost_grid(header, arrays["terrain"])
+    abstraction = build_abstraction(cost, cluster_size)
+    fields = capital_distance_fields(cost, capitals_of(header))
+    return encode_paths(header, abstraction, fields, hash_file(world_path))
+
+def check_paths(world_path, paths_path, queries, seed=0):
+    """Compare hierarchical queries and capital walks against plain A*; returns the worst cost ratio."""
+    header, arrays = read_world(world_path)
+    cost = movement_cost_grid(header, arrays["terrain"])
+    with open(paths_path, "rb") as f:
+        paths_header, paths_arrays = decode_paths(f.read())
+    pathfinder = HierarchicalPathfinder(cost, paths_header, paths_arrays)
+
+    rng = random.Random(seed)
+    ys, xs = np.nonzero(np.isfinite(cost))
+    tiles = list(zip(xs.tolist(), ys.tolist()))
+    ratios = []
+    hierarchical_time = astar_time = 0.0
+    for _ in range(queries):
+        start, goal = rng.choice(tiles), rng.choice(tiles)
+        began = time.perf_counter()
+        _, reference = find_path(cost, start, goal)
+        astar_time += time.perf_counter() - began
+        began = time.perf_counter()
+        _, found = pathfinder.find_path(start, goal)
+        hierarchical_time += time.perf_counter() - began
+        if (reference == INF) != (found == INF):
+            raise AssertionError(f"{start} -> {goal}: A* cost {reference}, hierarchical cost {found}")
+        if 0 < reference < INF:
+            ratios.append(found / reference)
+
+    for civ, capital in enumerate(capitals_of(header)):
+        start = rng.choice(tiles)
+        _, reference = find_path(cost, start, capital)
+        walk = walk_to_capital(cost, capital_distance_field(paths_header, paths_arrays, civ), start)
+        # Exact at the finest step; a coarser one may pay up to a step more per tile
+        step = paths_header["capital_distance_steps"][civ]
+        slack = 1e-6 if step <= DISTANCE_QUANTUM else len(walk) * step
+        if (reference == INF) != (not walk) or (walk and not -1e-6 <= path_cost(cost, walk) - reference <= slack):
+            raise AssertionError(f"civ {civ}: walk to the capital from {start} disagrees with A*")
+
+    worst = max(ratios, default=1.0)
+    print(f"  {os.path.basename(world_path)}: {len(ratios)} paths, cost vs A* mean {np.mean(ratios or [1.0]):.3f} "
+          f"worst {worst:.3f}, query time {hierarchical_time:.2f}s vs {astar_time:.2f}s")
+    if worst > MAX_COST_RATIO:
+        raise AssertionError(f"{os.path.basename(world_path)}: a path costs {worst:.3f}x the optimum, "
+                             f"over the {MAX_COST_RATIO} bound")
+    return worst
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute hierarchical pathfinding tables for baked worlds.")
+    parser.add_argument("worlds", nargs="*", help=f"world files (default: every {WORLD_EXTENSION} in {OUTPUT_DIR})")
+    parser.add_argument("--cluster-size", type=int, default=CLUSTER_SIZE,
+                        help=f"cluster side in tiles, even (default {CLUSTER_SIZE})")
+    parser.add_argument("--check", type=int, default=0, metavar="N",
+                        help="after baking, compare N random queries per world against plain A*")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("HIERARCHICAL PATHFINDING PRECOMPUTE")
+    print("=" * 70)
+
+    worlds = args.worlds or sorted(glob.glob(os.path.join(OUTPUT_DIR, "*" + WORLD_EXTENSION)))
+    if not worlds:
+        print("No worlds found; bake some with bake_worlds.py first")
+        return
+
+    # Tables live beside their worlds, one build cache per directory
+    stale = []
+    caches = {}
+    for world_path in worlds:
+        directory = os.path.dirname(world_path) or "."
+        cache = caches.setdefault(directory, BuildCache(directory, "bake_paths"))
+        key = hash_bytes(CODE_VERSION, hash_file(world_path), args.cluster_size)
+        if not cache.keep(paths_filename(world_path), key):
+            stale.append((world_path, cache, key))
+    print(f"{len(stale)} of {len(worlds)} world(s) need tables")
+
+    jobs = [(world_path, args.cluster_size) for world_path, _, _ in stale]
+    for (world_path, cache, key), data in zip(stale, parallel_map(bake_paths, jobs, resolve_workers(args.workers))):
+        cache.store(paths_filename(world_path), key, data)
+        print(f"  Wrote {paths_filename(world_path)} ({len(data) / 1024:.1f} KiB)")
+    for cache in caches.values():
+        cache.finish(prune=False)
+
+    if args.check:
+        print(f"\nChecking {args.check} random queries per world against plain A*")
+        for world_path in worlds:
+            paths_path = os.path.join(os.path.dirname(world_path), paths_filename(world_path))
+            check_paths(world_path, paths_path, args.check)
+
+    print("\n" + "=" * 70)
+    print("Pathfinding tables up to date")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Precompute nearest-resource fields for baked worlds.
+
+For each .world file written by bake_worlds.py this writes a .resources file
+beside it (see resource_fields.py) holding, for each resource group, every
+tile's nearest deposit by movement cost and the cost to reach it. --check
+empties random deposits one after another, repairs the fields with
+remove_deposit() and compares them against fields computed from scratch
+without those deposits.
+"""
+import argparse
+import glob
+import os
+import random
+import time
+import numpy as np
+
+import path_abstraction
+import resource_fields
+import world_format
+from bake_worlds import OUTPUT_DIR
+from build_cache import BuildCache, code_version, hash_bytes, hash_file
+from parallel import add_workers_argument, parallel_map, resolve_workers
+from path_abstraction import movement_cost_grid
+from resource_fields import (FIELDS_EXTENSION, RESOURCE_GROUPS, build_resource_fields, decode_fields, encode_fields,
+                             nearest_deposit_field, remove_deposit)
+from world_format import WORLD_EXTENSION, read_world
+
+CODE_VERSION = hash_bytes(code_version(resource_fields.__file__), code_version(path_abstraction.__file__),
+                          code_version(world_format.__file__), code_version(__file__))[:16]
+
+def fields_filename(world_path):
+    """The .resources file that goes with a .world file."""
+    return os.path.splitext(os.path.basename(world_path))[0] + FIELDS_EXTENSION
+
+def bake_fields(world_path):
+    """Build and encode the nearest-resource fields of one world file."""
+    header, arrays = read_world(world_path)
+    cost = movement_cost_grid(header, arrays["terrain"])
+    return encode_fields(header, build_resource_fields(header, arrays, cost), hash_file(world_path))
+
+def check_fields(world_path, fields_path, removals, seed=0):
+    """Empty random deposits, repairing the stored fields each time, and compare with a fresh computation."""
+    header, arrays = read_world(world_path)
+    cost = movement_cost_grid(header, arrays["terrain"])
+    with open(fields_path, "rb") as f:
+        _, fields = decode_fields(f.read())
+
+    rng = random.Random(seed)
+    for group in RESOURCE_GROUPS:
+        deposits = fields[f"{group}_deposits"].astype(np.intp)
+        nearest = fields[f"{group}_nearest"].copy()
+        distance = fields[f"{group}_distance"].astype(np.float64)
+        removed = rng.sample(range(len(deposits)), min(removals, len(deposits)))
+        began = time.perf_counter()
+        tiles = sum(remove_deposit(cost, nearest, distance, deposit) for deposit in removed)
+        repair_time = time.perf_counter() - began
+
+        began = time.perf_counter()
+        kept = np.setdiff1d(np.arange(len(deposits)), removed)
+        reference_nearest, reference = nearest_deposit_field(cost, deposits[kept])
+        rebuild_time = time.perf_counter() - began
+        # Ties may go to a different deposit, so the costs are compared, and the ids only checked for validity
+        if not np.allclose(distance, reference.astype(np.float32).astype(np.float64), rtol=1e-5) or \
+                np.isin(nearest, removed).any() or ((nearest < 0) != (reference_nearest < 0)).any():
+            raise AssertionError(f"{os.path.basename(world_path)} {group}: repaired fields differ from a rebuild")
+        print(f"  {os.path.basename(world_path)} {group}: {len(deposits)} deposits, emptied {len(removed)} "
+              f"re-resolving {tiles} tiles in {repair_time:.3f}s (rebuild {rebuild_time:.3f}s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute nearest-resource fields for baked worlds.")
+    parser.add_argument("worlds", nargs="*", help=f"world files (default: every {WORLD_EXTENSION} in {OUTPUT_DIR})")
+    parser.add_argument("--check", type=int, default=0, metavar="N",
+                        help="after baking, empty N random deposits per group and compare against a rebuild")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("NEAREST-RESOURCE FIELDS PRECOMPUTE")
+    print("=" * 70)
+
+    worlds = args.worlds or sorted(glob.glob(os.path.join(OUTPUT_DIR, "*" + WORLD_EXTENSION)))
+    if not worlds:
+        print("No worlds found; bake some with bake_worlds.py first")
+        return
+
+    # Fields live beside their worlds, one build cache per directory
+    stale = []
+    caches = {}
+    for world_path in worlds:
+        directory = os.path.dirname(world_path) or "."
+        cache = caches.setdefault(directory, BuildCache(directory, "bake_resource_fields"))
+        key = hash_bytes(CODE_VERSION, hash_file(world_path))
+        if not cache.keep(fields_filename(world_path), key):
+            stale.append((world_path, cache, key))
+    print(f"{len(stale)} of {len(worlds)} world(s) need fields")
+
+    jobs = [world_path for world_path, _, _ in stale]
+    for (world_path, cache, key), data in zip(stale, parallel_map(bake_fields, jobs, resolve_workers(args.workers))):
+        cache.store(fields_filename(world_path), key, data)
+        print(f"  Wrote {fields_filename(world_path)} ({len(data) / 1024:.1f} KiB)")
+    for cache in caches.values():
+        cache.finish(prune=False)
+
+    if args.check:
+        print(f"\nEmptying {args.check} random deposits per group and comparing against a rebuild")
+        for world_path in worlds:
+            check_fields(world_path, os.path.join(os.path.dirname(world_path), fields_filename(world_path)), args.check)
+
+    print("\n" + "=" * 70)
+    print("Nearest-resource fields up to date")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Pre-bake worlds offline with the same rules as WorldGenerator.
+
+Each seed is generated by world_generator.py (a vectorized port of
+world_generator.gd) and written as a compact .world file (see world_format.py)
+holding terrain ids, river flags, civ ownership, landmarks, elevation, movement
+costs and resource amounts. Curated seeds can ship pre-generated, and QA can
+bake hundreds of seeds across processes. Worlds already baked by the current
+code for the same size and seed are left alone.
+"""
+import argparse
+import os
+import re
+
+import fast_noise
+import godot_rng
+import world_format
+import world_generator
+from build_cache import BuildCache, code_version, hash_bytes
+from parallel import add_workers_argument, parallel_map, resolve_workers
+from world_format import WORLD_EXTENSION, encode_world
+from world_generator import generate_world
+
+OUTPUT_DIR = "godot_project/assets/worlds"
+
+# One seed or a range; "a..b" also takes negative ends (world_gen_ui.gd accepts any integer), "a-b" is kept for
+# non-negative ranges
+SEED_PATTERN = re.compile(r"(-?\d+)(?:\.\.(-?\d+)|-(\d+))?")
+
+# The generator is versioned by every module that shapes its output
+CODE_VERSION = hash_bytes(*(code_version(module.__file__) for module in
+                            (fast_noise, godot_rng, world_generator, world_format)),
+                          code_version(__file__))[:16]
+
+def parse_seeds(spec):
+    """Expand a seed list like "0-99,123,-20..-10" into seeds in order, without repeats."""
+    seeds = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        match = SEED_PATTERN.fullmatch(part)
+        if match is None:
+            raise ValueError(f"bad seed or range {part!r}")
+        first, last = match.group(1), match.group(2) or match.group(3)
+        seeds.extend(range(int(first), int(last) + 1) if last is not None else [int(first)])
+    return list(dict.fromkeys(seeds))
+
+def world_filename(width, height, seed):
+    """File name of one baked world."""
+    return f"world_{width}x{height}_{seed}{WORLD_EXTENSION}"
+
+def bake_world(job):
+    """Generate and encode one (width, height, seed) world."""
+    width, height, seed = job
+    return encode_world(generate_world(width, height, seed), CODE_VERSION)
+
+def bake_worlds(seeds, output_dir, width, height, workers=1):
+    """Bake each seed into output_dir, skipping worlds that are already up to date; returns files written."""
+    os.makedirs(output_dir, exist_ok=True)
+    cache = BuildCache(output_dir, "bake_worlds")
+
+    jobs = [(width, height, seed) for seed in seeds]
+    keys = [hash_bytes(CODE_VERSION, width, height, seed) for seed in seeds]
+    filenames = [world_filename(width, height, seed) for seed in seeds]
+    stale = [i for i in range(len(jobs)) if not cache.keep(filenames[i], keys[i])]
+    print(f"  {len(stale)} of {len(jobs)} world(s) to bake, {len(jobs) - len(stale)} up to date")
+
+    for i, data in zip(stale, parallel_map(bake_world, [jobs[i] for i in stale], workers)):
+        cache.store(filenames[i], keys[i], data)
+        print(f"  Baked {filenames[i]} ({len(data) / 1024:.1f} KiB)")
+
+    # Each run bakes only the seeds asked for, so worlds from earlier runs are kept
+    cache.finish(prune=False)
+    return cache.written
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-bake worlds with WorldGenerator's rules.")
+    parser.add_argument("seeds", nargs="?", default="0",
+                        help='seeds to bake, e.g. "0-99,123" or "-20..-10" (default 0); '
+                             'a list starting with a negative range goes last, after "--"')
+    parser.add_argument("--width", type=int, default=300, help="world width in tiles (default 300)")
+    parser.add_argument("--height", type=int, default=300, help="world height in tiles (default 300)")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help=f"where to write worlds (default {OUTPUT_DIR})")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("WORLD PRE-BAKER")
+    print("=" * 70)
+
+    try:
+        seeds = parse_seeds(args.seeds)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"Baking {len(seeds)} seed(s) at {args.width}x{args.height} into {args.output_dir}")
+    written = bake_worlds(seeds, args.output_dir, args.width, args.height, resolve_workers(args.workers))
+
+    print("\n" + "=" * 70)
+    print(f"Done: {written} world file(s) written")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Benchmark the tile pipeline stages on the real sheet and synthetic large sheets.
+
+Synthetic sheets are drawn on the real sheet's hex lattice at 1x, 4x and 16x
+its area. Every stage runs in a fresh process so its peak RSS is its own, and
+results are compared against a stored baseline so regressions show up as
+numbers rather than impressions. Run with --save-baseline to record one.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image, ImageDraw
+
+from analyze_hex_tileset import find_hex_centers, lattice_centers, save_lattice
+from create_missing_fantasy_tiles import TILE_GENERATORS, synthesize_tiles
+from extract_fantasy_hex_tiles import classify_terrain_batch, classify_terrain_by_color, extract_hex_tiles
+from split_fantasy_tileset import split_tileset
+
+REAL_SHEET = "godot_project/assets/fantasyhextiles_v3.png"
+BASELINE_PATH = "benchmark_baseline.json"
+
+# Lattice of the real sheet, which the synthetic sheets reuse
+SHEET_WIDTH, SHEET_HEIGHT = 256, 288
+SYNTHETIC_LATTICE = {
+    "h_spacing": 32,
+    "v_spacing": 48,
+    "origin_x": 16,
+    "origin_y": 32,
+    "stagger": 0,
+}
+
+# Representative colors from the tileset, one per terrain the classifier knows
+SYNTHETIC_COLORS = [
+    (105, 193, 39), (39, 130, 25), (24, 174, 228), (11, 88, 158), (246, 157, 2),
+    (79, 34, 13), (58, 63, 66), (135, 154, 146), (208, 236, 247), (183, 204, 106),
+]
+
+def make_synthetic_sheet(path, scale, seed=0):
+    """Draw a sheet with `scale` times the real sheet's area, hexes on its lattice, and write its lattice sidecar."""
+    side = math.isqrt(scale)
+    if scale < 1 or side * side != scale:
+        raise ValueError(f"sheet scale {scale} isn't a perfect square")
+    width, height = SHEET_WIDTH * side, SHEET_HEIGHT * side
+    rng = np.random.default_rng(seed)
+
+    img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    rows, cols, xs, ys = lattice_centers(SYNTHETIC_LATTICE, width, height, 31, 49)
+    radius = SYNTHETIC_LATTICE["h_spacing"] / 2
+    for x, y, color in zip(xs, ys, rng.integers(0, len(SYNTHETIC_COLORS), len(xs))):
+        # Flat-top hex like the real art's, corners touching its row neighbours'
+        points = [(x + radius * math.cos(math.radians(60 * i)),
+                   y + radius * math.sin(math.radians(60 * i))) for i in range(6)]
+        draw.polygon(points, fill=SYNTHETIC_COLORS[color] + (255,))
+
+    # Per-pixel grain so the sheet compresses like painted art rather than flat fills
+    pixels = np.asarray(img).astype(np.int16)
+    grain = rng.integers(-12, 13, size=(height, width, 1))
+    pixels[..., :3] = np.clip(pixels[..., :3] + grain * (pixels[..., 3:4] > 0), 0, 255)
+    Image.fromarray(pixels.astype(np.uint8), "RGBA").save(path)
+    save_lattice(path, SYNTHETIC_LATTICE)
+    return path
+
+def _sheet_pixels(path):
+    """Load every pixel of a sheet as an (N, 4) array."""
+    with Image.open(path) as img:
+        return np.asarray(img.convert("RGBA")).reshape(-1, 4)
+
+def bench_find_hex_centers(path, scale, work_dir):
+    """Detect the lattice and list occupied cells."""
+    centers, _, _ = find_hex_centers(path)
+    return len(centers or [])
+
+def bench_extract_hex_tiles(path, scale, work_dir):
+    """Extract every hex into a fresh directory, pyramid included."""
+    return extract_hex_tiles(path, tempfile.mkdtemp(dir=work_dir))
+
+def bench_extract_hex_tiles_stream(path, scale, work_dir):
+    """Extract every hex into a fresh directory, decoding the sheet one hex row at a time."""
+    return extract_hex_tiles(path, tempfile.mkdtemp(dir=work_dir), stream=True)
+
+def bench_extract_hex_tiles_cached(path, scale, work_dir):
+    """Re-extract into a directory the build cache already covers."""
+    # Every run after the warm-up finds the build cache up to date
+    return extract_hex_tiles(path, os.path.join(work_dir, "cached"))
+
+def bench_classify_terrain_by_color(path, scale, work_dir):
+    """Classify every pixel of the sheet one call at a time."""
+    pixels = _sheet_pixels(path)
+    for pixel in pixels.tolist():
+        classify_terrain_by_color(pixel)
+    return len(pixels)
+
+def bench_classify_terrain_batch(path, scale, work_dir):
+    """Classify every pixel of the sheet in one vectorized call."""
+    pixels = _sheet_pixels(path)
+    classify_terrain_batch(pixels)
+    return len(pixels)
+
+def bench_split_tileset(path, scale, work_dir):
+    """Split the sheet's 32px grid into a fresh directory."""
+    return split_tileset(path, tempfile.mkdtemp(dir=work_dir), "benchmark")
+
+def bench_create_tiles(path, scale, work_dir):
+    """Synthesize procedural variants for every generated terrain."""
+    # Not sheet-driven; generate as many variants per terrain as the sheet scale suggests
+    variants = 16 * scale
+    for terrain in TILE_GENERATORS:
+        synthesize_tiles(terrain, variants=variants)
+    return variants * len(TILE_GENERATORS)
+
+# Stage name -> benchmark returning the number of items it handled, tiles unless STAGE_UNITS says otherwise
+STAGES = {
+    "find_hex_centers": bench_find_hex_centers,
+    "extract_hex_tiles": bench_extract_hex_tiles,
+    "extract_hex_tiles_stream": bench_extract_hex_tiles_stream,
+    "extract_hex_tiles_cached": bench_extract_hex_tiles_cached,
+    "classify_terrain_by_color": bench_classify_terrain_by_color,
+    "classify_terrain_batch": bench_classify_terrain_batch,
+    "split_tileset": bench_split_tileset,
+    "create_tiles": bench_create_tiles,
+}
+
+# What the stages that don't count tiles count
+STAGE_UNITS = {
+    "classify_terrain_by_color": "pixels",
+    "classify_terrain_batch": "pixels",
+}
+
+def run_stage(stage, path, scale, repeat):
+    """Run one stage `repeat` times in this process; returns best time, items handled and peak RSS."""
+    with Image.open(path) as img:
+        megapixels = img.width * img.height / 1e6
+
+    timings = []
+    with tempfile.TemporaryDirectory() as work_dir, contextlib.redirect_stdout(io.StringIO()):
+        # One untimed warm-up run pays for imports, caches and lazy setup
+        STAGES[stage](path, scale, work_dir)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            items = STAGES[stage](path, scale, work_dir)
+            timings.append(time.perf_counter() - start)
+
+    seconds = min(timings)
+    return {
+        "seconds": seconds,
+        "items": items,
+        "unit": STAGE_UNITS.get(stage, "tiles"),
+        "items_per_sec": items / seconds if seconds else 0.0,
+        "megapixels_per_sec": megapixels / seconds if seconds else 0.0,
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1 << 20 if sys.platform == "darwin" else 1 << 10),
+    }
+
+def run_isolated(stage, path, scale, repeat):
+    """Run a stage in a freshly spawned process, so its peak RSS isn't inflated by earlier stages."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_stage, stage, path, scale, repeat).result()
+
+def compare(result, baseline, tolerance):
+    """Describe a result against its baseline entry; returns (text, regressed)."""
+    if baseline is None:
+        return "no baseline", False
+    speed = result["megapixels_per_sec"] / baseline["megapixels_per_sec"] - 1 if baseline["megapixels_per_sec"] else 0.0
+    memory = result["peak_rss_mb"] / baseline["peak_rss_mb"] - 1 if baseline["peak_rss_mb"] else 0.0
+    regressed = speed < -tolerance or memory > tolerance
+    text = f"speed {speed:+6.1%}  rss {memory:+6.1%}"
+    return text + ("  REGRESSION" if regressed else ""), regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tile pipeline stages.")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES),
+                        help="stages to run (default: all)")
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 4, 16],
+                        help="synthetic sheet areas relative to the real sheet, perfect squares (default: 1 4 16)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, best time is reported (default 3)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help=f"baseline file (default {BASELINE_PATH})")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="fractional slowdown or RSS growth counted as a regression (default 0.15)")
+    args = parser.parse_args()
+    bad = [scale for scale in args.scales if scale < 1 or math.isqrt(scale) ** 2 != scale]
+    if bad:
+        parser.error(f"--scales must be perfect squares, not {', '.join(map(str, bad))}")
+
+    print("=" * 70)
+    print("TILE PIPELINE BENCHMARK")
+    print("=" * 70)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        print(f"Comparing against {args.baseline}")
+
+    results = {}
+    regressions = []
+    with tempfile.TemporaryDirectory() as sheet_dir:
+        inputs = []
+        if os.path.exists(REAL_SHEET):
+            inputs.append(("real", REAL_SHEET, 1))
+        for scale in args.scales:
+            path = make_synthetic_sheet(os.path.join(sheet_dir, f"synthetic_{scale}x.png"), scale)
+            inputs.append((f"synthetic_{scale}x", path, scale))
+
+        for input_name, path, scale in inputs:
+            with Image.open(path) as img:
+                print(f"\n{input_name}: {img.width}x{img.height}")
+            for stage in args.stages:
+                name = f"{stage}@{input_name}"
+                result = results[name] = run_isolated(stage, path, scale, args.repeat)
+                text, regressed = compare(result, baseline.get(name), args.tolerance)
+                if regressed:
+                    regressions.append(name)
+                rate = f"{result['items_per_sec']:11.0f} {result['unit']}/s"
+                print(f"  {stage:26s} {result['seconds'] * 1000:9.1f} ms  {rate:20s} "
+                      f"{result['megapixels_per_sec']:8.2f} MP/s  {result['peak_rss_mb']:6.0f} MB  {text}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"machine": platform.platform(), "python": platform.python_version(),
+                       "repeat": args.repeat, "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaseline saved to {args.baseline}")
+
+    print("\n" + "=" * 70)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+    else:
+        print("No regressions")
+    print("=" * 70)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
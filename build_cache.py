@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Content-addressed build cache shared by the tile pipeline scripts.
+
+Each output directory keeps a .build_cache.json (hidden from Godot's importer)
+recording, per producing script, the key every output was built from and the
+hash of the bytes written. Outputs whose key hasn't changed are left alone, so
+their mtime stays put and Godot doesn't re-import them.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+from PIL import Image
+
+import telemetry
+
+CACHE_FILENAME = ".build_cache.json"
+
+# Serializes manifest updates: stages running in threads may share an output directory's manifest
+_manifest_lock = threading.Lock()
+
+def hash_bytes(*parts):
+    """Hash a sequence of bytes/str/JSON-able parts into one hex digest."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        elif not isinstance(part, (bytes, bytearray, memoryview)):
+            part = json.dumps(part, sort_keys=True, default=str).encode()
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+def hash_file(path):
+    """Hash a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def code_version(script_path):
+    """Version a producer by the hash of its own source, so code edits invalidate its outputs."""
+    return hash_file(script_path)[:16]
+
+def encode_png(image):
+    """Encode a PIL image, or an RGBA uint8 array, to PNG bytes."""
+    if not isinstance(image, Image.Image):
+        image = Image.fromarray(image, 'RGBA')
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+class BuildCache:
+    """Per-directory record of which inputs produced each output of one script."""
+
+    def __init__(self, output_dir, producer):
+        self.output_dir = output_dir
+        self.producer = producer
+        self.path = os.path.join(output_dir, CACHE_FILENAME)
+        with _manifest_lock:
+            section = self._read_manifest().get(producer, {})
+        self.inputs_key = section.get("inputs")
+        self.outputs = section.get("outputs", {})
+        self.touched = set()
+        self.written = 0
+        self.skipped = 0
+
+    def _read_manifest(self):
+        """The manifest on disk, every producer's section."""
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def owns(self, filename):
+        """True if the file still holds the bytes this producer last wrote."""
+        entry = self.outputs.get(filename)
+        path = os.path.join(self.output_dir, filename)
+        return entry is not None and os.path.exists(path) and hash_file(path) == entry["hash"]
+
+    def inputs_unchanged(self, inputs_key):
+        """True if the whole run's inputs match the last run and every output is intact."""
+        if self.inputs_key != inputs_key or not self.outputs:
+            return False
+        if not all(self.owns(filename) for filename in self.outputs):
+            return False
+        self.touched.update(self.outputs)
+        self.skipped += len(self.outputs)
+        return True
+
+    def is_fresh(self, filename, key):
+        """True if filename was built from key and hasn't been changed since."""
+        entry = self.outputs.get(filename)
+        return entry is not None and entry["key"] == key and self.owns(filename)
+
+    def keep(self, filename, key):
+        """Mark filename as produced this run; True if it is fresh and needn't be rebuilt."""
+        self.touched.add(filename)
+        if self.is_fresh(filename, key):
+            self.skipped += 1
+            return True
+        return False
+
+    def write(self, filename, key, data):
+        """Write data to filename unless it is already fresh or byte-identical; returns True if written."""
+        if self.keep(filename, key):
+            return False
+        return self.store(filename, key, data)
+
+    def store(self, filename, key, data):
+        """Write data unless the file already holds exactly these bytes, and record it."""
+        path = os.path.join(self.output_dir, filename)
+        data_hash = hashlib.sha256(data).hexdigest()
+        changed = not (os.path.exists(path) and hash_file(path) == data_hash)
+        if changed:
+            with open(path, "wb") as f:
+                f.write(data)
+            self.written += 1
+            telemetry.count(bytes_written=len(data), files_written=1)
+        else:
+            self.skipped += 1
+        self.outputs[filename] = {"key": key, "hash": data_hash}
+        return changed
+
+    def describe(self, filename, **facts):
+        """Record facts about an output beside its hash, such as where in a source sheet it came from."""
+        if filename in self.outputs:
+            self.outputs[filename].update(facts)
+
+    def save_image(self, filename, key, image):
+        """Encode and write a PIL image through the cache; returns True if written."""
+        if self.keep(filename, key):
+            return False
+        return self.store(filename, key, encode_png(image))
+
+    def finish(self, inputs_key=None, prune=True):
+        """Remove this producer's outputs that weren't produced this run (if prune), then save the manifest."""
+        stale = sorted(set(self.outputs) - self.touched) if prune else []
+        for filename in stale:
+            # Only delete files that still hold what we wrote; another script may own them now
+            if self.owns(filename):
+                os.remove(os.path.join(self.output_dir, filename))
+                print(f"  Removed stale output: {filename}")
+            del self.outputs[filename]
+
+        # Re-read so sections other producers saved since __init__ are kept, and only this one is replaced
+        with _manifest_lock:
+            manifest = self._read_manifest()
+            manifest[self.producer] = {"inputs": inputs_key, "outputs": self.outputs}
+            text = json.dumps(manifest, indent=2, sort_keys=True) + "\n"
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    if f.read() == text:
+                        return
+            # Written beside it and swapped in, so a reader never sees half a manifest
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, "w") as f:
+                f.write(text)
+            os.replace(temp_path, self.path)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Composite river overlays onto the base terrain tiles of every tileset style.
+
+world_map.gd looks up <name>_river.png for every terrain in ALLOWS_RIVERS,
+and only the original tile_art/ set has them. This draws a river across each
+of those base tiles, in every style and at every LOD level, so each style has
+the complete set. The 16px tiles and every lod<size>/ level of all styles are
+stacked by size and blended with all river masks in one array operation per
+size.
+
+Tiles are flat-top hexes (the TileMap's vertical offset axis), and a river
+mask runs between the midpoints of two of their edges (n, nw, sw, s, se, ne),
+curving through the center. <name>_river.png is the n-s river, following the
+original art. --shapes adds orientation variants, <name>_river_<a>_<b>.png:
+"straight" joins opposite edges and "bend" joins edges two apart.
+
+Files this script didn't write, like the hand-drawn original river tiles, are
+left alone. A style missing a base tile borrows the original art's, as
+_create_terrain_tileset does, resampled to the level's size.
+"""
+import argparse
+import os
+import numpy as np
+from PIL import Image
+
+from build_cache import BuildCache, code_version, encode_png, hash_bytes, hash_file
+from lod_pyramid import LOD_SIZES, lod_dir
+from pack_tile_atlas import load_tile
+from parallel import add_workers_argument, parallel_map, resolve_workers
+from terrain_types import ALLOWS_RIVERS, TERRAIN_NAMES, TILESET_STYLES
+import telemetry
+
+CODE_VERSION = code_version(__file__)
+
+# Matches the hand-drawn river tiles in tile_art/
+RIVER_COLOR = np.array([51, 127, 229], dtype=np.float64)
+RIVER_OPACITY = 200 / 255
+RIVER_WIDTH = 2 / 16  # Fraction of the tile width
+
+# Edge midpoints of the flat-top hex filling the square tile, in [-1, 1] with y down
+EDGE_POINTS = {
+    "n": (0.0, -1.0), "nw": (-0.75, -0.5), "sw": (-0.75, 0.5),
+    "s": (0.0, 1.0), "se": (0.75, 0.5), "ne": (0.75, -0.5),
+}
+EDGES = list(EDGE_POINTS)  # Counterclockwise from north
+SHAPES = {
+    "straight": [(EDGES[i], EDGES[i + 3]) for i in range(3)],
+    "bend": [(EDGES[i], EDGES[(i + 2) % 6]) for i in range(6)],
+}
+DEFAULT_RIVER = ("n", "s")  # The original art's vertical river
+DEFAULT_SHAPES = "straight,bend"
+
+def river_filename(name, river=DEFAULT_RIVER):
+    """File name of a terrain's river tile: the default one, or an orientation variant."""
+    return f"{name}_river.png" if river == DEFAULT_RIVER else f"{name}_river_{river[0]}_{river[1]}.png"
+
+def river_curve(river, samples=24):
+    """(samples, 2) points of a river: a quadratic curve between its two ends, pulled through the center."""
+    start, end = np.array(EDGE_POINTS[river[0]]), np.array(EDGE_POINTS[river[1]])
+    t = np.linspace(0, 1, samples)[:, None]
+    return (1 - t) ** 2 * start + t ** 2 * end  # The center control point is the origin
+
+def river_masks(rivers, size, width=RIVER_WIDTH):
+    """(len(rivers), size, size) antialiased coverage of each river at one tile size."""
+    coords = (np.arange(size) + 0.5) / size * 2 - 1
+    pixels = np.stack(np.meshgrid(coords, coords), axis=-1).reshape(-1, 2)  # (x, y) per pixel
+    masks = []
+    for river in rivers:
+        curve = river_curve(river)
+        a, b = curve[:-1], curve[1:]
+        # Distance from every pixel to every segment of the curve, then to the nearest one
+        ab = b - a
+        t = np.clip(((pixels[:, None] - a) * ab).sum(-1) / (ab * ab).sum(-1), 0, 1)
+        distance = np.linalg.norm(pixels[:, None] - (a + t[..., None] * ab), axis=-1).min(axis=1)
+        # Half-pixel ramp on the river's edge, in pixels of this size
+        masks.append(np.clip(width * size / 2 - distance * size / 2 + 0.5, 0, 1).reshape(size, size))
+    return np.stack(masks)
+
+def composite_rivers(stack, masks):
+    """(N, M, S, S, 4) tiles: every tile of an (N, S, S, 4) stack under every one of M river masks."""
+    base = stack.astype(np.float64)
+    # The river only covers the opaque hex, so the transparent corners stay transparent
+    cover = masks[None] * RIVER_OPACITY * (base[:, None, ..., 3] / 255)
+    rgb = base[:, None, ..., :3] * (1 - cover[..., None]) + RIVER_COLOR * cover[..., None]
+    alpha = np.broadcast_to(base[:, None, ..., 3:], rgb.shape[:-1] + (1,))
+    return np.floor(np.concatenate([rgb, alpha], axis=-1) + 0.5).astype(np.uint8)
+
+def level_dirs(style_dir):
+    """(directory, tile size or None for the base level) of a style's base tiles and each LOD level present."""
+    return [(style_dir, None)] + [(lod_dir(style_dir, size), size) for size in LOD_SIZES
+                                  if os.path.isdir(lod_dir(style_dir, size))]
+
+def base_tiles(style_dir):
+    """{(directory, name): (source path, size)} of each river terrain's base tile at every level of a style."""
+    fallback_dir = TILESET_STYLES["original"]
+    tiles = {}
+    for directory, size in level_dirs(style_dir):
+        for terrain_id in ALLOWS_RIVERS:
+            name = TERRAIN_NAMES[terrain_id]
+            path = os.path.join(directory, f"{name}.png")
+            if not os.path.exists(path):
+                path = os.path.join(fallback_dir, f"{name}.png")
+                if not os.path.exists(path):
+                    continue
+            if size is None:
+                with Image.open(path) as img:
+                    size = img.width
+            tiles[(directory, name)] = (path, size)
+    return tiles
+
+def composite_styles(rivers, width=RIVER_WIDTH, workers=1):
+    """Write every style's river tiles; returns files written."""
+    targets = {}
+    for style_dir in TILESET_STYLES.values():
+        targets.update(base_tiles(style_dir))
+    if not targets:
+        print("No base tiles found")
+        return 0
+
+    caches = {directory: BuildCache(directory, "composite_rivers") for directory, _ in targets}
+    written = 0
+    for size in sorted({size for _, size in targets.values()}):
+        group = [(key, path) for key, (path, tile_size) in targets.items() if tile_size == size]
+        # Files someone else wrote (the hand-drawn originals) are never replaced
+        outputs = {}
+        for (directory, name), path in group:
+            cache = caches[directory]
+            source = hash_file(path)
+            for j, river in enumerate(rivers):
+                filename = river_filename(name, river)
+                if cache.owns(filename) or not os.path.exists(os.path.join(directory, filename)):
+                    key = hash_bytes(CODE_VERSION, source, size, width, river)
+                    if not cache.keep(filename, key):
+                        outputs.setdefault((directory, name), []).append((j, filename, key))
+        if not outputs:
+            continue
+
+        stale = list(outputs)
+        with telemetry.span("composite", size=size):
+            stack = np.stack([load_tile(targets[target][0], size) for target in stale])
+            tiles = composite_rivers(stack, river_masks(rivers, size, width))
+            telemetry.count(pixels=tiles[..., 0].size)
+        jobs = [(i, j, filename, key) for i, target in enumerate(stale) for j, filename, key in outputs[target]]
+        with telemetry.span("encode"):
+            encoded = parallel_map(encode_png, [tiles[i, j] for i, j, _, _ in jobs], workers)
+        with telemetry.span("write"):
+            for (i, _, filename, key), data in zip(jobs, encoded):
+                directory = stale[i][0]
+                if caches[directory].store(filename, key, data):
+                    written += 1
+                    telemetry.detail(f"  {os.path.join(directory, filename)}")
+
+    # Variants of shapes no longer asked for are removed
+    for cache in caches.values():
+        cache.finish()
+    return written
+
+def parse_shapes(text):
+    """River orientations for a comma-separated list of shape names."""
+    rivers = [DEFAULT_RIVER]
+    for shape in filter(None, text.split(",")):
+        if shape not in SHAPES:
+            raise argparse.ArgumentTypeError(f"unknown shape {shape!r} (choose from {', '.join(SHAPES)})")
+        rivers += SHAPES[shape]
+    # The default river is also the first straight one
+    return list(dict.fromkeys(rivers))
+
+def main():
+    parser = argparse.ArgumentParser(description="Composite river overlays onto every style's base terrain tiles.")
+    parser.add_argument("--shapes", type=parse_shapes, default=DEFAULT_SHAPES,
+                        help="orientation variants besides <name>_river.png: straight, bend "
+                             "(default both; '' for none)")
+    parser.add_argument("--width", type=float, default=RIVER_WIDTH,
+                        help=f"river width as a fraction of the tile width (default {RIVER_WIDTH})")
+    add_workers_argument(parser)
+    telemetry.add_telemetry_arguments(parser)
+    args = parser.parse_args()
+    telemetry.configure_from_args(args)
+
+    print("=" * 70)
+    print("RIVER OVERLAY COMPOSITOR")
+    print("=" * 70)
+
+    written = composite_styles(args.shapes, args.width, resolve_workers(args.workers))
+
+    print("\n" + "=" * 70)
+    print(f"Done: {written} river tile(s) written for {len(args.shapes)} orientation(s)")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
@@ -1,148 +1,192 @@
 #!/usr/bin/env python3
 """
 Create missing fantasy tiles for both bordered and borderless variants.
+
+Tiles are synthesized as whole-array operations, so any number of seeded
+variants can be built at any size in one call. Variant 0 at 16px is the
+classic tile; further variants shift the pattern and lighten or darken it by a
+tone of their own (several patterns repeat along a diagonal, so a shift alone
+often reproduces another variant), and are saved as name_1.png, name_2.png,
+... like split_fantasy_tileset.py names its variants.
+
+Each tile's LOD levels go into lod<size>/. The 16px level is the native
+tile itself and smaller levels are downsampled from it; larger levels are
+downsampled from one 64px synthesis, since the patterns only gain detail
+there. A full-size tile at one of the LOD sizes (the default 16px included)
+is taken from the same levels, so it matches its lod<size>/ copy exactly;
+other sizes are synthesized directly.
 """
+import argparse
 import os
-from PIL import Image, ImageDraw
+import zlib
+import numpy as np
+
+from build_cache import BuildCache, code_version, hash_bytes
+from lod_pyramid import LOD_CODE_VERSION, LOD_SIZES, build_pyramid, lod_dir
+import telemetry
+
+CODE_VERSION = code_version(__file__)
 
 TILE_SIZE = 16  # Changed to 16x16
+TONE_STEP = 4  # Brightness between neighboring variant tones
 
-def create_chasm_tile(output_path):
-    """Create a chasm tile - dark with purple/black tones."""
-    img = Image.new("RGBA", (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
+def _rgba(red, green, blue):
+    """Stack per-pixel channel arrays into opaque RGBA uint8 tiles."""
+    red, green, blue = np.broadcast_arrays(red, green, blue)
+    return np.stack([red, green, blue, np.full_like(red, 255)], axis=-1).astype(np.uint8)
 
+def create_chasm_tile(u, v):
+    """Create chasm tiles - dark with purple/black tones."""
     # Dark purple/black base
-    base_color = (20, 10, 30, 255)
-    img.paste(base_color, (0, 0, TILE_SIZE, TILE_SIZE))
+    depth = np.zeros(u.shape, dtype=bool)
 
     # Add some darker spots for depth
     for i in range(5):
         x = (i * 7) % TILE_SIZE
         y = (i * 11) % TILE_SIZE
         radius = 3 + (i % 3)
-        draw.ellipse(
-            [x - radius, y - radius, x + radius, y + radius],
-            fill=(10, 5, 15, 255)
-        )
-
-    img.save(output_path)
-    print(f"Created chasm tile: {output_path}")
-
-def create_lava_tile(output_path):
-    """Create a lava tile - bright orange/red."""
-    img = Image.new("RGBA", (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0))
-
-    # Create lava pattern with oranges and reds
-    for y in range(TILE_SIZE):
-        for x in range(TILE_SIZE):
-            # Create a wavy lava pattern
-            wave = ((x + y) % 8) / 8.0
-            if (x * y) % 7 < 3:
-                # Bright orange
-                color = (255, int(140 + wave * 40), 0, 255)
-            else:
-                # Dark red
-                color = (int(180 + wave * 50), int(30 + wave * 20), 0, 255)
-            img.putpixel((x, y), color)
-
-    img.save(output_path)
-    print(f"Created lava tile: {output_path}")
-
-def create_cold_water_tile(output_path):
-    """Create a cold water tile - medium blue."""
-    img = Image.new("RGBA", (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0))
-
-    # Medium blue water color
-    for y in range(TILE_SIZE):
-        for x in range(TILE_SIZE):
-            # Add some variation
-            var = ((x + y) % 4) * 5
-            img.putpixel((x, y), (50 + var, 120 + var, 180 + var, 255))
-
-    img.save(output_path)
-    print(f"Created cold_water tile: {output_path}")
-
-def create_dry_grassland_tile(output_path):
-    """Create a dry grassland tile - yellowish grass."""
-    img = Image.new("RGBA", (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0))
-
-    # Yellowish grass color
-    for y in range(TILE_SIZE):
-        for x in range(TILE_SIZE):
-            var = ((x * y) % 3) * 8
-            img.putpixel((x, y), (160 + var, 150 + var, 70, 255))
-
-    img.save(output_path)
-    print(f"Created dry_grassland tile: {output_path}")
-
-def create_jungle_tile(output_path):
-    """Create a jungle tile - very dark green."""
-    img = Image.new("RGBA", (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0))
-
-    # Dark jungle green
-    for y in range(TILE_SIZE):
-        for x in range(TILE_SIZE):
-            var = ((x + y) % 5) * 4
-            img.putpixel((x, y), (20 + var, 80 + var, 30 + var, 255))
-
-    img.save(output_path)
-    print(f"Created jungle tile: {output_path}")
-
-def create_snow_peak_tile(output_path):
-    """Create a snow peak tile - white with slight blue tint."""
-    img = Image.new("RGBA", (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0))
-
-    # White with blue tint
-    for y in range(TILE_SIZE):
-        for x in range(TILE_SIZE):
-            var = ((x + y) % 3) * 3
-            img.putpixel((x, y), (230 + var, 235 + var, 245 + var, 255))
-
-    img.save(output_path)
-    print(f"Created snow_peak tile: {output_path}")
+        depth |= (u - x) ** 2 + (v - y) ** 2 <= (radius + 0.4) ** 2
+
+    return _rgba(np.where(depth, 10, 20), np.where(depth, 5, 10), np.where(depth, 15, 30))
+
+def create_lava_tile(u, v):
+    """Create lava tiles - bright orange/red."""
+    # Create a wavy lava pattern with oranges and reds
+    wave = ((u + v) % 8) / 8.0
+    bright = (np.floor(u) * np.floor(v)) % 7 < 3
+    red = np.where(bright, 255, (180 + wave * 50).astype(int))
+    green = np.where(bright, (140 + wave * 40).astype(int), (30 + wave * 20).astype(int))
+    return _rgba(red, green, 0)
+
+def create_cold_water_tile(u, v):
+    """Create cold water tiles - medium blue."""
+    # Medium blue water color with some variation
+    var = (np.floor(u + v) % 4) * 5
+    return _rgba(50 + var, 120 + var, 180 + var)
+
+def create_dry_grassland_tile(u, v):
+    """Create dry grassland tiles - yellowish grass."""
+    var = ((np.floor(u) * np.floor(v)) % 3) * 8
+    return _rgba(160 + var, 150 + var, 70)
+
+def create_jungle_tile(u, v):
+    """Create jungle tiles - very dark green."""
+    var = (np.floor(u + v) % 5) * 4
+    return _rgba(20 + var, 80 + var, 30 + var)
+
+def create_snow_peak_tile(u, v):
+    """Create snow peak tiles - white with slight blue tint."""
+    var = (np.floor(u + v) % 3) * 3
+    return _rgba(230 + var, 235 + var, 245 + var)
+
+# Generator per terrain, in creation order
+TILE_GENERATORS = {
+    "chasm": create_chasm_tile,
+    "lava": create_lava_tile,
+    "cold_water": create_cold_water_tile,
+    "dry_grassland": create_dry_grassland_tile,
+    "jungle": create_jungle_tile,
+    "snow_peak": create_snow_peak_tile,
+}
+
+# The extractors never produce these, so they are always generated
+ALWAYS_CREATE = {"chasm", "lava"}
+
+def synthesize_tiles(terrain, size=TILE_SIZE, variants=1, seed=0):
+    """Build a (variants, size, size, 4) stack of tiles for one terrain in a single array pass."""
+    # Pattern space is the 16px tile grid; larger tiles sample it more finely
+    pixel = np.arange(size) * TILE_SIZE / size
+    rng = np.random.default_rng([seed, zlib.crc32(terrain.encode())])
+    shifts = rng.integers(0, TILE_SIZE, size=(variants, 2))
+    shifts[0] = 0  # Variant 0 is the classic, unshifted tile
+    # Tones 0, -1, +1, -2, +2, ... steps, so no two variants share one; a variant's tone doesn't depend on the count
+    tones = np.array([(-1) ** i * ((i + 1) // 2) * TONE_STEP for i in range(variants)])
+
+    # Each variant wraps the pattern around by its own offset
+    u = (pixel[None, None, :] + shifts[:, 0, None, None]) % TILE_SIZE
+    v = (pixel[None, :, None] + shifts[:, 1, None, None]) % TILE_SIZE
+    u, v = np.broadcast_arrays(u, v)
+    tiles = TILE_GENERATORS[terrain](u, v)
+    tiles[..., :3] = np.clip(tiles[..., :3] + tones[:, None, None, None], 0, 255)
+    return tiles
+
+def synthesize_pyramid(terrain, variants=1, seed=0):
+    """Build {size: tiles} LOD levels for one terrain: the native tile and below from it, the rest from 64px."""
+    levels = build_pyramid(synthesize_tiles(terrain, TILE_SIZE, variants, seed),
+                           [size for size in LOD_SIZES if size <= TILE_SIZE])
+    larger = [size for size in LOD_SIZES if size > TILE_SIZE]
+    if larger:
+        levels.update(build_pyramid(synthesize_tiles(terrain, max(larger), variants, seed), larger))
+    return levels
+
+def variant_filename(terrain, variant):
+    """File name for a variant, matching split_fantasy_tileset.py (name.png, name_1.png, ...)."""
+    return f"{terrain}.png" if variant == 0 else f"{terrain}_{variant}.png"
+
+def create_missing_tiles(output_dir, size=TILE_SIZE, variants=1, seed=0):
+    """Fill one style directory's gaps with procedural tiles, plus their LOD levels."""
+    if not os.path.exists(output_dir):
+        print(f"Warning: Directory {output_dir} does not exist!")
+        return
+
+    print(f"\nCreating tiles for {os.path.basename(output_dir)}:")
+
+    # The full-size tiles, then each LOD level in lod<size>/ beside them
+    targets = [(output_dir, size)] + [(lod_dir(output_dir, lod_size), lod_size) for lod_size in LOD_SIZES]
+    pyramids = {}  # Per terrain, shared by every target at a LOD size
+    for directory, level in targets:
+        os.makedirs(directory, exist_ok=True)
+        cache = BuildCache(directory, "create_missing_fantasy_tiles")
+
+        for terrain in TILE_GENERATORS:
+            tiles = None
+            for variant in range(variants):
+                filename = variant_filename(terrain, variant)
+                output_path = os.path.join(directory, filename)
+
+                # Only fill gaps the extractors left, except for terrains they never produce
+                if terrain not in ALWAYS_CREATE and os.path.exists(output_path) and not cache.owns(filename):
+                    continue
+
+                if level in LOD_SIZES:
+                    key = hash_bytes(CODE_VERSION, LOD_CODE_VERSION, terrain, level, seed, variant)
+                else:
+                    key = hash_bytes(CODE_VERSION, terrain, level, seed, variant)
+                if cache.keep(filename, key):
+                    telemetry.detail(f"Unchanged {terrain} tile: {output_path}")
+                    continue
+
+                # All variants of a terrain come out of one call
+                if tiles is None:
+                    with telemetry.span("synthesize", terrain=terrain):
+                        if level not in LOD_SIZES:
+                            tiles = synthesize_tiles(terrain, level, variants, seed)
+                        else:
+                            if terrain not in pyramids:
+                                pyramids[terrain] = synthesize_pyramid(terrain, variants, seed)
+                            tiles = pyramids[terrain][level]
+                        telemetry.count(pixels=tiles[..., 0].size)
+                with telemetry.span("write"):
+                    cache.save_image(filename, key, tiles[variant])
+                telemetry.detail(f"Created {terrain} tile: {output_path}")
+
+        cache.finish()
 
 def main():
     """Create missing fantasy tiles."""
+    parser = argparse.ArgumentParser(description="Create procedural tiles for terrains the tilesets lack.")
+    parser.add_argument("--size", type=int, default=TILE_SIZE, help="tile size in pixels (default 16)")
+    parser.add_argument("--variants", type=int, default=1, help="variants per terrain (default 1)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for variant patterns (default 0)")
+    telemetry.add_telemetry_arguments(parser)
+    args = parser.parse_args()
+    telemetry.configure_from_args(args)
+
     print("Creating missing fantasy tiles...")
 
     # Create tiles for both bordered and borderless versions
     for style in ["fantasy_bordered", "fantasy_borderless"]:
-        output_dir = f"godot_project/assets/tile_art/{style}"
-
-        if not os.path.exists(output_dir):
-            print(f"Warning: Directory {output_dir} does not exist!")
-            continue
-
-        print(f"\nCreating tiles for {style}:")
-
-        # Create chasm tile
-        chasm_path = os.path.join(output_dir, "chasm.png")
-        create_chasm_tile(chasm_path)
-
-        # Create lava tile
-        lava_path = os.path.join(output_dir, "lava.png")
-        create_lava_tile(lava_path)
-
-        # Create cold_water tile (if doesn't exist)
-        cold_water_path = os.path.join(output_dir, "cold_water.png")
-        if not os.path.exists(cold_water_path):
-            create_cold_water_tile(cold_water_path)
-
-        # Create dry_grassland tile (if doesn't exist)
-        dry_grassland_path = os.path.join(output_dir, "dry_grassland.png")
-        if not os.path.exists(dry_grassland_path):
-            create_dry_grassland_tile(dry_grassland_path)
-
-        # Create jungle tile (if doesn't exist)
-        jungle_path = os.path.join(output_dir, "jungle.png")
-        if not os.path.exists(jungle_path):
-            create_jungle_tile(jungle_path)
-
-        # Create snow_peak tile (if doesn't exist)
-        snow_peak_path = os.path.join(output_dir, "snow_peak.png")
-        if not os.path.exists(snow_peak_path):
-            create_snow_peak_tile(snow_peak_path)
+        create_missing_tiles(f"godot_project/assets/tile_art/{style}", args.size, args.variants, args.seed)
 
     print("\nMissing tiles created successfully!")
 
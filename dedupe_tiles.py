@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Find near-duplicate terrain variants and redirect them to one representative.
+
+split_fantasy_tileset.py and extract_fantasy_hex_tiles.py number every cell
+that maps to the same terrain as a variant (grass, grass_1, ...), and some of
+those look the same once they are 16px tiles. This hashes every tile of every
+style in one batch with a DCT perceptual hash, groups variants of the same
+terrain whose hashes differ in at most --threshold bits, and writes
+tile_redirects.json into each style directory mapping each duplicate to the
+variant kept in its place. pack_tile_atlas.py and the other scripts that list
+a style's tiles skip redirected files; the files themselves are left alone, as
+they belong to the scripts that wrote them.
+"""
+import argparse
+import json
+import numpy as np
+
+from build_cache import BuildCache, code_version, hash_bytes, hash_file
+from pack_tile_atlas import REDIRECTS_FILENAME, collect_style_tiles, load_tile, tile_name
+from terrain_types import TILE_SIZE, TILESET_STYLES
+
+CODE_VERSION = code_version(__file__)
+
+HASH_SIZE = 8  # Low-frequency DCT block side; the hash has HASH_SIZE**2 - 1 bits
+DEFAULT_THRESHOLD = 8  # Max differing hash bits for two variants to count as the same tile
+
+def dct_matrix(size):
+    """Orthonormal DCT-II matrix, so dct_matrix(n) @ x transforms the columns of x."""
+    k = np.arange(size)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+def perceptual_hashes(stack, hash_size=HASH_SIZE):
+    """pHash bits of an (N, S, S, 4) uint8 tile stack, as an (N, hash_size**2 - 1) bool array."""
+    pixels = stack.astype(np.float64) / 255
+    # Luma over black, so transparent corners read the same in every tile
+    luma = (pixels[..., :3] @ np.array([0.299, 0.587, 0.114])) * pixels[..., 3]
+    dct = dct_matrix(stack.shape[1])
+    coefficients = np.einsum('ij,njk,lk->nil', dct, luma, dct)[:, :hash_size, :hash_size]
+    # The DC term only tracks overall brightness, so it is left out
+    coefficients = coefficients.reshape(len(stack), -1)[:, 1:]
+    return coefficients > np.median(coefficients, axis=1, keepdims=True)
+
+def hamming_distances(hashes):
+    """(N, N) count of differing bits between every pair of hashes."""
+    return (hashes[:, None, :] != hashes[None, :, :]).sum(axis=-1)
+
+def cluster_variants(keys, distances, threshold):
+    """Map each duplicate key to its representative: the lowest variant of the same tile within threshold bits."""
+    redirects = {}
+    representatives = []
+    # Keys are sorted, so the base tile of each terrain leads its group and is always kept
+    for i, (terrain_id, variant, is_river) in enumerate(keys):
+        match = next((j for j in representatives if keys[j][0] == terrain_id and keys[j][2] == is_river
+                      and distances[i, j] <= threshold), None)
+        if match is None:
+            representatives.append(i)
+        else:
+            redirects[keys[i]] = keys[match]
+    return redirects
+
+def tile_filename(key):
+    """File name of a (terrain_id, variant, is_river) tile."""
+    return tile_name(key) + ".png"
+
+def build_redirect_manifest(keys, hashes, distances, redirects, threshold):
+    """Describe one style's clusters: where each duplicate points and every tile's hash."""
+    index = {key: i for i, key in enumerate(keys)}
+    return {
+        "threshold": threshold,
+        "hash_bits": hashes.shape[1],
+        "redirects": {tile_filename(duplicate): tile_filename(kept) for duplicate, kept in redirects.items()},
+        "distances": {tile_filename(duplicate): int(distances[index[duplicate], index[kept]])
+                      for duplicate, kept in redirects.items()},
+        "hashes": {tile_filename(key): "%016x" % int("".join("1" if bit else "0" for bit in bits), 2)
+                   for key, bits in zip(keys, hashes)},
+    }
+
+def dedupe_styles(threshold=DEFAULT_THRESHOLD):
+    """Hash every style's tiles in one pass and write each style's redirect manifest; returns duplicates found."""
+    # Redirects from an earlier run must not hide the tiles being re-clustered
+    styles = {style: collect_style_tiles(style_dir, skip_duplicates=False) for style, style_dir in TILESET_STYLES.items()}
+    entries = [(style, key, path) for style, tiles in styles.items() for key, path in tiles.items()]
+    if not entries:
+        print("No tiles found")
+        return 0
+    hashes = perceptual_hashes(np.stack([load_tile(path, TILE_SIZE) for _, _, path in entries]))
+    print(f"Hashed {len(entries)} tiles across {len(styles)} styles")
+
+    duplicates = 0
+    for style, tiles in styles.items():
+        if not tiles:
+            continue
+        rows = [i for i, entry in enumerate(entries) if entry[0] == style]
+        keys = [entries[i][1] for i in rows]
+        distances = hamming_distances(hashes[rows])
+        redirects = cluster_variants(keys, distances, threshold)
+        manifest = build_redirect_manifest(keys, hashes[rows], distances, redirects, threshold)
+
+        cache = BuildCache(TILESET_STYLES[style], "dedupe_tiles")
+        inputs_key = hash_bytes(CODE_VERSION, threshold, [(key, hash_file(path)) for key, path in tiles.items()])
+        cache.write(REDIRECTS_FILENAME, inputs_key, (json.dumps(manifest, indent=2) + "\n").encode())
+        cache.finish(inputs_key)
+
+        duplicates += len(redirects)
+        print(f"\n{style}: {len(keys)} tiles, {len(keys) - len(redirects)} distinct")
+        for duplicate, kept in redirects.items():
+            print(f"  {tile_filename(duplicate):25s} -> {tile_filename(kept)} "
+                  f"({manifest['distances'][tile_filename(duplicate)]} bits apart)")
+    return duplicates
+
+def main():
+    parser = argparse.ArgumentParser(description="Redirect near-duplicate terrain variants to one representative.")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help=f"max differing hash bits between duplicates (default {DEFAULT_THRESHOLD}, "
+                             f"out of {HASH_SIZE ** 2 - 1}; 0 merges only identical-looking tiles)")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("TILE VARIANT DEDUPLICATION")
+    print("=" * 70)
+
+    duplicates = dedupe_styles(args.threshold)
+
+    print("\n" + "=" * 70)
+    print(f"Done: {duplicates} duplicate variant(s) redirected")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,36 @@
 #!/usr/bin/env python3
 """
 Extract fantasy hex tiles with proper positioning and color-based terrain detection.
+
+Terrain comes from the color lookup table train_terrain_lut.py fits from the
+labeled cells, by a vote of every pixel in the hex; without a table, or with
+--color-rules, the hand-tuned rules classify each hex by its center pixel.
 """
-from PIL import Image
 from collections import Counter
+import argparse
+import math
+import numpy as np
 import os
 
+from analyze_hex_tileset import lattice_centers, load_lattice
+from build_cache import BuildCache, code_version, encode_png, hash_bytes, hash_file
+from lod_pyramid import LOD_CODE_VERSION, LOD_SIZES, PyramidWriter, build_pyramid, lanczos_resize, pyramid_up_to_date
+from parallel import add_workers_argument, parallel_map, resolve_workers, run_jobs
+from sheet_stream import decode_sheet, iter_row_bands, sheet_size, warm_cache
+import telemetry
+from terrain_lut import LUT_PATH, classify_hexes, load_lut
+
+CODE_VERSION = code_version(__file__)
+
+# Hand-tuned lattice used when a sheet has no .lattice.json sidecar
+DEFAULT_LATTICE = {
+    "h_spacing": 31,
+    "v_spacing": 51,
+    "origin_x": 16,
+    "origin_y": 24,
+    "stagger": 15,
+}
+
 # Terrain classification based on center pixel color
 def classify_terrain_by_color(center_pixel):
     """Classify terrain type based on the center pixel color."""
@@ -60,85 +85,245 @@ def classify_terrain_by_color(center_pixel):
     # Default to rocky_peak for anything else
     return "rocky_peak"
 
-def extract_hex_tiles(image_path, output_dir, h_spacing=31, v_spacing=51):
-    """Extract individual hex tiles from the tileset."""
+def classify_terrain_batch(center_pixels):
+    """Classify an (N, 4) array of center pixels; vectorized classify_terrain_by_color."""
+    px = np.asarray(center_pixels, dtype=np.int32)
+    r, g, b, a = px[:, 0], px[:, 1], px[:, 2], px[:, 3]
+
+    # Same rule chain as classify_terrain_by_color, first match wins
+    conditions = [
+        a < 128,
+        (g > 150) & (g > r * 1.3) & (g > b * 1.3),
+        (20 < g) & (g < 160) & (g > r) & (g > b) & (b < 100),
+        (b > g) & (b > r) & (b > 200) & (r > 180),
+        (b > g) & (b > r) & (b > 150),
+        (b > g) & (b > r) & (b > 100),
+        (b > g) & (b > r),
+        (r > 200) & (100 < g) & (g < 200) & (b < 50),
+        (r > 50) & (r < 150) & (g < 80) & (b < 50),
+        (np.abs(r - g) < 30) & (np.abs(g - b) < 30) & (r > 180),
+        (np.abs(r - g) < 30) & (np.abs(g - b) < 30) & (r > 100),
+        (np.abs(r - g) < 30) & (np.abs(g - b) < 30),
+        (r > 100) & (g > 100) & (b < 80) & (np.abs(r - g) < 50),
+    ]
+    choices = [
+        "", "grass", "forest", "ice_water", "water", "cold_water", "deep_sea",
+        "sand", "hills", "snow_peak", "mountains", "stone", "dry_grassland",
+    ]
+    labels = np.select(conditions, choices, default="rocky_peak")
+    return [str(label) if label else None for label in labels]
+
+def load_sheet(image_path):
+    """Decode a tileset sheet once into an (H, W, 4) uint8 array."""
+    return decode_sheet(image_path)
+
+def hex_crop_size(lattice):
+    """(width, height) of the crop taken around each hex center of a lattice."""
+    return round(lattice["h_spacing"]) - 1, round(lattice["v_spacing"]) + 1
+
+def find_occupied_cells(sheet, lattice, hex_width=30, hex_height=52):
+    """Return (rows, cols, xs, ys) of every lattice cell with an opaque center."""
+    height, width = sheet.shape[:2]
+    rows, cols, xs, ys = lattice_centers(lattice, width, height, hex_width, hex_height)
+    occupied = sheet[ys, xs, 3] >= 128
+    return rows[occupied], cols[occupied], xs[occupied], ys[occupied]
+
+def resample_hexes(sheet, xs, ys, hex_width=30, hex_height=52, output_size=16):
+    """Crop every hex around its center and LANCZOS-resample all of them into an (N, S, S, 4) stack."""
+    height, width = sheet.shape[:2]
+
+    # Same crop boxes as a per-tile img.crop(), clamped to the sheet
+    lefts = np.maximum(0, xs - hex_width//2)
+    tops = np.maximum(0, ys - hex_height//2)
+    rights = np.minimum(width, xs + hex_width//2)
+    bottoms = np.minimum(height, ys + hex_height//2)
+
+    stack = np.zeros((len(xs), output_size, output_size, 4), dtype=np.uint8)
+    shapes = np.stack([bottoms - tops, rights - lefts], axis=1)
+
+    # Clamped edge cells give a few distinct crop shapes; resample each group in one call
+    for crop_h, crop_w in np.unique(shapes, axis=0):
+        group = np.flatnonzero((shapes[:, 0] == crop_h) & (shapes[:, 1] == crop_w))
+        row_idx = tops[group, None] + np.arange(crop_h)
+        col_idx = lefts[group, None] + np.arange(crop_w)
+        stack[group] = lanczos_resize(sheet[row_idx[:, :, None], col_idx[:, None, :]], output_size, output_size)
+
+    return stack
+
+def cell_pixels(sheet, x, y, hex_width=30, hex_height=52):
+    """The sheet pixels under one hex's crop box, clamped to the sheet as resample_hexes clamps it."""
+    return sheet[max(0, y - hex_height//2):y + hex_height//2, max(0, x - hex_width//2):x + hex_width//2]
+
+def resample_cells(sheet, xs, ys, hex_width=30, hex_height=52):
+    """{size: (N, size, size, 4)} LOD levels of the hexes, reusing the warm levels of cells seen before."""
+    # Inside a shared_sheets() block each cell's levels stay warm under a key of its pixels, so cells that
+    # haven't changed since an earlier run (in run_pipeline.py --watch) aren't resampled again
+    warm = warm_cache()
+    if warm is None:
+        cached = [None] * len(xs)
+    else:
+        cell_keys = [hash_bytes("hex_cell", CODE_VERSION, LOD_CODE_VERSION, cell.tobytes(), cell.shape)
+                     for cell in (cell_pixels(sheet, x, y, hex_width, hex_height) for x, y in zip(xs, ys))]
+        cached = [warm.get(key) for key in cell_keys]
+    missing = [i for i, levels in enumerate(cached) if levels is None]
+    if missing:
+        with telemetry.span("crop_resample"):
+            telemetry.count(pixels=len(missing) * hex_width * hex_height)
+            levels = build_pyramid(resample_hexes(sheet, xs[missing], ys[missing], hex_width, hex_height,
+                                                  max(LOD_SIZES)))
+        if warm is None:
+            return levels
+        for j, i in enumerate(missing):
+            cached[i] = warm.put(cell_keys[i], {size: level[j].copy() for size, level in levels.items()})
+    return {size: np.stack([levels[size] for levels in cached]) if cached else
+            np.zeros((0, size, size, 4), dtype=np.uint8) for size in LOD_SIZES}
+
+def iter_cell_bands(image_path, lattice, hex_width=30, hex_height=52, stream=False):
+    """Yield (sheet, rows, cols, xs, ys) of occupied cells, with ys relative to the yielded pixels."""
+    if not stream:
+        sheet = load_sheet(image_path)
+        yield (sheet,) + find_occupied_cells(sheet, lattice, hex_width, hex_height)
+        return
+
+    # Streaming: each band is only the rows one lattice row's crops cover, decoded in strips of the row pitch
+    width, height = sheet_size(image_path)
+    rows, cols, xs, ys = lattice_centers(lattice, width, height, hex_width, hex_height)
+    lattice_rows = np.unique(rows)
+    band_ys = [ys[rows == row][0] for row in lattice_rows]
+    bands = [(max(0, y - hex_height//2), min(height, y + hex_height//2)) for y in band_ys]
+
+    strip_rows = max(1, math.ceil(lattice["v_spacing"]))
+    for index, band in iter_row_bands(image_path, bands, strip_rows):
+        in_row = rows == lattice_rows[index]
+        band_ys = ys[in_row] - bands[index][0]
+        occupied = band[band_ys, xs[in_row], 3] >= 128
+        yield band, rows[in_row][occupied], cols[in_row][occupied], xs[in_row][occupied], band_ys[occupied]
+
+def warm_cells(image_path, lattice=None, stream=False):
+    """Resample every occupied cell of a sheet into the open warm cache, as extraction would."""
+    lattice = lattice or load_lattice(image_path) or DEFAULT_LATTICE
+    hex_width, hex_height = hex_crop_size(lattice)
+    for sheet, _, _, xs, ys in iter_cell_bands(image_path, lattice, hex_width, hex_height, stream):
+        resample_cells(sheet, xs, ys, hex_width, hex_height)
+
+def extract_hex_tiles(image_path, output_dir, lattice=None, stream=False, lut_path=LUT_PATH, workers=1):
+    """Extract individual hex tiles from the tileset; lut_path=None classifies by the color rules."""
     print(f"\nExtracting hex tiles from: {image_path}")
-    img = Image.open(image_path).convert('RGBA')
-    width, height = img.size
 
     os.makedirs(output_dir, exist_ok=True)
 
+    # Use the lattice detected by analyze_hex_tileset.py when there is one
+    if lattice is None:
+        lattice = load_lattice(image_path)
+        if lattice is None:
+            print("  No lattice sidecar found, using default spacing")
+            lattice = DEFAULT_LATTICE
+    print(f"  Lattice: h={lattice['h_spacing']}, v={lattice['v_spacing']}, "
+          f"origin=({lattice['origin_x']}, {lattice['origin_y']}), stagger={lattice['stagger']}")
+
     # Hex extraction parameters
-    hex_width = 30  # Width to extract around center
-    hex_height = 52  # Height to extract around center
+    hex_width, hex_height = hex_crop_size(lattice)  # Size to extract around center
     output_size = 16  # Final size
 
-    extracted = 0
-    terrain_counts = Counter()
+    lut = load_lut(lut_path)
+    print(f"  Terrain: {'lookup table ' + lut_path if lut is not None else 'center pixel color rules'}")
 
-    # Extract hexes based on grid layout
-    for row in range(10):
-        y = 24 + row * v_spacing
-        if y >= height - hex_height//2:
-            break
+    # Nothing to do if neither the sheet, the lattice, the lookup table nor this script changed
+    cache = BuildCache(output_dir, "extract_fantasy_hex_tiles")
+    # Keyed on the table rather than the file, so retraining to the same table rebuilds nothing
+    inputs_key = hash_bytes(CODE_VERSION, LOD_CODE_VERSION, hash_file(image_path), lattice, output_size, LOD_SIZES,
+                            hash_bytes(lut[0].tobytes(), lut[1]) if lut is not None else None)
+    if pyramid_up_to_date(output_dir, "extract_fantasy_hex_tiles", inputs_key) and cache.inputs_unchanged(inputs_key):
+        cache.finish(inputs_key)
+        print(f"Up to date: {len(cache.outputs)} tiles unchanged")
+        return len(cache.outputs)
 
-        for col in range(10):
-            # Offset every other row for hexagonal layout
-            offset = (h_spacing // 2) if row % 2 == 1 else 0
-            x = 16 + col * h_spacing + offset
+    terrain_counts = Counter()
+    lod_writer = PyramidWriter(output_dir, "extract_fantasy_hex_tiles")
+    extracted = 0
 
-            if x >= width - hex_width//2:
-                continue
+    # One band for the whole sheet, or one per hex row when streaming; tiles come out in the same order
+    for sheet, rows, cols, xs, ys in iter_cell_bands(image_path, lattice, hex_width, hex_height, stream):
+        center_pixels = sheet[ys, xs]
+        cells = [cell_pixels(sheet, x, y, hex_width, hex_height) for x, y in zip(xs, ys)]
 
-            # Check if there's content at this position
-            if x < width and y < height:
-                try:
-                    pixel = img.getpixel((x, y))
-                    if pixel[3] < 128:  # Skip if mostly transparent
-                        continue
-                except:
-                    continue
+        # Resampled once to the top LOD level; every smaller level, including the 16px tile, derives from it
+        pyramid = resample_cells(sheet, xs, ys, hex_width, hex_height)
+        stack = pyramid[output_size]
 
-                # Extract hex tile area
-                left = max(0, x - hex_width//2)
-                top = max(0, y - hex_height//2)
-                right = min(width, x + hex_width//2)
-                bottom = min(height, y + hex_height//2)
+        with telemetry.span("classify"):
+            if lut is not None:
+                # Every pixel of the top level votes, the resolution the table was trained at
+                telemetry.count(pixels=pyramid[max(LOD_SIZES)][..., 0].size)
+                terrain_types = classify_hexes(pyramid[max(LOD_SIZES)], *lut)
+            else:
+                telemetry.count(pixels=len(center_pixels))
+                terrain_types = classify_terrain_batch(center_pixels)
 
-                hex_img = img.crop((left, top, right, bottom))
+        tiles = []
 
-                # Classify terrain by center pixel color
-                center_pixel = img.getpixel((x, y))
-                terrain_type = classify_terrain_by_color(center_pixel)
+        for i, terrain_type in enumerate(terrain_types):
+            if terrain_type is None:
+                continue
 
-                if terrain_type is None:
-                    continue
+            terrain_counts[terrain_type] += 1
 
-                terrain_counts[terrain_type] += 1
+            # Create filename with variant number
+            count = terrain_counts[terrain_type] - 1
+            if count == 0:
+                filename = f"{terrain_type}.png"
+            else:
+                filename = f"{terrain_type}_{count}.png"
 
-                # Create filename with variant number
-                count = terrain_counts[terrain_type] - 1
-                if count == 0:
-                    filename = f"{terrain_type}.png"
-                else:
-                    filename = f"{terrain_type}_{count}.png"
+            # Key on the source pixels under this hex, so editing one cell only rewrites its tile
+            key = hash_bytes(CODE_VERSION, LOD_CODE_VERSION, cells[i].tobytes(), cells[i].shape, output_size, filename)
+            tiles.append((i, filename, key, cache.keep(filename, key)))
 
-                # Resize to 16x16
-                resized = hex_img.resize((output_size, output_size), Image.Resampling.LANCZOS)
+        # PNG encoding dominates, so only stale tiles are encoded, fanned out across the workers
+        stale = [i for i, filename, key, fresh in tiles if not fresh]
+        with telemetry.span("encode"):
+            telemetry.count(pixels=len(stale) * output_size * output_size)
+            encoded = dict(zip(stale, parallel_map(encode_png, [stack[i] for i in stale], workers)))
 
+        with telemetry.span("write"):
+            for i, filename, key, fresh in tiles:
                 # Save
-                output_path = os.path.join(output_dir, filename)
-                resized.save(output_path)
+                written = not fresh and cache.store(filename, key, encoded[i])
+                cache.describe(filename, source={"sheet": image_path, "row": int(rows[i]), "col": int(cols[i])})
 
                 extracted += 1
-                r, g, b, a = center_pixel
-                print(f"  [{extracted:2d}] ({row}, {col}): {filename:25s} RGB({r:3d},{g:3d},{b:3d})")
-
-    print(f"\nExtraction complete: {extracted} tiles")
+                r, g, b, a = center_pixels[i]
+                status = "" if written else " (unchanged)"
+                telemetry.detail(f"  [{extracted:2d}] ({rows[i]}, {cols[i]}): "
+                                 f"{filename:25s} RGB({r:3d},{g:3d},{b:3d}){status}")
+
+        # The same tiles at every LOD level, in lod<size>/ beside the 16px tiles
+        indices = [i for i, filename, key, fresh in tiles]
+        lod_writer.write([filename for i, filename, key, fresh in tiles],
+                         [key for i, filename, key, fresh in tiles],
+                         {size: level[indices] for size, level in pyramid.items()}, workers)
+
+    cache.finish(inputs_key)
+    lod_writer.finish(inputs_key)
+
+    print(f"\nLOD pyramid: {', '.join(f'{size}px' for size in LOD_SIZES)} ({lod_writer.written} files written)")
+    print(f"Extraction complete: {extracted} tiles ({cache.written} written, {cache.skipped} unchanged)")
     print(f"Terrain types found: {dict(terrain_counts)}")
     return extracted
 
 def main():
+    parser = argparse.ArgumentParser(description="Extract fantasy hex tiles from the tileset sheets.")
+    add_workers_argument(parser)
+    parser.add_argument("--stream", action="store_true",
+                        help="decode sheets one hex row at a time, so memory follows the row height, not the sheet size")
+    parser.add_argument("--lut", default=LUT_PATH, help=f"terrain lookup table (default {LUT_PATH})")
+    parser.add_argument("--color-rules", action="store_true",
+                        help="classify by the center pixel color rules even if there is a lookup table")
+    telemetry.add_telemetry_arguments(parser)
+    args = parser.parse_args()
+    telemetry.configure_from_args(args)
+    workers = resolve_workers(args.workers)
+
     print("="*70)
     print("FANTASY HEX TILE EXTRACTOR WITH COLOR DETECTION")
     print("="*70)
@@ -149,26 +334,15 @@ def main():
     bordered_output = "godot_project/assets/tile_art/fantasy_bordered"
     borderless_output = "godot_project/assets/tile_art/fantasy_borderless"
 
-    # Clear old extracted tiles
-    for output_dir in [bordered_output, borderless_output]:
-        if os.path.exists(output_dir):
-            for file in os.listdir(output_dir):
-                if file.endswith('.png'):
-                    os.remove(os.path.join(output_dir, file))
-            print(f"Cleared old tiles from {output_dir}")
-
-    # Extract bordered tileset
-    if os.path.exists(bordered_input):
-        extract_hex_tiles(bordered_input, bordered_output)
-
-    print("\n" + "="*70)
-
-    # Extract borderless tileset
-    if os.path.exists(borderless_input):
-        extract_hex_tiles(borderless_input, borderless_output)
+    # Extract the bordered and borderless tilesets side by side
+    lut_path = None if args.color_rules else args.lut
+    jobs = [(input_path, output_dir, None, args.stream, lut_path) for input_path, output_dir in
+            [(bordered_input, bordered_output), (borderless_input, borderless_output)]
+            if os.path.exists(input_path)]
+    run_jobs(extract_hex_tiles, jobs, workers)
 
     print("\n" + "="*70)
-    print("All tiles extracted and resized to 16x16!")
+    print("All tiles extracted and resized to 16x16, with LOD levels in lod*/!")
     print("=" * 70)
 
 if __name__ == "__main__":
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Write the Godot .png.import sidecars of the pipeline's PNGs from per-class profiles.
+
+Without a sidecar the editor imports a new PNG with its defaults on the next
+open, so the import settings of the generated textures were whatever the
+editor picked. This writes them instead, from one profile per asset class:
+
+  tiles  terrain tiles, LOD levels and palette-indexed tiles: lossless, no
+         mipmaps, and no alpha border fix, which would change the color of
+         transparent texels (and so the indices of indexed tiles)
+  atlas  the packed style atlases: lossless with mipmaps, for zoomed-out maps
+  cards  card illustration tiers: VRAM compressed, in the formats the project
+         imports (S3TC/BPTC, plus ETC2/ASTC per project.godot)
+
+The PNGs covered are the ones some pipeline script recorded in its build
+cache, so hand-made art keeps the sidecars committed with it. uid and
+dest_files are derived from the res:// path the way Godot derives them, so a
+sidecar's text depends only on its PNG's path and class, and a sidecar is only
+rewritten when that text changes. Filtering is not an import setting in Godot 4;
+the tiles' nearest filtering belongs to the node that draws them.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+
+from build_cache import CACHE_FILENAME, BuildCache, code_version, hash_bytes
+from generate_resource_preloader import ASSETS_DIR, GODOT_DIR, res_path
+
+CODE_VERSION = code_version(__file__)
+
+PRODUCER = "generate_import_sidecars"
+PROJECT_FILE = f"{GODOT_DIR}/project.godot"
+
+# ResourceImporterTexture's options in the order Godot 4.5 writes them, with its defaults
+DEFAULT_PARAMS = {
+    "compress/mode": "0",
+    "compress/high_quality": "false",
+    "compress/lossy_quality": "0.7",
+    "compress/uastc_level": "0",
+    "compress/rdo_quality_loss": "0.0",
+    "compress/hdr_compression": "1",
+    "compress/normal_map": "0",
+    "compress/channel_pack": "0",
+    "mipmaps/generate": "false",
+    "mipmaps/limit": "-1",
+    "roughness/mode": "0",
+    "roughness/src_normal": '""',
+    "process/channel_remap/red": "0",
+    "process/channel_remap/green": "1",
+    "process/channel_remap/blue": "2",
+    "process/channel_remap/alpha": "3",
+    "process/fix_alpha_border": "true",
+    "process/premult_alpha": "false",
+    "process/normal_map_invert_y": "false",
+    "process/hdr_as_srgb": "false",
+    "process/hdr_clamp_exposure": "false",
+    "process/size_limit": "0",
+    "detect_3d/compress_to": "1",
+}
+
+COMPRESS_LOSSLESS = "0"
+COMPRESS_VRAM = "2"
+
+# Overrides of DEFAULT_PARAMS per asset class; detect_3d is off so use in 3D can't switch a class to VRAM
+PROFILES = {
+    "tiles": {"compress/mode": COMPRESS_LOSSLESS, "mipmaps/generate": "false",
+              "process/fix_alpha_border": "false", "detect_3d/compress_to": "0"},
+    "atlas": {"compress/mode": COMPRESS_LOSSLESS, "mipmaps/generate": "true",
+              "process/fix_alpha_border": "true", "detect_3d/compress_to": "0"},
+    "cards": {"compress/mode": COMPRESS_VRAM, "mipmaps/generate": "false",
+              "process/fix_alpha_border": "true", "detect_3d/compress_to": "0"},
+}
+
+# Godot's names for each VRAM format pair: (path suffix, imported_formats entry, project setting)
+VRAM_FORMATS = [
+    ("s3tc", "s3tc_bptc", "textures/vram_compression/import_s3tc_bptc", True),
+    ("etc2", "etc2_astc", "textures/vram_compression/import_etc2_astc", False),
+]
+
+# Characters of a uid:// string, as ResourceUID::id_to_text spells a 63-bit id
+UID_DIGITS = "abcdefghijklmnopqrstuvwxyz01234567"
+
+def asset_class(path):
+    """Profile name of a generated PNG by where it lives, or None for PNGs no profile covers."""
+    parts = os.path.relpath(path, ASSETS_DIR).split(os.sep)
+    if parts[0] == "card_art":
+        return "cards"
+    if parts[0] == "tile_art":
+        return "atlas" if parts[1] == "atlas" else "tiles"
+    return None
+
+def generated_pngs(root=ASSETS_DIR):
+    """Every PNG under root that a pipeline script's build cache says it wrote."""
+    paths = set()
+    for manifest_path in glob.glob(os.path.join(root, "**", CACHE_FILENAME), recursive=True):
+        directory = os.path.dirname(manifest_path)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        for producer, section in manifest.items():
+            if producer != PRODUCER:
+                paths.update(os.path.join(directory, filename) for filename in section.get("outputs", {})
+                             if filename.endswith(".png") and os.path.exists(os.path.join(directory, filename)))
+    return sorted(paths)
+
+def project_settings(path=PROJECT_FILE):
+    """{section/key: raw value} of project.godot, enough to read the VRAM import formats."""
+    settings = {}
+    section = ""
+    if not os.path.exists(path):
+        return settings
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("[") and line.endswith("]"):
+                section = line[1:-1]
+            elif "=" in line and not line.startswith(";"):
+                key, value = line.split("=", 1)
+                settings[f"{section}/{key}"] = value
+    return settings
+
+def vram_formats(settings):
+    """(path suffix, format name) of each VRAM format the project imports."""
+    return [(suffix, name) for suffix, name, key, default in VRAM_FORMATS
+            if settings.get(f"rendering/{key}", str(default).lower()) == "true"]
+
+def uid_text(res):
+    """A stable uid:// for a res:// path: a 63-bit id from its hash, spelled as Godot spells ids."""
+    value = int(hashlib.sha256(res.encode()).hexdigest()[:16], 16) & 0x7FFFFFFFFFFFFFFF
+    text = ""
+    while value:
+        value, digit = divmod(value, len(UID_DIGITS))
+        text = UID_DIGITS[digit] + text
+    return "uid://" + text
+
+def render_sidecar(path, profile, formats):
+    """Text of a PNG's .import file under a profile, as the editor would write it."""
+    res = res_path(path)
+    # The editor's imported file name: the file name plus the MD5 of its res:// path
+    base = f"res://.godot/imported/{os.path.basename(path)}-{hashlib.md5(res.encode()).hexdigest()}"
+    params = dict(DEFAULT_PARAMS, **PROFILES[profile])
+    if params["compress/mode"] == COMPRESS_VRAM and formats:
+        dest_files = [f"{base}.{suffix}.ctex" for suffix, _ in formats]
+        remap = [f'path.{suffix}="{dest}"' for (suffix, _), dest in zip(formats, dest_files)]
+        metadata = ['"imported_formats": [' + ", ".join(f'"{name}"' for _, name in formats) + "],",
+                    '"vram_texture": true']
+    else:
+        dest_files = [f"{base}.ctex"]
+        remap = [f'path="{dest_files[0]}"']
+        metadata = ['"vram_texture": false']
+    lines = ["[remap]", "", 'importer="texture"', 'type="CompressedTexture2D"', f'uid="{uid_text(res)}"']
+    lines += remap + ["metadata={"] + metadata + ["}", "", "[deps]", "", f'source_file="{res}"']
+    lines += ["dest_files=[" + ", ".join(f'"{dest}"' for dest in dest_files) + "]", "", "[params]", ""]
+    lines += [f"{key}={value}" for key, value in params.items()]
+    return "\n".join(lines) + "\n"
+
+def write_sidecars(root=ASSETS_DIR):
+    """Write the sidecar of every generated PNG under root; returns how many were rewritten."""
+    formats = vram_formats(project_settings())
+    by_directory = {}
+    for path in generated_pngs(root):
+        profile = asset_class(path)
+        if profile is not None:
+            by_directory.setdefault(os.path.dirname(path), []).append((path, profile))
+
+    totals = {profile: [0, 0] for profile in PROFILES}
+    # Directories that had sidecars before but no PNGs now still get their stale sidecars pruned
+    previous = [os.path.dirname(path) for path in glob.glob(os.path.join(root, "**", CACHE_FILENAME), recursive=True)]
+    for directory in sorted(set(by_directory) | set(previous)):
+        cache = BuildCache(directory, PRODUCER)
+        if not by_directory.get(directory) and not cache.outputs:
+            continue
+        for path, profile in by_directory.get(directory, []):
+            text = render_sidecar(path, profile, formats)
+            filename = os.path.basename(path) + ".import"
+            totals[profile][0] += 1
+            totals[profile][1] += cache.write(filename, hash_bytes(CODE_VERSION, text), text.encode())
+        cache.finish()
+
+    for profile, (count, rewritten) in totals.items():
+        print(f"  {profile:6s} {count:5d} sidecars, {rewritten} rewritten")
+    return sum(rewritten for _, rewritten in totals.values())
+
+def main():
+    parser = argparse.ArgumentParser(description="Write .png.import sidecars for the pipeline's PNGs.")
+    parser.add_argument("--root", default=ASSETS_DIR, help=f"directory to cover (default {ASSETS_DIR})")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("GODOT IMPORT SIDECARS")
+    print("=" * 70)
+
+    written = write_sidecars(args.root)
+
+    print("\n" + "=" * 70)
+    print(f"Done: {written} sidecar(s) written")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
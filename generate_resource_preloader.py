@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Generate godot_project/scripts/resource_preloader.gd from the pipeline's outputs.
+
+The preloader lists the card illustrations and terrain tiles on disk, grouped
+per tileset style and LOD level (tiles/<style>, tiles/<style>/lod<size>,
+tiles/<style>/indexed), with variants dedupe_tiles.py redirected left out.
+Once process_card_art.py has run, the cards group holds the hand-size
+illustrations and the larger tiers get groups of their own (cards/<tier>).
+Groups are plain path lists, so nothing loads at startup: the game requests
+the groups it needs (the cards and the active style) and they load in the
+background.
+
+Assets that no .gd, .tscn or .tres file references are reported and, unless
+--all is given, left out of the groups. A reference is the asset's res://
+path, a texture named by a referenced JSON manifest (the atlas manifests), or
+a path the scripts build at run time from a referenced directory and a name
+they spell out, such as a card name or a terrain name plus "_river".
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+
+from build_cache import BuildCache, code_version, hash_bytes
+from index_tile_palette import INDEXED_DIR, PALETTE_FILENAME
+from lod_pyramid import LOD_SIZES, lod_dir
+from pack_tile_atlas import ATLAS_DIR, collect_style_tiles
+from process_card_art import CARD_TIERS, load_manifest
+from terrain_types import TILESET_STYLES
+
+CODE_VERSION = code_version(__file__)
+
+GODOT_DIR = "godot_project"
+ASSETS_DIR = f"{GODOT_DIR}/assets"
+CARD_ART_DIR = f"{ASSETS_DIR}/card_art"
+PRELOADER_PATH = f"{GODOT_DIR}/scripts/resource_preloader.gd"
+SOURCE_EXTENSIONS = (".gd", ".tscn", ".tres")
+
+# String literals in GDScript and Godot resource files
+STRING_LITERAL = re.compile(r'"((?:[^"\\\n]|\\.)*)"|\'((?:[^\'\\\n]|\\.)*)\'')
+
+def res_path(path):
+    """res:// path of a file under the Godot project."""
+    return "res://" + os.path.relpath(path, GODOT_DIR).replace(os.sep, "/")
+
+def project_path(res):
+    """Filesystem path of a res:// path."""
+    return os.path.join(GODOT_DIR, res.removeprefix("res://"))
+
+def card_groups():
+    """The cards group, with the hand tier of the illustrations once they are processed, and one per larger tier."""
+    manifest = load_manifest()
+    if manifest is None:
+        return {"cards": sorted(glob.glob(f"{CARD_ART_DIR}/*.png") + glob.glob(f"{CARD_ART_DIR}/*/*.png"))}
+    tiers = {tier: sorted({project_path(paths[tier]) for paths in manifest["illustrations"].values()})
+             for tier in CARD_TIERS}
+    hand = next(iter(CARD_TIERS))
+    groups = {"cards": sorted(glob.glob(f"{CARD_ART_DIR}/*.png")) + tiers.pop(hand)}
+    # A tier that reuses the file of the one below (art too small to grow) is already in that group
+    loaded = set(groups["cards"])
+    for tier, paths in tiers.items():
+        groups[f"cards/{tier}"] = [path for path in paths if path not in loaded]
+        loaded.update(paths)
+    return groups
+
+def asset_groups():
+    """Map group name -> asset paths: the cards, then each style's tiles, LOD levels and indexed tiles."""
+    groups = card_groups()
+    for style, style_dir in TILESET_STYLES.items():
+        # Only the style's own tiles; fallback art belongs to the original group
+        names = [os.path.basename(path) for path in collect_style_tiles(style_dir).values()]
+        atlas = os.path.join(ATLAS_DIR, f"{style}.png")
+        groups[f"tiles/{style}"] = ([atlas] if os.path.exists(atlas) else []) + \
+            [os.path.join(style_dir, name) for name in names]
+        for size in LOD_SIZES:
+            groups[f"tiles/{style}/lod{size}"] = [os.path.join(lod_dir(style_dir, size), name) for name in names
+                                                 if os.path.exists(os.path.join(lod_dir(style_dir, size), name))]
+        indexed = os.path.join(INDEXED_DIR, style)
+        groups[f"tiles/{style}/indexed"] = [os.path.join(indexed, name) for name in [PALETTE_FILENAME] + names
+                                            if os.path.exists(os.path.join(indexed, name))]
+    return {group: paths for group, paths in groups.items() if paths}
+
+def read_literals(paths):
+    """Every string literal in the given source files."""
+    literals = set()
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            literals.update(a or b for a, b in STRING_LITERAL.findall(f.read()))
+    return literals
+
+def json_strings(value):
+    """Every string inside a decoded JSON value."""
+    if isinstance(value, str):
+        return {value}
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, list):
+        return set().union(*(json_strings(item) for item in value)) if value else set()
+    return set()
+
+def scan_references(exclude=(PRELOADER_PATH,)):
+    """String literals of the project's scripts and scenes, plus those of the JSON manifests they name."""
+    sources = [os.path.join(root, filename) for root, _, filenames in os.walk(GODOT_DIR)
+               if ".godot" not in root.split(os.sep) for filename in filenames
+               if filename.endswith(SOURCE_EXTENSIONS)]
+    exclude = {os.path.normpath(path) for path in exclude}
+    literals = read_literals([path for path in sources if os.path.normpath(path) not in exclude])
+
+    # A referenced manifest references what it names, and so on
+    followed = set()
+    pending = [literal for literal in literals if literal.startswith("res://") and literal.endswith(".json")]
+    while pending:
+        manifest = pending.pop()
+        if manifest in followed or not os.path.exists(project_path(manifest)):
+            continue
+        followed.add(manifest)
+        with open(project_path(manifest)) as f:
+            found = json_strings(json.load(f)) - literals
+        literals |= found
+        pending += [literal for literal in found if literal.startswith("res://") and literal.endswith(".json")]
+    return literals
+
+def reference_index(literals):
+    """(exact res:// paths, directories paths are built in, names, name suffixes) from string literals."""
+    exact, directories = set(), set()
+    for literal in literals:
+        if not literal.startswith("res://"):
+            continue
+        # "res://dir/%s.png" or "res://dir/" + name: the directory is where the path gets built
+        cut = literal.find("%")
+        if cut >= 0 or literal.endswith("/"):
+            directories.add(literal[:literal.rfind("/", 0, cut if cut >= 0 else len(literal)) + 1])
+        else:
+            exact.add(literal)
+    # Card names become file names lowercased with underscores, as in card_ui.gd
+    names = {literal.lower().replace(" ", "_") for literal in literals if literal and "/" not in literal}
+    suffixes = {os.path.splitext(literal)[0] for literal in literals if literal.startswith("_")}
+    return exact, directories, names, suffixes
+
+def is_referenced(path, index):
+    """True if the scripts name the asset's path, or can build it from a directory and names they spell out."""
+    exact, directories, names, suffixes = index
+    res = res_path(path)
+    if res in exact:
+        return True
+    directory, filename = res.rsplit("/", 1)
+    if directory + "/" not in directories:
+        return False
+    stem = os.path.splitext(filename)[0]
+    return stem in names or any(stem.endswith(suffix) and stem[:-len(suffix)] in names for suffix in suffixes)
+
+def unused_assets(index):
+    """Every PNG under the assets directory that the project doesn't reference."""
+    paths = sorted(glob.glob(f"{ASSETS_DIR}/**/*.png", recursive=True))
+    return [path for path in paths if not is_referenced(path, index)]
+
+def render_preloader(groups):
+    """GDScript source of the preloader for the given groups."""
+    lines = [
+        "extends Node",
+        "",
+        "# Generated by generate_resource_preloader.py from the tile pipeline's output; don't edit by hand.",
+        "# Card and tile textures are grouped per tileset style and LOD level, and nothing loads at startup",
+        "# beyond what _ready() requests. request_group() starts a group loading in the background,",
+        "# get_group() waits for it, and release_group() lets it be freed.",
+        "",
+        "const GROUPS = {",
+    ]
+    for group, paths in groups.items():
+        lines.append(f"\t{json.dumps(group)}: [")
+        lines += [f"\t\t{json.dumps(res_path(path))}," for path in paths]
+        lines.append("\t],")
+    lines += [
+        "}",
+        "",
+        "# Group of each world_map.gd TilesetStyle, in enum order",
+        "const STYLE_GROUPS = [" + ", ".join(json.dumps(f"tiles/{style}") for style in TILESET_STYLES) + "]",
+        "",
+        "# Resources of each requested group by path, held so they stay cached until released",
+        "static var _loaded = {}",
+        "",
+        "",
+        "func _ready():",
+        "\trequest_group(\"cards\")",
+        "\trequest_group(style_group(0))",
+        "",
+        "",
+        "static func style_group(style: int, lod_size: int = 0) -> String:",
+        "\t# Group of a TilesetStyle's tiles, or of one of their LOD levels",
+        "\tvar group = STYLE_GROUPS[style]",
+        "\treturn group if lod_size == 0 else \"%s/lod%d\" % [group, lod_size]",
+        "",
+        "",
+        "static func request_group(group: String) -> void:",
+        "\t# Start loading a group's resources in the background; requesting a group again does nothing",
+        "\tif _loaded.has(group) or not GROUPS.has(group):",
+        "\t\treturn",
+        "\t_loaded[group] = {}",
+        "\tfor path in GROUPS[group]:",
+        "\t\tResourceLoader.load_threaded_request(path)",
+        "",
+        "",
+        "static func get_group(group: String) -> Dictionary:",
+        "\t# A group's resources by path, waiting for any still loading",
+        "\trequest_group(group)",
+        "\tvar resources: Dictionary = _loaded.get(group, {})",
+        "\tfor path in GROUPS.get(group, []):",
+        "\t\tif not resources.has(path):",
+        "\t\t\tresources[path] = ResourceLoader.load_threaded_get(path)",
+        "\treturn resources",
+        "",
+        "",
+        "static func release_group(group: String) -> void:",
+        "\t# Drop the group's references; resources nothing else holds are freed. Loads never collected with",
+        "\t# get_group() are collected first, or the loader would keep holding them.",
+        "\tif not _loaded.has(group):",
+        "\t\treturn",
+        "\tvar resources: Dictionary = _loaded[group]",
+        "\tfor path in GROUPS[group]:",
+        "\t\tif not resources.has(path) and \\",
+        "\t\t\t\tResourceLoader.load_threaded_get_status(path) != ResourceLoader.THREAD_LOAD_INVALID_RESOURCE:",
+        "\t\t\tResourceLoader.load_threaded_get(path)",
+        "\t_loaded.erase(group)",
+    ]
+    return "\n".join(lines) + "\n"
+
+def build_preloader(include_unused=False, output_path=PRELOADER_PATH):
+    """(preloader source, groups, unreferenced asset paths) for the assets on disk."""
+    index = reference_index(scan_references(exclude=(output_path,)))
+    unused = unused_assets(index)
+    groups = asset_groups()
+    if not include_unused:
+        skipped = set(unused)
+        groups = {group: [path for path in paths if path not in skipped] for group, paths in groups.items()}
+        groups = {group: paths for group, paths in groups.items() if paths}
+    return render_preloader(groups), groups, unused
+
+def generate_preloader(include_unused=False, output_path=PRELOADER_PATH):
+    """Write the preloader; returns the unreferenced asset paths."""
+    source, groups, unused = build_preloader(include_unused, output_path)
+    cache = BuildCache(os.path.dirname(output_path), "generate_resource_preloader")
+    inputs_key = hash_bytes(CODE_VERSION, source)
+    written = cache.write(os.path.basename(output_path), inputs_key, source.encode())
+    cache.finish(inputs_key, prune=False)
+
+    print(f"{output_path}: {sum(len(paths) for paths in groups.values())} assets in {len(groups)} groups"
+          f"{'' if written else ' (unchanged)'}")
+    for group, paths in groups.items():
+        print(f"  {group:36s} {len(paths):4d}")
+    return unused
+
+def report_unused(unused, shown=6):
+    """Print unreferenced assets per directory, with what they add to the export."""
+    if not unused:
+        print("\nEvery asset is referenced")
+        return
+    by_directory = {}
+    for path in unused:
+        by_directory.setdefault(os.path.dirname(path), []).append(path)
+    total = sum(os.path.getsize(path) for path in unused)
+    print(f"\nUnreferenced assets: {len(unused)} files, {total / 1024:.1f} KiB")
+    for directory, paths in by_directory.items():
+        size = sum(os.path.getsize(path) for path in paths)
+        names = [os.path.basename(path) for path in paths]
+        more = f", ... ({len(names) - shown} more)" if len(names) > shown else ""
+        print(f"  {os.path.relpath(directory, ASSETS_DIR)}/: {len(paths)} files, {size / 1024:.1f} KiB "
+              f"({', '.join(names[:shown])}{more})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate resource_preloader.gd from the pipeline's outputs.")
+    parser.add_argument("--all", action="store_true", help="keep unreferenced assets in the groups")
+    parser.add_argument("--check", action="store_true",
+                        help="don't write; exit with status 1 if resource_preloader.gd is out of date")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("RESOURCE PRELOADER GENERATOR")
+    print("=" * 70)
+
+    if args.check:
+        # The drift check for CI: the checked-in file must match what the assets on disk generate
+        source, groups, unused = build_preloader(args.all)
+        with open(PRELOADER_PATH) as f:
+            if f.read() != source:
+                print(f"{PRELOADER_PATH} is out of date; run generate_resource_preloader.py")
+                sys.exit(1)
+        print(f"{PRELOADER_PATH} is up to date")
+        report_unused(unused)
+        return
+
+    report_unused(generate_preloader(args.all))
+
+    print("\n" + "=" * 70)
+    print(f"Preloader written to {PRELOADER_PATH}")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,13 @@ var hover_timer: Timer
 const CARD_WIDTH = 150
 const CARD_HEIGHT = 250
 
+# Illustrations resized per display tier by process_card_art.py
+const ILLUSTRATION_MANIFEST = "res://assets/card_art/tiers/manifest.json"
+static var _illustration_tiers = null
+
+# Tier of the illustration shown: "hand", "hover" while hovered, "full" in the enlarged view
+var illustration_tier: String = "hand"
+
 var card_background_texture: Texture2D = preload("res://assets/card_art/card_background.png")
 var default_illustration_texture: Texture2D = preload("res://assets/card_art/illustrations/citizen.png")
 
@@ -102,11 +109,7 @@ func _update_display():
 	type_label.text = "[%s]" % card.card_type.capitalize()
 	description_label.text = card.card_description
 	
-	var illustration_path = "res://assets/card_art/illustrations/%s.png" % card.card_name.to_lower().replace(" ", "_")
-	if FileAccess.file_exists(illustration_path):
-		illustration_rect.texture = load(illustration_path)
-	else:
-		illustration_rect.texture = default_illustration_texture
+	_update_illustration()
 
 	# Style based on card color and rarity
 	var style_box = StyleBoxFlat.new()
@@ -125,6 +128,33 @@ func _update_display():
 	else:
 		modulate = Color(1.0, 1.0, 1.0, 1.0)
 
+static func illustration_path(card_name: String, tier: String) -> String:
+	"""Path of a card's illustration at a display tier, or of its source art if the tiers haven't been built."""
+	if _illustration_tiers == null:
+		_illustration_tiers = {}
+		if FileAccess.file_exists(ILLUSTRATION_MANIFEST):
+			var manifest = JSON.parse_string(FileAccess.get_file_as_string(ILLUSTRATION_MANIFEST))
+			if manifest is Dictionary:
+				_illustration_tiers = manifest.get("illustrations", {})
+	var stem = card_name.to_lower().replace(" ", "_")
+	return _illustration_tiers.get(stem, {}).get(tier, "res://assets/card_art/illustrations/%s.png" % stem)
+
+func _update_illustration():
+	"""Show the card's illustration at the current tier."""
+	var path = illustration_path(card.card_name, illustration_tier)
+	if FileAccess.file_exists(path):
+		illustration_rect.texture = load(path)
+	else:
+		illustration_rect.texture = default_illustration_texture
+
+func set_illustration_tier(tier: String):
+	"""Switch to the illustration resized for another display tier."""
+	if tier == illustration_tier:
+		return
+	illustration_tier = tier
+	if card:
+		_update_illustration()
+
 func _on_mouse_entered():
 	is_hovered = true
 	# Enlarge slightly on hover with smooth animation
@@ -134,6 +164,7 @@ func _on_mouse_entered():
 		tween.set_ease(Tween.EASE_OUT)
 		tween.tween_property(self, "scale", Vector2(1.15, 1.15), 0.2)
 		z_index = 10
+		set_illustration_tier("hover")
 		card_hovered.emit(card)
 		hover_timer.start()
 
@@ -145,6 +176,7 @@ func _on_mouse_exited():
 	tween.set_ease(Tween.EASE_IN)
 	tween.tween_property(self, "scale", Vector2(1.0, 1.0), 0.15)
 	z_index = 0
+	set_illustration_tier("hand")
 	card_unhovered.emit()
 	hover_timer.stop()
 	request_hide_enlarged_view.emit()
@@ -53,8 +53,10 @@ const CIV_COLORS = [
 ]
 
 var WorldGeneratorScript = preload("res://scripts/world_generator.gd")
+const AssetGroups = preload("res://scripts/resource_preloader.gd")
 
 var _terrain_tile_source_ids = {} # New member variable to store the mapping
+var _terrain_tile_atlas_coords = {} # Atlas coords per "terrain_id_has_river" key (Vector2i(0, 0) for per-file sources)
 
 # Names corresponding to terrain_id for file naming (must match generate_tiles.py)
 const TERRAIN_NAMES = {
@@ -67,6 +69,13 @@ const TERRAIN_NAMES = {
 # Rivers are allowed on these terrain_ids (must match generate_tiles.py)
 const ALLOWS_RIVERS = [2, 3, 4, 5, 6, 10, 13, 14, 15]
 
+# Atlas manifests written by pack_tile_atlas.py, one per tileset style
+const TERRAIN_ATLAS_MANIFESTS = {
+	TilesetStyle.ORIGINAL: "res://assets/tile_art/atlas/original.json",
+	TilesetStyle.FANTASY_BORDERED: "res://assets/tile_art/atlas/fantasy_bordered.json",
+	TilesetStyle.FANTASY_BORDERLESS: "res://assets/tile_art/atlas/fantasy_borderless.json"
+}
+
 
 func _ready():
 	WorldManager.world_map_node = self # Register world_map instance with WorldManager
@@ -96,7 +105,10 @@ func regenerate_world(new_seed):
 
 func change_tileset_style(style: TilesetStyle):
 	Log.log_info("world_map.gd: Changing tileset style to %d." % style)
+	# Only the active style's textures stay loaded
+	AssetGroups.release_group(AssetGroups.style_group(current_tileset_style))
 	current_tileset_style = style
+	AssetGroups.request_group(AssetGroups.style_group(style))
 	_create_terrain_tileset()
 	# Redraw the map with the new tileset
 	_redraw_terrain()
@@ -114,7 +126,7 @@ func _redraw_terrain():
 			source_id_key = str(terrain_id) + "_false"
 			source_id = _terrain_tile_source_ids.get(source_id_key)
 		if source_id != null:
-			tile_map.set_cell(0, coords, source_id, Vector2i(0, 0))
+			tile_map.set_cell(0, coords, source_id, _terrain_tile_atlas_coords.get(source_id_key, Vector2i(0, 0)))
 	Log.log_info("world_map.gd: Terrain redrawn with new tileset style.")
 
 # Removed _create_hexagon_image as we are loading textures now
@@ -179,6 +191,14 @@ func _create_terrain_tileset():
 	Log.log_info("world_map.gd: Using tileset style %d with path: %s" % [current_tileset_style, tile_art_path])
 	
 	_terrain_tile_source_ids.clear()
+	_terrain_tile_atlas_coords.clear()
+
+	# Prefer the packed atlas: one texture and one source for the whole style
+	if _add_terrain_atlas_source(tile_set, TERRAIN_ATLAS_MANIFESTS.get(current_tileset_style, "")):
+		tile_map.tile_set = tile_set
+		Log.log_info("world_map.gd: _create_terrain_tileset() finished (atlas).")
+		return
+
 	var source_id_counter = 0
 
 	Log.log_info("world_map.gd: _create_terrain_tileset() - starting terrain type loop for 0-15.")
@@ -231,6 +251,43 @@ func _create_terrain_tileset():
 	Log.log_info("world_map.gd: _create_terrain_tileset() finished.")
 
 
+func _add_terrain_atlas_source(tile_set: TileSet, manifest_path: String) -> bool:
+	# Builds a single TileSetAtlasSource from a pack_tile_atlas.py manifest
+	if manifest_path == "" or not ResourceLoader.exists(manifest_path):
+		return false
+	var manifest_resource = load(manifest_path)
+	if manifest_resource == null or typeof(manifest_resource.data) != TYPE_DICTIONARY:
+		Log.log_warning("world_map.gd: Could not read atlas manifest %s, loading tiles individually." % manifest_path)
+		return false
+	var manifest: Dictionary = manifest_resource.data
+	var texture = load(manifest.texture)
+	if texture == null:
+		Log.log_warning("world_map.gd: Failed to load atlas texture %s, loading tiles individually." % manifest.texture)
+		return false
+
+	var source = TileSetAtlasSource.new()
+	source.texture = texture
+	source.margins = Vector2i(int(manifest.margins[0]), int(manifest.margins[1]))
+	source.separation = Vector2i(int(manifest.separation[0]), int(manifest.separation[1]))
+	source.texture_region_size = Vector2i(int(manifest.tile_size[0]), int(manifest.tile_size[1]))
+
+	for terrain_key in manifest.terrains.keys():
+		var entry = manifest.terrains[terrain_key]
+		var variants = {"false": entry.normal, "true": entry.river}
+		for has_river in variants.keys():
+			if variants[has_river] == null:
+				continue
+			var atlas_coords = Vector2i(int(variants[has_river][0]), int(variants[has_river][1]))
+			if not source.has_tile(atlas_coords):
+				source.create_tile(atlas_coords)
+			_terrain_tile_source_ids[terrain_key + "_" + has_river] = 0
+			_terrain_tile_atlas_coords[terrain_key + "_" + has_river] = atlas_coords
+
+	tile_set.add_source(source, 0)
+	Log.log_info("world_map.gd: Loaded terrain atlas %s with %d terrains." % [manifest.texture, manifest.terrains.size()])
+	return true
+
+
 func _create_civ_tileset() -> TileSet:
 	var tile_set = TileSet.new()
 	tile_set.tile_shape = TileSet.TILE_SHAPE_HEXAGON
@@ -289,7 +346,7 @@ func generate_world(): # Removed terrain_tile_source_ids parameter
 		var data = _tile_data[coords]
 		var source_id_key = str(data.terrain_id) + "_" + str(data.has_river)
 		var source_id = _terrain_tile_source_ids[source_id_key]
-		tile_map.set_cell(0, coords, source_id, Vector2i(0, 0))
+		tile_map.set_cell(0, coords, source_id, _terrain_tile_atlas_coords.get(source_id_key, Vector2i(0, 0)))
 	Log.log_info("world_map.gd: Terrain tiles populated.")
 
 	var civ_result = generator.generate_civs(_tile_data, land_tiles)
@@ -931,6 +931,7 @@ func _on_request_enlarged_view(card_ui: CardUI):
 		enlarged_card_view = null
 
 	enlarged_card_view = preload("res://scripts/card_ui.gd").new()
+	enlarged_card_view.illustration_tier = "full"
 	enlarged_card_view.set_card(card_ui.card)
 
 	var canvas_layer = CanvasLayer.new()
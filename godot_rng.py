@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Port of Godot's RandomNumberGenerator (core/math/random_pcg.h, PCG32).
+
+Seeding, randf, randi_range and Array.shuffle consume the stream exactly as
+Godot does, so code ported from GDScript draws the same numbers for the same
+seed. Raw outputs are generated in vectorized blocks with PCG's jump-ahead.
+"""
+import math
+from functools import lru_cache
+import numpy as np
+
+PCG_MULTIPLIER = 6364136223846793005
+PCG_DEFAULT_INC = 1442695040888963407
+
+MASK_64 = (1 << 64) - 1
+
+BLOCK_SIZE = 1 << 16
+
+@lru_cache(maxsize=None)
+def _block_coefficients(size, inc):
+    """(A, C) with state_k = A[k] * state_0 + C[k] (mod 2^64) for k in [0, size)."""
+    powers = np.full(size, PCG_MULTIPLIER, dtype=np.uint64)
+    powers[0] = 1
+    with np.errstate(over='ignore'):
+        powers = np.cumprod(powers, dtype=np.uint64)
+        offsets = np.concatenate([np.zeros(1, dtype=np.uint64), np.cumsum(powers[:-1], dtype=np.uint64)]) * np.uint64(inc)
+    return powers, offsets
+
+def _output(states):
+    """PCG32 XSH-RR output for an array of (pre-advance) states."""
+    xorshifted = (((states >> np.uint64(18)) ^ states) >> np.uint64(27)) & np.uint64(0xffffffff)
+    rot = states >> np.uint64(59)
+    rotated = (xorshifted >> rot) | (xorshifted << ((np.uint64(32) - rot) & np.uint64(31)))
+    return (rotated & np.uint64(0xffffffff)).astype(np.uint32)
+
+class RandomPCG:
+    """Godot's RandomNumberGenerator with its seed already set."""
+
+    def __init__(self, seed, inc=PCG_DEFAULT_INC):
+        # pcg32_srandom_r(initstate=seed, initseq=inc)
+        self.inc = ((inc << 1) | 1) & MASK_64
+        self.state = 0
+        self._step()
+        self.state = (self.state + (seed & MASK_64)) & MASK_64
+        self._step()
+
+        self._buffer = []
+        self._position = 0
+
+    def _step(self):
+        """Advance one state without producing output."""
+        self.state = (self.state * PCG_MULTIPLIER + self.inc) & MASK_64
+
+    def _refill(self):
+        """Generate the next block of raw outputs in one vectorized pass."""
+        powers, offsets = _block_coefficients(BLOCK_SIZE, self.inc)
+        with np.errstate(over='ignore'):
+            states = powers * np.uint64(self.state) + offsets
+        self._buffer = _output(states).tolist()
+        self._position = 0
+        last = int(states[-1])
+        self.state = (last * PCG_MULTIPLIER + self.inc) & MASK_64
+
+    def rand(self):
+        """Next raw 32-bit output (pcg32_random_r)."""
+        if self._position >= len(self._buffer):
+            self._refill()
+        value = self._buffer[self._position]
+        self._position += 1
+        return value
+
+    def rand_bounded(self, bound):
+        """Uniform integer in [0, bound) by rejection, as pcg32_boundedrand_r."""
+        threshold = (-bound) % (1 << 32) % bound
+        while True:
+            value = self.rand()
+            if value >= threshold:
+                return value % bound
+
+    def randf(self):
+        """Float in [0, 1): a random exponent from one draw's leading zeros, a float32 significand from the next."""
+        proto_exp_offset = self.rand()
+        if proto_exp_offset == 0:
+            return 0.0
+        # (float)(rand() | 0x80000001) keeps the top 24 bits; bit 0 is set, so rounding never ties
+        significand = (((self.rand() | 0x80000001) + 0x80) >> 8) << 8
+        return math.ldexp(significand, proto_exp_offset.bit_length() - 64)
+
+    def randi_range(self, low, high):
+        """Integer in [low, high] inclusive."""
+        if low == high:
+            return low
+        return self.rand_bounded(abs(high - low) + 1) + min(low, high)
+
+    def shuffle(self, items):
+        """Shuffle a list in place the way Array.shuffle does (Fisher-Yates from the end)."""
+        for i in range(len(items) - 1, 0, -1):
+            j = self.rand() % (i + 1)
+            items[i], items[j] = items[j], items[i]
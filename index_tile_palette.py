@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Convert each tileset style's terrain tiles to 8-bit palette indices.
+
+All tiles of a style (including the original art it falls back to) share one
+palette of at most 256 RGBA colors. Each tile is written at its own size as a
+one-channel PNG whose value is an index into that palette, and the palette is
+written as a 256x1 RGBA strip. hex_tile_shader.gdshader looks each index up in
+the strip when use_palette is on, so a seasonal or civ recolor is a different
+palette strip rather than a second set of tiles. Styles with more than 256
+colors are reduced by median cut; the error against the RGBA originals is
+reported per style either way.
+
+A rebuild keeps the style's existing palette strip as long as every color of
+its tiles still fits: it is in the strip, within the strip's recorded worst
+error of an entry (for reduced palettes), or goes in a free entry. An edit to
+one tile then rewrites that tile, and the strip if a color was added, rather
+than every index tile. Only when the colors outgrow the strip is the palette
+fit again.
+"""
+import os
+import numpy as np
+from PIL import Image
+
+from build_cache import BuildCache, code_version, hash_bytes, hash_file
+from pack_tile_atlas import collect_style_tiles, tile_name
+from terrain_types import TILE_ART_DIR, TILESET_STYLES
+
+CODE_VERSION = code_version(__file__)
+
+INDEXED_DIR = f"{TILE_ART_DIR}/indexed"
+PALETTE_SIZE = 256
+PALETTE_FILENAME = "palette.png"
+TRANSPARENT_INDEX = 0  # Every fully transparent pixel maps here, whatever its RGB
+REFINE_ITERATIONS = 4  # k-means steps after median cut, for styles over PALETTE_SIZE colors
+
+def load_rgba(path):
+    """Load a tile at its own size as an RGBA array, with transparent pixels zeroed."""
+    with Image.open(path) as img:
+        pixels = np.array(img.convert('RGBA'))
+    pixels[pixels[..., 3] == 0] = 0
+    return pixels
+
+def pack_colors(colors):
+    """View (N, 4) uint8 colors as one uint32 per color, for np.unique and lookups."""
+    return np.ascontiguousarray(colors, dtype=np.uint8).view(np.uint32).ravel()
+
+def median_cut(colors, counts, size):
+    """Reduce weighted (N, 4) colors to at most `size` representatives by splitting the widest box at its median."""
+    def span(box):
+        # The box's widest channel range, weighted by how many pixels it covers
+        return np.ptp(colors[box], axis=0).max() * counts[box].sum() if len(box) > 1 else -1
+
+    boxes = [np.arange(len(colors))]
+    spans = [span(boxes[0])]  # Only the two halves of each split need measuring
+    while len(boxes) < size:
+        widest = int(np.argmax(spans))
+        if spans[widest] <= 0:
+            break
+        box = boxes.pop(widest)
+        spans.pop(widest)
+        channel = int(np.argmax(np.ptp(colors[box], axis=0)))
+        box = box[np.argsort(colors[box, channel], kind="stable")]
+        weight = np.cumsum(counts[box])
+        split = int(np.clip(np.searchsorted(weight, weight[-1] / 2), 1, len(box) - 1))
+        boxes += [box[:split], box[split:]]
+        spans += [span(box[:split]), span(box[split:])]
+    return np.stack([np.round(np.average(colors[box], axis=0, weights=counts[box])) for box in boxes]).astype(np.uint8)
+
+def refine_palette(colors, counts, centers, iterations=REFINE_ITERATIONS):
+    """Move median-cut centers to the weighted mean of the colors nearest them (a few k-means steps)."""
+    for _ in range(iterations):
+        nearest = np.argmin(((colors[:, None, :] - centers[None, :, :]) ** 2).sum(axis=-1), axis=1)
+        weight = np.bincount(nearest, weights=counts, minlength=len(centers))
+        sums = np.stack([np.bincount(nearest, weights=counts * colors[:, channel], minlength=len(centers))
+                         for channel in range(4)], axis=1)
+        occupied = weight > 0
+        centers[occupied] = sums[occupied] / weight[occupied, None]
+    return centers
+
+def opaque_colors(tiles):
+    """Distinct (N, 4) colors of a list of tiles that aren't fully transparent, and each one's pixel count."""
+    colors, counts = np.unique(np.concatenate([pack_colors(tile.reshape(-1, 4)) for tile in tiles]),
+                               return_counts=True)
+    colors = colors.view(np.uint8).reshape(-1, 4)
+    opaque = colors[:, 3] > 0
+    return colors[opaque], counts[opaque]
+
+def build_palette(tiles, size=PALETTE_SIZE):
+    """Shared (size, 4) RGBA palette for a list of tiles; index TRANSPARENT_INDEX is fully transparent."""
+    colors, counts = opaque_colors(tiles)
+    if len(colors) >= size:
+        colors = colors.astype(np.float64)
+        centers = median_cut(colors, counts, size - 1).astype(np.float64)
+        colors = np.round(refine_palette(colors, counts, centers)).astype(np.uint8)
+    palette = np.zeros((size, 4), dtype=np.uint8)
+    palette[1:len(colors) + 1] = colors
+    return palette, len(colors) + 1
+
+def load_palette(cache):
+    """(palette, used entries, worst channel error) of the strip this producer last wrote, or None."""
+    if not cache.owns(PALETTE_FILENAME):
+        return None
+    with Image.open(os.path.join(cache.output_dir, PALETTE_FILENAME)) as img:
+        palette = np.array(img.convert('RGBA'))[0]
+    if len(palette) != PALETTE_SIZE:
+        return None
+    # Every entry after the transparent one is opaque until the zeroed padding
+    return palette, 1 + int(np.count_nonzero(palette[1:, 3])), cache.outputs[PALETTE_FILENAME].get("max_error", 0)
+
+def nearest_entries(colors, palette, used):
+    """Index of the nearest opaque palette entry to each of (N, 4) colors, as index_tile picks it."""
+    distance = ((colors[:, None, :].astype(np.int32) - palette[None, 1:used].astype(np.int32)) ** 2).sum(axis=-1)
+    return 1 + np.argmin(distance, axis=1)
+
+def extend_palette(palette, used, tolerance, tiles):
+    """(palette, used) covering the tiles' colors, within tolerance or in free entries; None if they don't fit."""
+    colors, _ = opaque_colors(tiles)
+    missing = colors[~np.isin(pack_colors(colors), pack_colors(palette[:used]))]
+    if tolerance and len(missing) and used > 1:
+        error = np.abs(palette[nearest_entries(missing, palette, used)].astype(np.int32) - missing).max(axis=1)
+        missing = missing[error > tolerance]
+    if used + len(missing) > len(palette):
+        return None
+    palette = palette.copy()
+    palette[used:used + len(missing)] = missing
+    return palette, used + len(missing)
+
+def index_tile(tile, palette, used):
+    """Map every pixel of an RGBA tile to its palette index: exact where the color is in the palette, else nearest."""
+    flat = tile.reshape(-1, 4)
+    keys = pack_colors(flat)
+    palette_keys = pack_colors(palette[:used])
+    order = np.argsort(palette_keys)
+    slot = np.clip(np.searchsorted(palette_keys, keys, sorter=order), 0, used - 1)
+    indices = order[slot]
+    missing = palette_keys[indices] != keys
+    if missing.any():
+        # Only reached for styles that needed median cut
+        indices[missing] = nearest_entries(flat[missing], palette, used)
+    indices[flat[:, 3] == 0] = TRANSPARENT_INDEX
+    return indices.astype(np.uint8).reshape(tile.shape[:2])
+
+def palette_error(tile, indices, palette):
+    """(max abs channel error, RMS error) of an indexed tile against its RGBA original."""
+    difference = palette[indices].astype(np.int32) - tile
+    return int(np.abs(difference).max(initial=0)), float(np.sqrt(np.mean(difference.astype(np.float64) ** 2)))
+
+def index_style(style, style_dir, output_root=INDEXED_DIR):
+    """Write one style's index tiles and palette strip into <output_root>/<style>."""
+    print(f"\nIndexing {style} from {style_dir}")
+    fallback_dir = TILESET_STYLES["original"] if style != "original" else None
+    tile_paths = collect_style_tiles(style_dir, fallback_dir)
+    if not tile_paths:
+        print(f"  Warning: no tiles found in {style_dir}")
+        return 0
+
+    output_dir = os.path.join(output_root, style)
+    os.makedirs(output_dir, exist_ok=True)
+    cache = BuildCache(output_dir, "index_tile_palette")
+    inputs_key = hash_bytes(CODE_VERSION, PALETTE_SIZE,
+                            [(key, os.path.basename(path), hash_file(path)) for key, path in tile_paths.items()])
+    if cache.inputs_unchanged(inputs_key):
+        cache.finish(inputs_key)
+        print(f"  Up to date: {len(tile_paths)} tiles")
+        return len(tile_paths)
+
+    tiles = {key: load_rgba(path) for key, path in tile_paths.items()}
+    previous = load_palette(cache)
+    fitted = extend_palette(*previous, list(tiles.values())) if previous else None
+    palette, used = fitted or build_palette(list(tiles.values()))
+    if previous:
+        print(f"  {'Kept' if fitted else 'Refit'} the existing palette")
+    cache.save_image(PALETTE_FILENAME, inputs_key, Image.fromarray(palette[None], 'RGBA'))
+
+    worst = (0, 0.0, None)
+    rgba_bytes = indexed_bytes = 0
+    for key, tile in tiles.items():
+        indices = index_tile(tile, palette, used)
+        max_error, rms_error = palette_error(tile, indices, palette)
+        if max_error > worst[0]:
+            worst = (max_error, rms_error, f"{tile_name(key)}.png")
+        cache.save_image(f"{tile_name(key)}.png", inputs_key, Image.fromarray(indices, 'L'))
+        rgba_bytes += os.path.getsize(tile_paths[key])
+        indexed_bytes += os.path.getsize(os.path.join(output_dir, f"{tile_name(key)}.png"))
+    # Later rebuilds may map new colors onto the palette up to the error it has now
+    cache.describe(PALETTE_FILENAME, max_error=worst[0])
+    cache.finish(inputs_key)
+
+    print(f"  {len(tiles)} tiles share {used} of {PALETTE_SIZE} palette entries "
+          f"({cache.written} files written, {cache.skipped} unchanged)")
+    print(f"  PNG size {rgba_bytes / 1024:.1f} KiB RGBA -> {indexed_bytes / 1024:.1f} KiB indexed")
+    if worst[2] is None:
+        print("  Exact: every pixel matches the RGBA original")
+    else:
+        print(f"  Lossy: worst tile {worst[2]}, max channel error {worst[0]}, RMS {worst[1]:.2f}")
+    return len(tiles)
+
+def main():
+    print("=" * 70)
+    print("TILE PALETTE INDEXER")
+    print("=" * 70)
+
+    for style, style_dir in TILESET_STYLES.items():
+        index_style(style, style_dir)
+
+    print("\n" + "=" * 70)
+    print(f"Indexed tiles written to {INDEXED_DIR}")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Level-of-detail pyramids for the terrain tiles.
+
+Each tile is resampled once from its source to the largest level, and every
+smaller level is a 2x2 box filter of the level above it. Filtering happens in
+premultiplied alpha so the transparent hex corners don't bleed dark fringes
+into the edges. Levels are written to lod<size>/ directories beside the
+full-size tiles, so zoomed-out views can sample a small texture directly.
+"""
+import os
+from functools import lru_cache
+import numpy as np
+
+from build_cache import BuildCache, code_version, encode_png, hash_bytes
+from parallel import parallel_map
+import telemetry
+
+LOD_CODE_VERSION = code_version(__file__)
+
+# Pyramid levels in pixels, largest first
+LOD_SIZES = (64, 32, 16, 8)
+
+def lod_dir(output_dir, size):
+    """Directory holding the size-pixel level of the tiles in output_dir."""
+    return os.path.join(output_dir, f"lod{size}")
+
+@lru_cache(maxsize=None)
+def _lanczos_weights(in_size, out_size):
+    """Build an (out_size, in_size) LANCZOS resampling matrix, following PIL's kernel."""
+    scale = in_size / out_size
+    filterscale = max(scale, 1.0)
+    support = 3.0 * filterscale
+
+    weights = np.zeros((out_size, in_size))
+    for out_x in range(out_size):
+        center = (out_x + 0.5) * scale
+        xmin = max(int(center - support + 0.5), 0)
+        xmax = min(int(center + support + 0.5), in_size)
+        taps = (np.arange(xmin, xmax) - center + 0.5) / filterscale
+        weights[out_x, xmin:xmax] = np.sinc(taps) * np.sinc(taps / 3.0) * (np.abs(taps) < 3.0)
+    return weights / weights.sum(axis=1, keepdims=True)
+
+def lanczos_resize(stack, out_height, out_width):
+    """LANCZOS-resample an (N, H, W, 4) uint8 stack exactly as PIL's Image.resize does."""
+    tiles = stack.astype(np.float64)
+
+    # Resample premultiplied, as PIL does for RGBA
+    alpha = tiles[..., 3:4]
+    tiles[..., :3] = np.rint(tiles[..., :3] * alpha / 255.0)
+
+    # Horizontal then vertical pass, rounded to 8 bits in between like PIL
+    weights_y = _lanczos_weights(stack.shape[1], out_height)
+    weights_x = _lanczos_weights(stack.shape[2], out_width)
+    resized = np.clip(np.rint(np.einsum('nhwc,pw->nhpc', tiles, weights_x)), 0, 255)
+    resized = np.clip(np.rint(np.einsum('oh,nhpc->nopc', weights_y, resized)), 0, 255)
+
+    out_alpha = resized[..., 3:4]
+    unpremultiplied = np.minimum(255, np.floor(resized[..., :3] * 255 / np.maximum(out_alpha, 1)))
+    resized[..., :3] = np.where((out_alpha > 0) & (out_alpha < 255), unpremultiplied, resized[..., :3])
+    return resized.astype(np.uint8)
+
+def downsample_half(stack):
+    """Halve an (N, S, S, 4) uint8 stack with a 2x2 box filter in premultiplied alpha."""
+    tiles = stack.astype(np.float64)
+    tiles[..., :3] *= tiles[..., 3:4] / 255.0
+
+    count, height, width, channels = tiles.shape
+    tiles = tiles.reshape(count, height // 2, 2, width // 2, 2, channels).mean(axis=(2, 4))
+
+    # Fully transparent texels keep black color rather than dividing by zero
+    alpha = tiles[..., 3:4]
+    tiles[..., :3] = np.where(alpha > 0, tiles[..., :3] * 255.0 / np.maximum(alpha, 1e-9), 0)
+    return np.clip(np.rint(tiles), 0, 255).astype(np.uint8)
+
+def build_pyramid(stack, sizes=LOD_SIZES):
+    """Build {size: (N, size, size, 4) stack} from square source tiles, each level from the one above."""
+    source_size = stack.shape[1]
+    levels = {}
+    above = None
+    for size in sorted(sizes, reverse=True):
+        if size >= source_size:
+            # Levels at or above the source resolution come straight from the source
+            level = stack if size == source_size else lanczos_resize(stack, size, size)
+        elif above.shape[1] == 2 * size:
+            level = downsample_half(above)
+        else:
+            level = lanczos_resize(above, size, size)
+        levels[size] = above = level
+    return levels
+
+def pyramid_up_to_date(output_dir, producer, inputs_key, sizes=LOD_SIZES):
+    """True if every LOD directory was built from inputs_key and is intact."""
+    lod_key = hash_bytes(LOD_CODE_VERSION, inputs_key)
+    caches = [BuildCache(lod_dir(output_dir, size), producer) for size in sizes]
+    if not all(cache.inputs_unchanged(lod_key) for cache in caches):
+        return False
+    for cache in caches:
+        cache.finish(lod_key)
+    return True
+
+class PyramidWriter:
+    """Writes tiles' LOD levels into output_dir/lod<size>/ through one build cache per level."""
+
+    def __init__(self, output_dir, producer, sizes=LOD_SIZES):
+        self.caches = {}
+        for size in sizes:
+            directory = lod_dir(output_dir, size)
+            os.makedirs(directory, exist_ok=True)
+            self.caches[size] = BuildCache(directory, producer)
+
+    @property
+    def written(self):
+        """Files written across all levels so far."""
+        return sum(cache.written for cache in self.caches.values())
+
+    def write(self, filenames, keys, pyramid, workers=1):
+        """Write one batch of tiles at every level; keys are the tiles' full-size cache keys."""
+        for size, cache in self.caches.items():
+            level_keys = [hash_bytes(LOD_CODE_VERSION, key, size) for key in keys]
+            stale = [i for i, filename in enumerate(filenames) if not cache.keep(filename, level_keys[i])]
+            with telemetry.span("lod", size=size):
+                telemetry.count(pixels=len(stale) * size * size)
+                for i, data in zip(stale, parallel_map(encode_png, [pyramid[size][i] for i in stale], workers)):
+                    cache.store(filenames[i], level_keys[i], data)
+
+    def finish(self, inputs_key=None):
+        """Prune levels' stale outputs and save their manifests."""
+        lod_key = hash_bytes(LOD_CODE_VERSION, inputs_key) if inputs_key is not None else None
+        for cache in self.caches.values():
+            cache.finish(lod_key)
+
+def write_pyramid(output_dir, producer, filenames, keys, pyramid, inputs_key=None, workers=1):
+    """Write each pyramid level's tiles into output_dir/lod<size>/ through the build cache; returns files written."""
+    writer = PyramidWriter(output_dir, producer, list(pyramid))
+    writer.write(filenames, keys, pyramid, workers)
+    writer.finish(inputs_key)
+    return writer.written
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Pack each tileset style's terrain tiles into a single atlas texture.
+
+Reads the tiles written by split_fantasy_tileset.py, extract_fantasy_hex_tiles.py
+and create_missing_fantasy_tiles.py and writes, per style, one atlas PNG with
+edge-extruded cells plus a JSON manifest mapping terrain ids and river flags to
+atlas coordinates, so world_map.gd can build the TileSet from one texture.
+"""
+import json
+import math
+import os
+import re
+import numpy as np
+from PIL import Image
+
+from build_cache import BuildCache, code_version, hash_bytes, hash_file
+from terrain_types import ALLOWS_RIVERS, TERRAIN_NAMES, TILE_ART_DIR, TILE_SIZE, TILESET_STYLES
+
+CODE_VERSION = code_version(__file__)
+
+ATLAS_DIR = f"{TILE_ART_DIR}/atlas"
+EXTRUDE = 1  # Pixels of edge extrusion around every cell, to stop filtering bleed
+REDIRECTS_FILENAME = "tile_redirects.json"  # Written by dedupe_tiles.py into a style directory
+
+def parse_tile_name(stem):
+    """Split a tile file stem into (terrain_id, variant, is_river), or None if it isn't a terrain tile."""
+    # Longest names first so e.g. "ice_water_1" is never read as a "water" variant
+    for terrain_id, name in sorted(TERRAIN_NAMES.items(), key=lambda item: -len(item[1])):
+        if stem == name:
+            return terrain_id, 0, False
+        if stem == f"{name}_river":
+            return terrain_id, 0, True
+        match = re.fullmatch(rf"{name}_(\d+)", stem)
+        if match:
+            return terrain_id, int(match.group(1)), False
+    return None
+
+def tile_name(key):
+    """File stem of a (terrain_id, variant, is_river) tile; the inverse of parse_tile_name."""
+    terrain_id, variant, is_river = key
+    return TERRAIN_NAMES[terrain_id] + ("_river" if is_river else "") + (f"_{variant}" if variant else "")
+
+def load_redirects(directory):
+    """{duplicate file name: kept file name} from a directory's dedupe manifest, or {} if it has none."""
+    path = os.path.join(directory, REDIRECTS_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)["redirects"]
+
+def collect_style_tiles(style_dir, fallback_dir=None, skip_duplicates=True):
+    """Map (terrain_id, variant, is_river) -> tile path for one style, falling back to the original art."""
+    tiles = {}
+    for directory in [fallback_dir, style_dir]:
+        if directory is None or not os.path.isdir(directory):
+            continue
+        # Variants dedupe_tiles.py found to duplicate another are left out
+        redirects = load_redirects(directory) if skip_duplicates else {}
+        found = {}
+        for filename in os.listdir(directory):
+            stem, ext = os.path.splitext(filename)
+            parsed = parse_tile_name(stem) if ext == ".png" and filename not in redirects else None
+            if parsed is not None:
+                found[parsed] = os.path.join(directory, filename)
+        if directory == fallback_dir:
+            # Only the base tile of each terrain falls back, as in _create_terrain_tileset
+            found = {key: path for key, path in found.items() if key[1] == 0 and not key[2]}
+        tiles.update(found)
+    return dict(sorted(tiles.items()))
+
+def load_tile(path, tile_size=TILE_SIZE):
+    """Load a tile as an RGBA array, resampling tiles that aren't tile_size (e.g. 32px split output)."""
+    with Image.open(path) as img:
+        img = img.convert('RGBA')
+        if img.size != (tile_size, tile_size):
+            img = img.resize((tile_size, tile_size), Image.Resampling.LANCZOS)
+        return np.asarray(img)
+
+def pack_atlas(tiles, tile_size=TILE_SIZE, extrude=EXTRUDE):
+    """Pack a list of (S, S, 4) tiles into an atlas; returns (atlas array, [(col, row)], columns)."""
+    cell = tile_size + 2 * extrude
+    columns = max(1, math.ceil(math.sqrt(len(tiles))))
+    rows = max(1, math.ceil(len(tiles) / columns))
+
+    # Pad every tile by repeating its edge pixels, then lay the cells out row-major
+    stack = np.stack(tiles) if tiles else np.zeros((0, tile_size, tile_size, 4), dtype=np.uint8)
+    padded = np.pad(stack, ((0, columns * rows - len(tiles)), (extrude, extrude), (extrude, extrude), (0, 0)), mode='edge')
+    if len(tiles) < columns * rows:
+        padded[len(tiles):] = 0
+    atlas = padded.reshape(rows, columns, cell, cell, 4).transpose(0, 2, 1, 3, 4).reshape(rows * cell, columns * cell, 4)
+
+    coords = [(i % columns, i // columns) for i in range(len(tiles))]
+    return atlas, coords, columns
+
+def build_manifest(style, keys, coords, sources, tile_size=TILE_SIZE, extrude=EXTRUDE, redirects=None):
+    """Describe where each terrain, variant and river tile sits in the atlas."""
+    by_key = dict(zip(keys, coords))
+    terrains = {}
+    for terrain_id, name in TERRAIN_NAMES.items():
+        if (terrain_id, 0, False) not in by_key:
+            continue
+        normal = by_key[(terrain_id, 0, False)]
+        river = by_key.get((terrain_id, 0, True))
+        variants = [list(by_key[key]) for key in keys if key[0] == terrain_id and not key[2] and key[1] > 0]
+        terrains[str(terrain_id)] = {
+            "name": name,
+            "normal": list(normal),
+            # Terrains without river art reuse the normal tile, like _redraw_terrain does
+            "river": list(river if river is not None else normal) if terrain_id in ALLOWS_RIVERS else None,
+            "river_fallback": terrain_id in ALLOWS_RIVERS and river is None,
+            "variants": variants,
+        }
+
+    tiles = {}
+    for key, coord in by_key.items():
+        tiles[tile_name(key)] = {"coords": list(coord), "source": sources[key]}
+    # Redirected duplicates still resolve by name, to the cell of the variant kept in their place
+    for duplicate, kept in sorted((redirects or {}).items()):
+        kept = os.path.splitext(kept)[0]
+        if kept in tiles:
+            tiles[os.path.splitext(duplicate)[0]] = dict(tiles[kept], duplicate_of=kept)
+
+    return {
+        "style": style,
+        "texture": f"res://{ATLAS_DIR.removeprefix('godot_project/')}/{style}.png",
+        "tile_size": [tile_size, tile_size],
+        "extrude": extrude,
+        "margins": [extrude, extrude],
+        "separation": [2 * extrude, 2 * extrude],
+        "terrains": terrains,
+        "tiles": tiles,
+    }
+
+def pack_style(style, style_dir, output_dir=ATLAS_DIR):
+    """Pack one tileset style into <style>.png and <style>.json."""
+    print(f"\nPacking {style} from {style_dir}")
+    os.makedirs(output_dir, exist_ok=True)
+
+    fallback_dir = TILESET_STYLES["original"] if style != "original" else None
+    tile_paths = collect_style_tiles(style_dir, fallback_dir)
+    if not tile_paths:
+        print(f"  Warning: no tiles found in {style_dir}")
+        return 0
+
+    keys = list(tile_paths)
+    cache = BuildCache(output_dir, f"pack_tile_atlas:{style}")
+    redirects = load_redirects(style_dir)
+    inputs_key = hash_bytes(CODE_VERSION, TILE_SIZE, EXTRUDE, sorted(redirects.items()),
+                            [(key, os.path.basename(path), hash_file(path)) for key, path in tile_paths.items()])
+    if cache.inputs_unchanged(inputs_key):
+        cache.finish(inputs_key)
+        print(f"  Up to date: {len(keys)} tiles")
+        return len(keys)
+
+    atlas, coords, columns = pack_atlas([load_tile(tile_paths[key]) for key in keys])
+    sources = {key: os.path.relpath(path, TILE_ART_DIR) for key, path in tile_paths.items()}
+    manifest = build_manifest(style, keys, coords, sources, redirects=redirects)
+
+    cache.save_image(f"{style}.png", inputs_key, Image.fromarray(atlas, 'RGBA'))
+    cache.write(f"{style}.json", inputs_key, (json.dumps(manifest, indent=2) + "\n").encode())
+    cache.finish(inputs_key)
+
+    print(f"  Packed {len(keys)} tiles into {columns} columns, {atlas.shape[1]}x{atlas.shape[0]} px "
+          f"({cache.written} files written, {cache.skipped} unchanged)")
+    missing_rivers = [entry["name"] for entry in manifest["terrains"].values() if entry["river_fallback"]]
+    if missing_rivers:
+        print(f"  No river art for: {', '.join(missing_rivers)} (normal tile used)")
+    return len(keys)
+
+def main():
+    print("=" * 70)
+    print("TERRAIN ATLAS PACKER")
+    print("=" * 70)
+
+    for style, style_dir in TILESET_STYLES.items():
+        pack_style(style, style_dir)
+
+    print("\n" + "=" * 70)
+    print(f"Atlases written to {ATLAS_DIR}")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Process-pool helpers shared by the tile pipeline scripts.
+
+Work is always handed out and collected in input order, so output names and
+logs are the same whatever the worker count.
+"""
+import contextlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import telemetry
+
+def add_workers_argument(parser):
+    """Add the standard --workers option to a script's argument parser."""
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="worker processes to use (0 = one per CPU, default 1)")
+
+def resolve_workers(workers):
+    """Turn a --workers value into a process count."""
+    if workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+def parallel_map(fn, items, workers=1):
+    """Map fn over items in order across up to `workers` processes; runs in-process for one worker."""
+    items = list(items)
+    workers = min(workers, len(items))
+    if workers <= 1:
+        return [fn(item) for item in items]
+
+    # A few chunks per worker keeps pickling overhead down without starving the pool
+    chunksize = max(1, len(items) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, items, chunksize=chunksize))
+
+def _captured_call(job):
+    """Run one job with its stdout and telemetry spans captured, so the parent can replay them in order."""
+    fn, args, kwargs, settings = job
+    telemetry.apply_settings(settings)
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        result = fn(*args, **kwargs)
+    return result, buffer.getvalue(), telemetry.take_records()
+
+def run_jobs(fn, jobs, workers=1):
+    """Run fn(*args, workers=n) for each args tuple, one process per job, splitting the workers between them."""
+    outer = max(1, min(workers, len(jobs)))
+    inner = max(1, workers // outer)
+    if outer <= 1:
+        return [fn(*args, workers=inner) for args in jobs]
+
+    results = []
+    calls = [(fn, args, {"workers": inner}, telemetry.settings()) for args in jobs]
+    for result, log, spans in parallel_map(_captured_call, calls, outer):
+        print(log, end="")
+        telemetry.merge_records(spans)
+        results.append(result)
+    return results
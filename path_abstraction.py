@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Hierarchical pathfinding tables for baked worlds.
+
+The map is cut into square clusters. Wherever passable tiles touch across a
+cluster border, each contiguous run of touching pairs whose tiles cost the
+same to enter gets an entrance (long runs get one at each end too), so a
+cheap crossing is never hidden behind an expensive one. The entrance tiles
+become the nodes of a small abstract graph. Every cluster stores the
+cheapest in-cluster cost between each pair of its entrances, so a query
+searches the abstract graph with table lookups after short local searches
+inside the start and goal clusters. The tile path is then one A* confined to
+the clusters the abstract path crosses plus a margin around them, which
+straightens the detours through entrance tiles.
+
+Costs follow world_generator.gd: stepping onto a tile costs its terrain's
+TERRAIN_MOVEMENT_COSTS, and an infinite cost is impassable. Each civ also gets
+a distance field holding every tile's cost to reach its capital, so walking
+home is one lookup per step. The fields are stored as u16 steps of 0.1, exact
+for these costs; a field whose longest distance doesn't fit gets a coarser
+step, and walks along it may then pay up to one step more per tile. Each row
+holds the differences between neighbouring tiles (wrapping mod 2^16), which
+are small and compress to about half of the plain distances.
+
+find_path() is a plain A* over the whole grid, for checking results against.
+"""
+import heapq
+import numpy as np
+
+from world_format import pack_arrays, unpack_arrays
+from world_generator import get_hex_neighbors
+
+PATHS_MAGIC = b"STRATPTH"
+PATHS_FORMAT_VERSION = 2
+PATHS_EXTENSION = ".paths"
+
+CLUSTER_SIZE = 16
+
+# Runs of border edges longer than this get entrances at both ends as well as the middle
+MAX_ENTRANCE_WIDTH = 6
+
+INF = float("inf")
+
+# Abstract node id of the goal tile during a query
+GOAL_NODE = -1
+
+# Clusters relaxed together when building the distance tables, to bound memory
+CLUSTER_BATCH = 64
+
+# Tiles around each cluster on the abstract path that the final A* may also use, so it can reach the better
+# route through a neighbouring cluster when the entrances steered the abstract path one cluster off
+CORRIDOR_MARGIN = CLUSTER_SIZE
+
+# Capital distances are stored as u16 multiples of a per-civ step; movement costs have one decimal, so a step of
+# DISTANCE_QUANTUM is exact, and fields too long for it get the smallest multiple of it that fits
+DISTANCE_QUANTUM = 0.1
+UNREACHABLE = 0xFFFF  # Stored distance of tiles that can't reach the capital
+
+def movement_cost_grid(header, terrain):
+    """Cost of stepping onto each tile, from a world header's movement cost table (null is impassable)."""
+    table = np.full(256, np.inf)
+    for terrain_id, cost in header["movement_costs"].items():
+        table[int(terrain_id)] = np.inf if cost is None else cost
+    return table[terrain]
+
+def hex_distance(a, b):
+    """Steps between two tiles on the odd-row-shifted hex grid get_hex_neighbors walks."""
+    aq, bq = a[0] - (a[1] - (a[1] & 1)) // 2, b[0] - (b[1] - (b[1] & 1)) // 2
+    dq, dr = aq - bq, a[1] - b[1]
+    return (abs(dq) + abs(dr) + abs(dq + dr)) // 2
+
+def _neighbor_min(padded, odd_rows):
+    """Minimum over the six hex neighbors of each interior tile of an inf-bordered array (last two axes)."""
+    up, down = padded[..., :-2, :], padded[..., 2:, :]
+    result = np.minimum(padded[..., 1:-1, :-2], padded[..., 1:-1, 2:])
+    np.minimum(result, up[..., 1:-1], out=result)
+    np.minimum(result, down[..., 1:-1], out=result)
+    # Odd rows also touch x + 1 in the rows above and below, even rows x - 1
+    diagonal = np.where(odd_rows, np.minimum(up[..., 2:], down[..., 2:]), np.minimum(up[..., :-2], down[..., :-2]))
+    return np.minimum(result, diagonal, out=result)
+
+def relax(dist, cost):
+    """Settle distance fields seeded with 0 at their sources into each tile's cheapest cost from them."""
+    padding = [(0, 0)] * (dist.ndim - 2) + [(1, 1), (1, 1)]
+    padded = np.pad(dist, padding, constant_values=np.inf)
+    interior = padded[..., 1:-1, 1:-1]
+    odd_rows = (np.arange(dist.shape[-2]) % 2 == 1)[:, None]
+    while True:
+        # Impassable tiles cost inf to enter, so they never improve
+        candidate = _neighbor_min(padded, odd_rows) + cost
+        improved = candidate < interior
+        if not improved.any():
+            return interior.copy()
+        np.copyto(interior, candidate, where=improved)
+
+def find_entrances(cost, cluster_size):
+    """Pick entrance edges on every cluster border; returns the directed (from, to) tile pairs, flat indices."""
+    height, width = cost.shape
+    columns = -(-width // cluster_size)
+    ys, xs = np.mgrid[0:height, 0:width]
+    cluster = (ys // cluster_size) * columns + xs // cluster_size
+    passable = np.isfinite(cost)
+
+    # Every passable neighbor pair in different clusters, once, from the lower cluster id
+    pairs = []
+    odd = ys % 2 == 1
+    for dx_odd, dx_even, dy in [(1, 1, 0), (0, -1, 1), (1, 0, 1)]:
+        nx, ny = xs + np.where(odd, dx_odd, dx_even), ys + dy
+        inside = (nx >= 0) & (nx < width) & (ny < height)
+        nx, ny = np.where(inside, nx, 0), np.where(inside, ny, 0)
+        crossing = inside & passable & passable[ny, nx] & (cluster != cluster[ny, nx])
+        a, b = ys[crossing] * width + xs[crossing], ny[crossing] * width + nx[crossing]
+        swap = cluster.flat[a] > cluster.flat[b]
+        pairs.append(np.stack([np.where(swap, b, a), np.where(swap, a, b)], axis=1))
+    pairs = np.concatenate(pairs)
+
+    groups = {}
+    for a, b in sorted(map(tuple, pairs.tolist())):
+        groups.setdefault((cluster.flat[a], cluster.flat[b]), []).append((a, b))
+
+    def touching(i, j):
+        """Equal or hex neighbors."""
+        return hex_distance((i % width, i // width), (j % width, j // width)) <= 1
+
+    edges = []
+    for key in sorted(groups):
+        group = groups[key]
+        # Runs are edges joined by neighboring tiles of equal cost on both sides, so either side can be walked
+        # along at the same price and one entrance stands for the whole run
+        run_of = list(range(len(group)))
+        def root(i):
+            while run_of[i] != i:
+                run_of[i] = run_of[run_of[i]]
+                i = run_of[i]
+            return i
+        for i in range(len(group)):
+            # Neighbors are at most a row apart, and the group is sorted by the first tile
+            for j in range(i + 1, len(group)):
+                if group[j][0] - group[i][0] > width + 1:
+                    break
+                if all(touching(group[i][side], group[j][side]) and
+                       cost.flat[group[i][side]] == cost.flat[group[j][side]] for side in (0, 1)):
+                    run_of[root(i)] = root(j)
+        runs = {}
+        for i in range(len(group)):
+            runs.setdefault(root(i), []).append(group[i])
+
+        for run in sorted(runs.values()):
+            chosen = {len(run) // 2}
+            if len(run) > MAX_ENTRANCE_WIDTH:
+                chosen |= {0, len(run) - 1}
+            for i in sorted(chosen):
+                a, b = run[i]
+                edges += [(a, b), (b, a)]
+    return edges
+
+def build_abstraction(cost, cluster_size=CLUSTER_SIZE):
+    """Entrance nodes, inter-cluster edges and per-cluster entrance distance tables for a cost grid."""
+    if cluster_size % 2:
+        raise ValueError("cluster size must be even so clusters share the world's row parity")
+    height, width = cost.shape
+    columns, rows = -(-width // cluster_size), -(-height // cluster_size)
+    edges = find_entrances(cost, cluster_size)
+
+    # Nodes are entrance tiles, numbered by cluster and then by position
+    def cluster_of(tile):
+        return (tile // width // cluster_size) * columns + tile % width // cluster_size
+    tiles = sorted({a for a, _ in edges}, key=lambda tile: (cluster_of(tile), tile))
+    node_of = {tile: node for node, tile in enumerate(tiles)}
+    node_cluster = np.array([cluster_of(tile) for tile in tiles], dtype=np.int64)
+    cluster_nodes = np.searchsorted(node_cluster, np.arange(rows * columns + 1))
+
+    # Cut the (padded) cost grid into cluster windows; an even cluster size keeps row parity
+    padded = np.full((rows * cluster_size, columns * cluster_size), np.inf)
+    padded[:height, :width] = cost
+    windows = padded.reshape(rows, cluster_size, columns, cluster_size).swapaxes(1, 2)
+    windows = windows.reshape(rows * columns, cluster_size, cluster_size)
+
+    local_y = np.array([tile // width % cluster_size for tile in tiles], dtype=np.int64)
+    local_x = np.array([tile % width % cluster_size for tile in tiles], dtype=np.int64)
+    counts = np.diff(cluster_nodes)
+    tables = []
+    for first in range(0, rows * columns, CLUSTER_BATCH):
+        batch = range(first, min(first + CLUSTER_BATCH, rows * columns))
+        depth = max(1, counts[first:batch.stop].max())
+        dist = np.full((len(batch), depth, cluster_size, cluster_size), np.inf)
+        for c in batch:
+            nodes = np.arange(cluster_nodes[c], cluster_nodes[c + 1])
+            dist[c - first, nodes - cluster_nodes[c], local_y[nodes], local_x[nodes]] = 0.0
+        dist = relax(dist, windows[batch.start:batch.stop, None])
+        for c in batch:
+            nodes = np.arange(cluster_nodes[c], cluster_nodes[c + 1])
+            tables.append(dist[c - first][:len(nodes)][:, local_y[nodes], local_x[nodes]].reshape(-1))
+
+    table_offsets = np.concatenate([[0], np.cumsum([len(table) for table in tables])])
+    return {
+        "cluster_size": cluster_size,
+        "node_xy": np.array([(tile % width, tile // width) for tile in tiles], dtype=np.int32).reshape(-1, 2),
+        "cluster_nodes": cluster_nodes,
+        "table_offsets": table_offsets,
+        "tables": np.concatenate(tables) if tables else np.zeros(0),
+        "inter_edges": np.array([(node_of[a], node_of[b]) for a, b in edges], dtype=np.int32).reshape(-1, 2),
+        "inter_costs": np.array([cost.flat[b] for _, b in edges]),
+    }
+
+def capital_distance_fields(cost, capitals):
+    """(civs, H, W) cost for each tile to reach each civ's capital; inf where it can't."""
+    rows = cost.tolist()
+    fields = np.full((len(capitals),) + cost.shape, np.inf)
+    for civ, capital in enumerate(capitals):
+        costs, _ = _search(rows, {tuple(capital): 0.0}, reverse=True)
+        xs, ys = zip(*costs)
+        fields[civ, ys, xs] = list(costs.values())
+    return fields
+
+def quantize_fields(fields):
+    """(u16 row deltas, step per civ): each civ's distances in whole steps, UNREACHABLE where infinite."""
+    steps = []
+    quantized = np.full(fields.shape, UNREACHABLE, dtype=np.uint16)
+    for civ, field in enumerate(fields):
+        reachable = np.isfinite(field)
+        longest = field[reachable].max(initial=0.0)
+        step = DISTANCE_QUANTUM * max(1, int(np.ceil(longest / DISTANCE_QUANTUM / (UNREACHABLE - 1))))
+        quantized[civ][reachable] = np.round(field[reachable] / step)
+        steps.append(step)
+    quantized[..., 1:] = np.diff(quantized, axis=-1)
+    return quantized, steps
+
+def capital_distance_field(header, arrays, civ):
+    """A civ's capital distance field from decoded .paths arrays, as floats with inf where it can't be reached."""
+    stored = np.cumsum(arrays["capital_distance"][civ], axis=-1, dtype=np.uint16)
+    return np.where(stored == UNREACHABLE, np.inf, stored * header["capital_distance_steps"][civ])
+
+def encode_paths(world_header, abstraction, fields, world_hash=""):
+    """Serialize an abstraction and the capital distance fields."""
+    header = {
+        "width": world_header["width"],
+        "height": world_header["height"],
+        "seed": world_header["seed"],
+        "world_hash": world_hash,
+        "cluster_size": abstraction["cluster_size"],
+        "civ_capitals": world_header["civ_capitals"],
+    }
+    capital_distance, header["capital_distance_steps"] = quantize_fields(fields)
+    arrays = {
+        "node_xy": abstraction["node_xy"].astype("<i2"),
+        "cluster_nodes": abstraction["cluster_nodes"].astype("<i4"),
+        "table_offsets": abstraction["table_offsets"].astype("<i4"),
+        "tables": abstraction["tables"].astype("<f4"),
+        "inter_edges": abstraction["inter_edges"].astype("<i4"),
+        "inter_costs": abstraction["inter_costs"].astype("<f4"),
+        "capital_distance": capital_distance.astype("<u2"),
+    }
+    return pack_arrays(PATHS_MAGIC, PATHS_FORMAT_VERSION, header, arrays)
+
+def decode_paths(data):
+    """Parse paths bytes into (header dict, {name: numpy array})."""
+    return unpack_arrays(data, PATHS_MAGIC, PATHS_FORMAT_VERSION)
+
+def _search(rows, sources, goal=None, floor=0.0, bounds=None, reverse=False, region=None):
+    """Dijkstra, or A* toward goal, from {tile: cost} sources; reverse prices steps by the tile left, giving costs to the sources."""
+    x0, y0, x1, y1 = bounds or (0, 0, len(rows[0]), len(rows))
+    costs = dict(sources)
+    parents = {}
+    heap = [((hex_distance(tile, goal) * floor if goal else 0.0) + g, g, tile) for tile, g in sources.items()]
+    heapq.heapify(heap)
+    done = set()
+    while heap:
+        _, g, tile = heapq.heappop(heap)
+        if tile in done:
+            continue
+        done.add(tile)
+        if tile == goal:
+            break
+        leave = rows[tile[1]][tile[0]]
+        for neighbor in get_hex_neighbors(tile):
+            nx, ny = neighbor
+            if not (x0 <= nx < x1 and y0 <= ny < y1) or (region is not None and neighbor not in region):
+                continue
+            enter = rows[ny][nx]
+            if enter == INF:
+                continue
+            candidate = g + (leave if reverse else enter)
+            if candidate < costs.get(neighbor, INF):
+                costs[neighbor] = candidate
+                parents[neighbor] = tile
+                h = hex_distance(neighbor, goal) * floor if goal else 0.0
+                heapq.heappush(heap, (candidate + h, candidate, neighbor))
+    return costs, parents
+
+def _trace(parents, tile):
+    """Follow parent links from tile back to a source."""
+    path = [tile]
+    while path[-1] in parents:
+        path.append(parents[path[-1]])
+    return path
+
+def path_cost(cost, path):
+    """Cost of walking a tile path: every tile after the first is paid for on entry."""
+    return float(sum(cost[y, x] for x, y in path[1:]))
+
+def find_path(cost, start, goal):
+    """Plain A* over the whole grid with an admissible hex-distance heuristic; returns (path, cost)."""
+    if not np.isfinite(cost[start[1], start[0]]) or not np.isfinite(cost[goal[1], goal[0]]):
+        return [], INF
+    costs, parents = _search(cost.tolist(), {start: 0.0}, goal=goal, floor=cost[np.isfinite(cost)].min())
+    if goal not in costs:
+        return [], INF
+    return _trace(parents, goal)[::-1], costs[goal]
+
+def walk_to_capital(cost, field, start):
+    """Descend a capital distance field from start; returns the tile path, or [] if the capital is unreachable."""
+    if not np.isfinite(field[start[1], start[0]]):
+        return []
+    height, width = field.shape
+    path = [start]
+    while field[path[-1][1], path[-1][0]] > 0:
+        x, y = path[-1]
+        options = [(cost[ny, nx] + field[ny, nx], (nx, ny)) for nx, ny in get_hex_neighbors((x, y))
+                   if 0 <= nx < width and 0 <= ny < height]
+        path.append(min(options)[1])
+    return path
+
+class HierarchicalPathfinder:
+    """Path queries over baked tables: an abstract search between entrances, then local refinement."""
+
+    def __init__(self, cost, header, arrays):
+        self.cost = cost
+        self.rows = cost.tolist()
+        self.cluster_size = header["cluster_size"]
+        self.height, self.width = cost.shape
+        self.columns = -(-self.width // self.cluster_size)
+        self.node_xy = [tuple(xy) for xy in arrays["node_xy"].tolist()]
+        self.cluster_nodes = arrays["cluster_nodes"].tolist()
+        self.table_offsets = arrays["table_offsets"].tolist()
+        self.tables = arrays["tables"]
+        self.node_of = {xy: node for node, xy in enumerate(self.node_xy)}
+        self.floor = float(cost[np.isfinite(cost)].min())
+
+        self.inter = [[] for _ in self.node_xy]
+        for (a, b), step in zip(arrays["inter_edges"].tolist(), arrays["inter_costs"].tolist()):
+            self.inter[a].append((b, step))
+
+    def cluster_of(self, tile):
+        """Cluster id of an (x, y) tile."""
+        return (tile[1] // self.cluster_size) * self.columns + tile[0] // self.cluster_size
+
+    def cluster_bounds(self, cluster):
+        """(x0, y0, x1, y1) of a cluster, clipped to the map."""
+        x0 = cluster % self.columns * self.cluster_size
+        y0 = cluster // self.columns * self.cluster_size
+        return x0, y0, min(x0 + self.cluster_size, self.width), min(y0 + self.cluster_size, self.height)
+
+    def intra_edges(self, node):
+        """(other node, cost) for every entrance of node's cluster it can reach inside the cluster."""
+        cluster = self.cluster_of(self.node_xy[node])
+        first, last = self.cluster_nodes[cluster], self.cluster_nodes[cluster + 1]
+        count = last - first
+        row = self.tables[self.table_offsets[cluster] + (node - first) * count:][:count]
+        return [(first + i, float(step)) for i, step in enumerate(row.tolist()) if i != node - first and step != INF]
+
+    def _local_path(self, start, goal):
+        """Cheapest path between two tiles without leaving their shared cluster."""
+        costs, parents = _search(self.rows, {start: 0.0}, goal=goal, floor=self.floor,
+                                 bounds=self.cluster_bounds(self.cluster_of(start)))
+        return _trace(parents, goal)[::-1] if goal in costs else []
+
+    def find_path(self, start, goal):
+        """Hierarchical query; returns (tile path, cost), or ([], inf) if there is no path."""
+        if not np.isfinite(self.cost[start[1], start[0]]) or not np.isfinite(self.cost[goal[1], goal[0]]):
+            return [], INF
+        start_cluster, goal_cluster = self.cluster_of(start), self.cluster_of(goal)
+
+        # Local searches connect the endpoints to their clusters' entrances
+        from_start, _ = _search(self.rows, {start: 0.0}, bounds=self.cluster_bounds(start_cluster))
+        to_goal, _ = _search(self.rows, {goal: 0.0}, bounds=self.cluster_bounds(goal_cluster), reverse=True)
+        best_cost, best_nodes = from_start.get(goal, INF), None
+
+        # A* over entrances; GOAL_NODE stands for leaving the goal cluster's entrances for the goal tile
+        first, last = self.cluster_nodes[start_cluster], self.cluster_nodes[start_cluster + 1]
+        g_scores = {node: from_start[self.node_xy[node]] for node in range(first, last) if self.node_xy[node] in from_start}
+        parents = {}
+        heap = [(g + hex_distance(self.node_xy[node], goal) * self.floor, g, node) for node, g in g_scores.items()]
+        heapq.heapify(heap)
+        done = set()
+        while heap:
+            f, g, node = heapq.heappop(heap)
+            if f >= best_cost:
+                break
+            if node == GOAL_NODE:
+                best_cost, best_nodes = g, _trace(parents, GOAL_NODE)[:0:-1]
+                break
+            if node in done:
+                continue
+            done.add(node)
+            tile = self.node_xy[node]
+            moves = self.inter[node] + self.intra_edges(node)
+            if self.cluster_of(tile) == goal_cluster and tile in to_goal:
+                moves.append((GOAL_NODE, to_goal[tile]))
+            for other, step in moves:
+                candidate = g + step
+                if candidate < g_scores.get(other, INF):
+                    g_scores[other] = candidate
+                    parents[other] = node
+                    h = 0.0 if other == GOAL_NODE else hex_distance(self.node_xy[other], goal) * self.floor
+                    heapq.heappush(heap, (candidate + h, candidate, other))
+
+        if best_cost == INF:
+            return [], INF
+        if best_nodes is None:
+            return self._local_path(start, goal), best_cost
+
+        # Refine with one A* through the clusters the abstract path crosses and CORRIDOR_MARGIN around them. The
+        # entrance chain stitched from local paths lies inside, so this is never worse, and it cuts the corners
+        # the entrances force.
+        corridor = {self.cluster_of(self.node_xy[node]) for node in best_nodes} | {start_cluster, goal_cluster}
+        region = set()
+        for cluster in corridor:
+            x0, y0, x1, y1 = self.cluster_bounds(cluster)
+            region.update((x, y) for y in range(max(0, y0 - CORRIDOR_MARGIN), min(self.height, y1 + CORRIDOR_MARGIN))
+                          for x in range(max(0, x0 - CORRIDOR_MARGIN), min(self.width, x1 + CORRIDOR_MARGIN)))
+        costs, parents = _search(self.rows, {start: 0.0}, goal=goal, floor=self.floor, region=region)
+        return _trace(parents, goal)[::-1], costs[goal]
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Resize the card illustrations to the sizes the card UI shows them at.
+
+Each illustration is Lanczos-downsampled to fit each display tier of
+CARD_TIERS (the card in the hand, the hover enlargement, the enlarged view
+world_gen_ui.gd opens) and written to tiers/<tier>/ with the smallest lossless
+PNG encoding it allows: RGB when it is opaque, 8-bit palette when it has few
+enough colors. Art is never enlarged past its source size, so a tier that would
+come out the same size as the one below it reuses that one's file.
+
+manifest.json maps each illustration to its file per tier. card_ui.gd reads
+it to load the tier it is showing, and generate_resource_preloader.py puts
+only the hand tier in the startup group, with the larger tiers in groups of
+their own that load on demand.
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import numpy as np
+from PIL import Image
+
+from build_cache import BuildCache, code_version, hash_bytes, hash_file
+from lod_pyramid import LOD_CODE_VERSION, lanczos_resize
+from parallel import add_workers_argument, parallel_map, resolve_workers
+import telemetry
+
+CODE_VERSION = code_version(__file__)
+
+GODOT_DIR = "godot_project"
+ILLUSTRATIONS_DIR = f"{GODOT_DIR}/assets/card_art/illustrations"
+TIERS_DIR = f"{GODOT_DIR}/assets/card_art/tiers"
+MANIFEST_FILENAME = "manifest.json"
+
+# Largest (width, height) each tier is shown at, smallest first (card_ui.gd and world_gen_ui.gd)
+CARD_TIERS = {
+    "hand": (120, 100),  # illustration_rect's minimum size
+    "hover": (138, 115),  # Scaled 1.15 while hovered
+    "full": (240, 200),  # The enlarged view, scaled 2.0
+}
+
+def res_path(path):
+    """res:// path of a file under the Godot project."""
+    return "res://" + os.path.relpath(path, GODOT_DIR).replace(os.sep, "/")
+
+def tier_size(source_size, box):
+    """(width, height) of a source fit inside a tier's box, keeping its aspect and never enlarging it."""
+    width, height = source_size
+    scale = min(box[0] / width, box[1] / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def load_illustration(path):
+    """An illustration as an RGBA array at its own size."""
+    with Image.open(path) as img:
+        return np.asarray(img.convert('RGBA'))
+
+def png_bytes(img):
+    """PNG bytes of a PIL image, with zlib's strongest settings."""
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+def encode_optimized(pixels):
+    """Smallest lossless PNG of an RGBA array: without an unused alpha channel, and palettized if that's exact."""
+    img = Image.fromarray(pixels, 'RGBA')
+    if (pixels[..., 3] == 255).all():
+        img = img.convert('RGB')
+    candidates = [img]
+    if img.getcolors(256) is not None:
+        palette = img.quantize(colors=256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        # Only taken when every color got its own entry
+        if np.array_equal(np.asarray(palette.convert(img.mode)), np.asarray(img)):
+            candidates.append(palette)
+    return min((png_bytes(candidate) for candidate in candidates), key=len)
+
+def tier_files(sources):
+    """{tier: {stem: (width, height)}} of the files to write, and {stem: {tier: tier whose file it uses}}."""
+    files = {tier: {} for tier in CARD_TIERS}
+    uses = {}
+    for stem, source_size in sources.items():
+        uses[stem] = {}
+        previous = None
+        for tier, box in CARD_TIERS.items():
+            size = tier_size(source_size, box)
+            if previous is not None and files[previous][stem] == size:
+                uses[stem][tier] = previous
+                continue
+            files[tier][stem] = size
+            uses[stem][tier] = previous = tier
+    return files, uses
+
+def resize_group(paths, size):
+    """Lanczos-resample same-size sources to one size in a single stacked pass; (N, H, W, 4)."""
+    stack = np.stack([load_illustration(path) for path in paths])
+    if (stack.shape[2], stack.shape[1]) == size:
+        return stack
+    return lanczos_resize(stack, size[1], size[0])
+
+def process_card_art(source_dir=ILLUSTRATIONS_DIR, output_dir=TIERS_DIR, workers=1):
+    """Write every illustration's tiers and the manifest; returns files written."""
+    paths = {os.path.splitext(os.path.basename(path))[0]: path for path in sorted(glob.glob(f"{source_dir}/*.png"))}
+    if not paths:
+        print(f"No illustrations in {source_dir}")
+        return 0
+    sources = {}
+    for stem, path in paths.items():
+        with Image.open(path) as img:
+            sources[stem] = img.size
+    files, uses = tier_files(sources)
+
+    caches = {}
+    written = 0
+    for tier, sizes in files.items():
+        tier_dir = os.path.join(output_dir, tier)
+        if not sizes and not os.path.isdir(tier_dir):
+            continue
+        os.makedirs(tier_dir, exist_ok=True)
+        cache = caches[tier] = BuildCache(tier_dir, "process_card_art")
+        keys = {stem: hash_bytes(CODE_VERSION, LOD_CODE_VERSION, hash_file(paths[stem]), size)
+                for stem, size in sizes.items()}
+        stale = [stem for stem in sizes if not cache.keep(f"{stem}.png", keys[stem])]
+        if not stale:
+            continue
+        # Sources of one size going to one size resample as one stack
+        groups = {}
+        for stem in stale:
+            groups.setdefault((sources[stem], sizes[stem]), []).append(stem)
+        resized = {}
+        with telemetry.span("resize", tier=tier):
+            for (_, size), stems in groups.items():
+                stack = resize_group([paths[stem] for stem in stems], size)
+                resized.update(zip(stems, stack))
+                telemetry.count(pixels=stack[..., 0].size)
+        with telemetry.span("encode", tier=tier):
+            encoded = parallel_map(encode_optimized, [resized[stem] for stem in stale], workers)
+        with telemetry.span("write", tier=tier):
+            for stem, data in zip(stale, encoded):
+                if cache.store(f"{stem}.png", keys[stem], data):
+                    written += 1
+                    telemetry.detail(f"  {tier}/{stem}.png {sizes[stem][0]}x{sizes[stem][1]}")
+
+    manifest = {
+        "tiers": {tier: list(box) for tier, box in CARD_TIERS.items()},
+        "illustrations": {stem: {tier: res_path(os.path.join(output_dir, used, f"{stem}.png"))
+                                 for tier, used in uses[stem].items()} for stem in paths},
+    }
+    cache = BuildCache(output_dir, "process_card_art")
+    data = (json.dumps(manifest, indent=2, sort_keys=True) + "\n").encode()
+    written += cache.write(MANIFEST_FILENAME, hash_bytes(CODE_VERSION, data), data)
+    for tier_cache in caches.values():
+        tier_cache.finish()
+    cache.finish()
+
+    for tier, sizes in files.items():
+        source_bytes = sum(os.path.getsize(paths[stem]) for stem in sizes)
+        output_bytes = sum(os.path.getsize(os.path.join(output_dir, tier, f"{stem}.png")) for stem in sizes)
+        shared = sum(used[tier] != tier for used in uses.values())
+        print(f"  {tier:6s} {CARD_TIERS[tier][0]}x{CARD_TIERS[tier][1]}: {len(sizes)} files, "
+              f"{output_bytes / 1024:.1f} KiB (sources {source_bytes / 1024:.1f} KiB)"
+              f"{f', {shared} reuse a smaller tier' if shared else ''}")
+    return written
+
+def load_manifest(output_dir=TIERS_DIR):
+    """The manifest written by process_card_art(), or None if there is none."""
+    path = os.path.join(output_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Resize the card illustrations to their display tiers.")
+    parser.add_argument("--source", default=ILLUSTRATIONS_DIR, help=f"illustrations (default {ILLUSTRATIONS_DIR})")
+    parser.add_argument("--output", default=TIERS_DIR, help=f"tier directories and manifest (default {TIERS_DIR})")
+    add_workers_argument(parser)
+    telemetry.add_telemetry_arguments(parser)
+    args = parser.parse_args()
+    telemetry.configure_from_args(args)
+
+    print("=" * 70)
+    print("CARD ILLUSTRATION TIERS")
+    print("=" * 70)
+
+    written = process_card_art(args.source, args.output, resolve_workers(args.workers))
+
+    print("\n" + "=" * 70)
+    print(f"Done: {written} file(s) written to {args.output}")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
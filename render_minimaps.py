@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Render minimaps and hex overview images of baked worlds.
+
+Each .world file written by bake_worlds.py gets one minimap per display mode
+of minimap.gd (terrain, civilizations, resources) at each requested scale, in
+pixels per tile. Colors come from lookup tables indexed by the whole grid at
+once, built from the same palette as _get_terrain_color, so a 1x minimap is
+pixel-for-pixel what the game draws. --overview also composites the tile art
+of a tileset style into a full-resolution image laid out like the TileMap.
+Images are written to a minimaps/ directory beside the worlds.
+"""
+import argparse
+import glob
+import os
+import numpy as np
+from PIL import Image
+
+import world_format
+from bake_worlds import OUTPUT_DIR
+from build_cache import BuildCache, code_version, encode_png, hash_bytes, hash_file
+from pack_tile_atlas import collect_style_tiles, load_tile
+from parallel import add_workers_argument, parallel_map, resolve_workers
+from terrain_types import ALLOWS_RIVERS, TILE_ART_DIR, TILE_SIZE, TILESET_STYLES
+from world_format import WORLD_EXTENSION, read_world
+
+CODE_VERSION = hash_bytes(code_version(world_format.__file__), code_version(__file__))[:16]
+
+MINIMAP_DIRNAME = "minimaps"
+MODES = ["terrain", "civilizations", "resources"]
+DEFAULT_SCALES = "0.5,1,2"
+
+# _get_terrain_color in minimap.gd; ids it doesn't know are black
+TERRAIN_COLORS = {
+    0: (0.2, 0.4, 0.8), 1: (0.8, 0.7, 0.4), 2: (0.3, 0.7, 0.3), 3: (0.2, 0.5, 0.2),
+    4: (0.6, 0.5, 0.3), 5: (0.5, 0.5, 0.5), 6: (0.4, 0.4, 0.4), 7: (0.1, 0.2, 0.5),
+    8: (0.2, 0.1, 0.2), 9: (0.9, 0.3, 0.1), 10: (0.9, 0.9, 1.0), 11: (0.7, 0.8, 0.9),
+    12: (0.4, 0.6, 0.8), 13: (0.2, 0.6, 0.3), 14: (0.7, 0.7, 0.4), 15: (0.6, 0.6, 0.7),
+}
+
+# CIV_COLORS in world_map.gd
+CIV_COLORS = [
+    (1, 0, 0, 0.6), (0, 1, 0, 0.6), (0, 0, 1, 0.6), (1, 1, 0, 0.6),
+    (0, 1, 1, 0.6), (1, 0, 1, 0.6), (1, 0.5, 0, 0.6), (0.5, 0, 1, 0.6),
+]
+
+RESOURCE_FULL_AMOUNT = 500.0  # Total amount at which the resources mode is fully bright
+
+# Hex layout of the TileMap (stacked, vertical offset axis): odd columns shift half a tile down,
+# columns are 3/4 of a tile apart
+COLUMN_SPACING = TILE_SIZE * 3 // 4
+
+def to_rgba8(colors):
+    """Convert float colors to RGBA8 the way Godot stores them in an Image."""
+    colors = np.asarray(colors, dtype=np.float32)
+    # Godot rounds halves up, where np.round would round them to even
+    return np.floor(np.clip(colors, 0, 1) * np.float32(255) + np.float32(0.5)).astype(np.uint8)
+
+def terrain_lut(darken=0.0):
+    """(256, 4) RGBA8 table of terrain colors by terrain id, optionally darkened like Color.darkened."""
+    lut = np.zeros((256, 4), dtype=np.float32)
+    lut[:, 3] = 1
+    for terrain_id, rgb in TERRAIN_COLORS.items():
+        lut[terrain_id, :3] = np.asarray(rgb, dtype=np.float32) * np.float32(1 - darken)
+    return to_rgba8(lut)
+
+def civ_lut():
+    """(256, 4) RGBA8 table of civ colors, indexed by civ id as uint8; slot 255 (-1, no civ) is unused."""
+    return to_rgba8([CIV_COLORS[civ % len(CIV_COLORS)] for civ in range(256)])
+
+def render_terrain(arrays):
+    """Terrain mode: one pixel per tile in its terrain color."""
+    return terrain_lut()[arrays["terrain"]]
+
+def render_civilizations(arrays):
+    """Civilizations mode: owned tiles in their civ color, the rest in darkened terrain colors."""
+    civ = arrays["civ"]
+    return np.where((civ >= 0)[..., None], civ_lut()[civ.view(np.uint8)], terrain_lut(0.5)[arrays["terrain"]])
+
+def render_resources(arrays):
+    """Resources mode: brightness from the tile's total resource amount."""
+    total = arrays["resources"].sum(axis=0, dtype=np.float64)
+    intensity = np.clip(total / RESOURCE_FULL_AMOUNT, 0, 1)
+    colors = np.stack([intensity, intensity * 0.8, np.zeros_like(intensity), np.ones_like(intensity)], axis=-1)
+    return to_rgba8(colors)
+
+RENDERERS = {"terrain": render_terrain, "civilizations": render_civilizations, "resources": render_resources}
+
+def scale_image(pixels, scale):
+    """Resize a one-pixel-per-tile image to `scale` pixels per tile: blocky when enlarging, averaged when shrinking."""
+    image = Image.fromarray(pixels, 'RGBA')
+    if scale == 1:
+        return image
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    resample = Image.Resampling.NEAREST if scale > 1 else Image.Resampling.BOX
+    return image.resize(size, resample)
+
+def style_tiles(style):
+    """(tile stack, normal index by terrain id, river index by terrain id) for a tileset style."""
+    paths = collect_style_tiles(TILESET_STYLES[style], TILE_ART_DIR if style != "original" else None)
+    # Slot 0 is a transparent tile for terrains without art
+    tiles = [np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)]
+    normal = np.zeros(256, dtype=np.intp)
+    river = np.zeros(256, dtype=np.intp)
+    for (terrain_id, variant, is_river), path in paths.items():
+        if variant != 0:
+            continue
+        (river if is_river else normal)[terrain_id] = len(tiles)
+        tiles.append(load_tile(path))
+    # Terrains without river art, or where rivers aren't allowed, keep their normal tile
+    allowed = np.zeros(256, dtype=bool)
+    allowed[ALLOWS_RIVERS] = True
+    river = np.where(allowed & (river > 0), river, normal)
+    return np.stack(tiles), normal, river
+
+def style_inputs_key(style):
+    """Hash of the tile art a style's overview is composited from."""
+    paths = collect_style_tiles(TILESET_STYLES[style], TILE_ART_DIR if style != "original" else None)
+    return hash_bytes(*(f"{key}:{hash_file(path)}" for key, path in paths.items()))
+
+def render_overview(arrays, style):
+    """Composite a style's tile art at every tile's TileMap position into one RGBA array."""
+    tiles, normal, river = style_tiles(style)
+    terrain = arrays["terrain"]
+    index = np.where(arrays["river"].astype(bool), river[terrain], normal[terrain])
+    height, width = terrain.shape
+    half = TILE_SIZE // 2
+    overlap = TILE_SIZE - COLUMN_SPACING
+
+    canvas = np.zeros((TILE_SIZE * height + half, COLUMN_SPACING * (width - 1) + TILE_SIZE, 4), dtype=np.uint8)
+    alpha_tiles = tiles[:, :, :overlap, 3:].astype(np.float32) / 255
+    # Columns go on in order, each as one vectorized strip. A column only overlaps the left `overlap`
+    # pixels of the next one, so the rest of each strip lands on empty canvas and is copied as is
+    for x in range(width):
+        strip = tiles[index[:, x]].reshape(height * TILE_SIZE, TILE_SIZE, 4)
+        top = half if x & 1 else 0
+        region = canvas[top:top + height * TILE_SIZE, x * COLUMN_SPACING:x * COLUMN_SPACING + TILE_SIZE]
+        region[:, overlap:] = strip[:, overlap:]
+        if x == 0:
+            region[:, :overlap] = strip[:, :overlap]
+            continue
+        alpha = alpha_tiles[index[:, x]].reshape(height * TILE_SIZE, overlap, 1)
+        below = region[:, :overlap].astype(np.float32)
+        out_alpha = alpha + below[..., 3:] / 255 * (1 - alpha)
+        rgb = strip[:, :overlap, :3] * alpha + below[..., :3] * (below[..., 3:] / 255) * (1 - alpha)
+        rgb = np.divide(rgb, out_alpha, out=np.zeros_like(rgb), where=out_alpha > 0)
+        region[:, :overlap, :3] = np.round(rgb).astype(np.uint8)
+        region[:, :overlap, 3:] = np.round(out_alpha * 255).astype(np.uint8)
+    return canvas
+
+def output_names(world_path, modes, scales, styles):
+    """{filename: (kind, argument)} of every image rendered for one world."""
+    stem = os.path.splitext(os.path.basename(world_path))[0]
+    names = {}
+    for mode in modes:
+        for scale in scales:
+            names[f"{stem}_{mode}_x{scale:g}.png"] = ("minimap", (mode, scale))
+    for style in styles:
+        names[f"{stem}_overview_{style}.png"] = ("overview", style)
+    return names
+
+def render_world(job):
+    """Render the requested images of one world; returns {filename: PNG bytes}."""
+    world_path, outputs = job
+    _, arrays = read_world(world_path)
+    bases = {}
+    images = {}
+    for filename, (kind, argument) in outputs.items():
+        if kind == "minimap":
+            mode, scale = argument
+            if mode not in bases:
+                bases[mode] = RENDERERS[mode](arrays)
+            images[filename] = encode_png(scale_image(bases[mode], scale))
+        else:
+            images[filename] = encode_png(render_overview(arrays, argument))
+    return images
+
+def parse_scales(spec):
+    """Parse a scale list like "0.25,1,4" into pixels-per-tile values."""
+    scales = [float(part) for part in spec.split(",") if part.strip()]
+    if not scales or min(scales) <= 0:
+        raise argparse.ArgumentTypeError("scales must be positive numbers")
+    return list(dict.fromkeys(scales))
+
+def main():
+    parser = argparse.ArgumentParser(description="Render minimaps and hex overview images of baked worlds.")
+    parser.add_argument("worlds", nargs="*", help=f"world files (default: every {WORLD_EXTENSION} in {OUTPUT_DIR})")
+    parser.add_argument("--modes", default=",".join(MODES),
+                        help=f"comma-separated display modes (default {','.join(MODES)})")
+    parser.add_argument("--scales", type=parse_scales, default=parse_scales(DEFAULT_SCALES),
+                        help=f"comma-separated minimap scales in pixels per tile (default {DEFAULT_SCALES})")
+    parser.add_argument("--overview", nargs="*", choices=list(TILESET_STYLES), metavar="STYLE",
+                        help="also composite full-resolution overviews with these tileset styles (default original)")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in RENDERERS]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+    # A bare --overview means the original art
+    styles = [] if args.overview is None else args.overview or ["original"]
+
+    print("=" * 70)
+    print("MINIMAP RENDERER")
+    print("=" * 70)
+
+    worlds = args.worlds or sorted(glob.glob(os.path.join(OUTPUT_DIR, "*" + WORLD_EXTENSION)))
+    if not worlds:
+        print("No worlds found; bake some with bake_worlds.py first")
+        return
+
+    style_keys = {style: style_inputs_key(style) for style in styles}
+    caches = {}
+    jobs = []
+    for world_path in worlds:
+        output_dir = os.path.join(os.path.dirname(world_path), MINIMAP_DIRNAME)
+        if output_dir not in caches:
+            os.makedirs(output_dir, exist_ok=True)
+            caches[output_dir] = BuildCache(output_dir, "render_minimaps")
+        cache = caches[output_dir]
+        world_key = hash_bytes(CODE_VERSION, hash_file(world_path))
+        stale = {}
+        for filename, (kind, argument) in output_names(world_path, modes, args.scales, styles).items():
+            key = hash_bytes(world_key, style_keys[argument] if kind == "overview" else "")
+            if not cache.keep(filename, key):
+                stale[filename] = (kind, argument, key)
+        if stale:
+            jobs.append((world_path, cache, stale))
+    print(f"{len(jobs)} of {len(worlds)} world(s) need images")
+
+    work = [(world_path, {name: entry[:2] for name, entry in stale.items()}) for world_path, _, stale in jobs]
+    written = 0
+    for (world_path, cache, stale), images in zip(jobs, parallel_map(render_world, work, resolve_workers(args.workers))):
+        for filename, data in images.items():
+            written += cache.store(filename, stale[filename][2], data)
+        print(f"  {os.path.basename(world_path)}: {len(images)} image(s)")
+    # Each run renders only the worlds and modes asked for, so images from earlier runs are kept
+    for cache in caches.values():
+        cache.finish(prune=False)
+
+    print("\n" + "=" * 70)
+    print(f"Done: {written} image(s) written")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Nearest-resource fields for baked worlds.
+
+citizen.gd's find_nearest_resource scans the tiles around a citizen for the
+resource types of its command. Here that search is done once per resource
+group (RESOURCE_GROUPS, one per gathering command): a multi-source Dijkstra
+from every tile holding any of the group's resources gives each tile the
+movement cost to its cheapest deposit and which deposit that is, so picking a
+target is one lookup. Costs follow path_abstraction.py: walking onto a tile
+costs its terrain's TERRAIN_MOVEMENT_COSTS, and infinite is impassable.
+
+Each group is stored as three arrays:
+
+    <group>_deposits   (N, 2) x, y of every deposit tile, the deposit ids
+    <group>_nearest    (H, W) id of each tile's nearest deposit, -1 if none
+    <group>_distance   (H, W) movement cost to that deposit, inf if none
+
+The tiles whose nearest deposit is d are exactly the ones to fix when d is
+emptied (deplete_resource taking the last of the group's resources from its
+tile). remove_deposit() repairs just those: every other tile keeps its
+nearest deposit, since removing a deposit can only make the rest farther, so
+the region is seeded from its border with the neighbors' settled costs and
+searched within itself. The deposit keeps its id, so stored ids stay valid.
+"""
+import heapq
+import numpy as np
+
+from path_abstraction import INF
+from world_format import pack_arrays, unpack_arrays
+from world_generator import get_hex_neighbors
+
+FIELDS_MAGIC = b"STRATRES"
+FIELDS_FORMAT_VERSION = 1
+FIELDS_EXTENSION = ".resources"
+
+# The target_resources of each gathering command in citizen.gd's find_nearest_resource
+RESOURCE_GROUPS = {
+    "food_water": ["food", "water"],
+    "materials": ["wood", "stone", "metal_ore"],
+}
+
+def deposit_tiles(header, resources, group):
+    """(N, 2) x, y of the tiles holding any of a group's resources, in row order."""
+    types = [header["resource_types"].index(name) for name in RESOURCE_GROUPS[group]
+             if name in header["resource_types"]]
+    ys, xs = np.nonzero(resources[types].sum(axis=0, dtype=np.int64) > 0)
+    return np.stack([xs, ys], axis=1)
+
+def _settle(rows, distance, nearest, heap, region=None):
+    """Dijkstra toward the deposits from a (cost, tile) heap, in place on nested lists or arrays; region limits it."""
+    height, width = len(rows), len(rows[0])
+    while heap:
+        g, (x, y) = heapq.heappop(heap)
+        if g > distance[y][x]:
+            continue
+        # A walker on a neighbor pays to step onto this tile
+        candidate = g + rows[y][x]
+        for nx, ny in get_hex_neighbors((x, y)):
+            if not (0 <= nx < width and 0 <= ny < height) or rows[ny][nx] == INF:
+                continue
+            if region is not None and (nx, ny) not in region:
+                continue
+            if candidate < distance[ny][nx]:
+                distance[ny][nx] = candidate
+                nearest[ny][nx] = nearest[y][x]
+                heapq.heappush(heap, (candidate, (nx, ny)))
+
+def nearest_deposit_field(cost, deposits):
+    """(nearest deposit id, movement cost to it) of every tile, from (N, 2) deposit tiles."""
+    height, width = cost.shape
+    distance = [[INF] * width for _ in range(height)]
+    nearest = [[-1] * width for _ in range(height)]
+    heap = []
+    for index, (x, y) in enumerate(deposits.tolist()):
+        distance[y][x] = 0.0
+        nearest[y][x] = index
+        heap.append((0.0, (x, y)))
+    heapq.heapify(heap)
+    _settle(cost.tolist(), distance, nearest, heap)
+    return np.array(nearest, dtype=np.int32), np.array(distance)
+
+def remove_deposit(cost, nearest, distance, deposit):
+    """Repair a group's fields in place after a deposit is emptied; returns how many tiles were re-resolved."""
+    height, width = cost.shape
+    ys, xs = np.nonzero(nearest == deposit)
+    region = set(zip(xs.tolist(), ys.tolist()))
+    nearest[ys, xs] = -1
+    distance[ys, xs] = INF
+
+    # Each region tile starts from its cheapest neighbor outside the region, whose cost is already settled
+    heap = []
+    for x, y in region:
+        for nx, ny in get_hex_neighbors((x, y)):
+            if 0 <= nx < width and 0 <= ny < height and (nx, ny) not in region and nearest[ny, nx] >= 0:
+                candidate = distance[ny, nx] + cost[ny, nx]
+                if candidate < distance[y, x]:
+                    distance[y, x] = candidate
+                    nearest[y, x] = nearest[ny, nx]
+        if distance[y, x] < INF:
+            heap.append((float(distance[y, x]), (x, y)))
+    heapq.heapify(heap)
+    _settle(cost, distance, nearest, heap, region)
+    return len(region)
+
+def build_resource_fields(header, arrays, cost):
+    """{array name: array} of every group's deposits, nearest deposit ids and distances."""
+    fields = {}
+    for group in RESOURCE_GROUPS:
+        deposits = deposit_tiles(header, arrays["resources"], group)
+        nearest, distance = nearest_deposit_field(cost, deposits)
+        fields[f"{group}_deposits"] = deposits
+        fields[f"{group}_nearest"] = nearest
+        fields[f"{group}_distance"] = distance
+    return fields
+
+def encode_fields(world_header, fields, world_hash=""):
+    """Serialize the nearest-resource fields of a world."""
+    header = {
+        "width": world_header["width"],
+        "height": world_header["height"],
+        "seed": world_header["seed"],
+        "world_hash": world_hash,
+        "groups": RESOURCE_GROUPS,
+    }
+    dtypes = {"deposits": "<i2", "nearest": "<i4", "distance": "<f4"}
+    arrays = {name: array.astype(dtypes[name.rsplit("_", 1)[1]]) for name, array in fields.items()}
+    return pack_arrays(FIELDS_MAGIC, FIELDS_FORMAT_VERSION, header, arrays)
+
+def decode_fields(data):
+    """Parse fields bytes into (header dict, {name: numpy array})."""
+    return unpack_arrays(data, FIELDS_MAGIC, FIELDS_FORMAT_VERSION)
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Run the tile asset pipeline as one dependency graph.
+
+Each stage declares the files and directories it reads and writes; a stage
+depends on every earlier stage that writes something it reads, so the order
+the scripts have to run in is written down here once. Stages whose
+dependencies are done run concurrently in threads (the bordered and
+borderless branches, say), and every whole-sheet decode is shared between
+them, so each source sheet is decoded once per run. Stage output is buffered
+and printed as each stage finishes.
+
+--only runs just the named stages, --from a stage and everything downstream
+of it; names may be globs like "atlas:*". Stages outside the selection are
+assumed to be up to date.
+
+--watch runs the selection once, then polls the files the stages read and
+reruns only the stages reading a changed file, plus everything downstream of
+them. One shared_sheets() block stays open the whole time, so decoded sheets
+and the extractor's resampled hex cells stay warm between rebuilds (bounded by
+--cache-mb): after an edit to one cell of a sheet, only that cell is resampled,
+classified and written again. After the first pass every selected sheet's cells
+are resampled into the cache even where the build cache skipped extraction, so
+the first edit starts warm too.
+Refitting the terrain table reads every labeled cell of every sheet, so watch
+rebuilds leave terrain_lut out unless --retrain-lut is given, along with the
+stages only it would have reached (the other sheet's tiles and what follows
+from them). A table retrained by hand is picked up like any other changed
+input.
+"""
+import argparse
+import fnmatch
+import glob
+import io
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+from analyze_hex_tileset import detect_hex_lattice, lattice_path, save_lattice
+from asset_catalog import CATALOG_PATH, update_catalog
+from composite_rivers import DEFAULT_SHAPES, composite_styles, parse_shapes
+from create_missing_fantasy_tiles import create_missing_tiles
+from dedupe_tiles import DEFAULT_THRESHOLD, dedupe_styles
+from extract_fantasy_hex_tiles import extract_hex_tiles, warm_cells
+from generate_import_sidecars import write_sidecars
+from generate_resource_preloader import CARD_ART_DIR, PRELOADER_PATH, generate_preloader, report_unused
+from index_tile_palette import INDEXED_DIR, index_style
+from pack_tile_atlas import ATLAS_DIR, REDIRECTS_FILENAME, pack_style
+from parallel import add_workers_argument, resolve_workers
+from process_card_art import ILLUSTRATIONS_DIR, TIERS_DIR, process_card_art
+from sheet_stream import shared_sheets, warm_cache
+from split_fantasy_tileset import split_tileset
+import telemetry
+from terrain_lut import LUT_PATH
+from terrain_types import TILE_ART_DIR, TILESET_STYLES
+from train_terrain_lut import report_path, train_terrain_lut
+
+ASSETS_DIR = "godot_project/assets"
+
+# Source sheet of each fantasy style
+SHEETS = {
+    "fantasy_bordered": f"{ASSETS_DIR}/fantasyhextiles_v3.png",
+    "fantasy_borderless": f"{ASSETS_DIR}/fantasyhextiles_v3_borderless.png",
+}
+
+# Stages watch rebuilds skip unless asked for: refitting the table costs far more than the edit it follows
+WATCH_SKIPPED = ("terrain_lut",)
+
+class Stage:
+    """One step of the pipeline: what it reads, what it writes, and how to run it."""
+
+    def __init__(self, name, run, inputs=(), outputs=(), warm=None):
+        self.name = name
+        self.run = run  # Called with the worker process count this stage may use
+        self.warm = warm  # Fills the warm cache with what a rebuild would reuse, for --watch; optional
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.needs = set()
+
+def paths_overlap(a, b):
+    """True if two declared paths can refer to the same file: equal, one inside the other, or matched as globs."""
+    # Compared a component at a time, so a glob never reaches into a subdirectory
+    parts = zip(os.path.normpath(a).split(os.sep), os.path.normpath(b).split(os.sep))
+    return all(fnmatch.fnmatchcase(x, y) or fnmatch.fnmatchcase(y, x) for x, y in parts)
+
+def link_stages(stages):
+    """Make each stage depend on the earlier stages writing any of its inputs."""
+    for i, stage in enumerate(stages):
+        stage.needs = {earlier.name for earlier in stages[:i]
+                       if any(paths_overlap(path, output) for path in stage.inputs for output in earlier.outputs)}
+    return stages
+
+def detect_lattice(sheet_path, workers=1):
+    """Detect a sheet's hex lattice and write its sidecar."""
+    lattice = detect_hex_lattice(sheet_path)
+    if lattice is None:
+        raise ValueError(f"no hex lattice found in {sheet_path}")
+    print(f"  {save_lattice(sheet_path, lattice)}: {lattice}")
+
+def catalog_tiles(workers=1):
+    """Update the tile catalog."""
+    tiles, reread = update_catalog(workers=workers)
+    print(f"  {CATALOG_PATH}: {tiles} tiles ({reread} re-read)")
+
+def style_inputs(style):
+    """Everything a style's tile list is built from: its tiles, the original fallback art and their redirects."""
+    directories = [TILESET_STYLES[style]] + ([TILE_ART_DIR] if style != "original" else [])
+    return [pattern for directory in directories
+            for pattern in (os.path.join(directory, "*.png"), os.path.join(directory, REDIRECTS_FILENAME))]
+
+def build_stages(grid_split=False, threshold=DEFAULT_THRESHOLD, variants=1, seed=0):
+    """Declare the pipeline's stages, in an order where every stage comes after what it reads."""
+    stages = []
+    sheets = {style: sheet for style, sheet in SHEETS.items() if os.path.exists(sheet)}
+    for style in [style for style in SHEETS if style not in sheets]:
+        print(f"Warning: {SHEETS[style]} not found, skipping {style}")
+    if not grid_split:
+        for style, sheet in sheets.items():
+            stages.append(Stage(f"lattice:{style.removeprefix('fantasy_')}", partial(detect_lattice, sheet),
+                                inputs=[sheet], outputs=[lattice_path(sheet)]))
+        # The terrain table is fit from the labeled cells of every sheet, on their lattices
+        stages.append(Stage("terrain_lut", lambda workers: train_terrain_lut(),
+                            inputs=[path for sheet in sheets.values() for path in (sheet, lattice_path(sheet))],
+                            outputs=[LUT_PATH, report_path(LUT_PATH)]))
+
+    for style, sheet in sheets.items():
+        output_dir = TILESET_STYLES[style]
+        branch = style.removeprefix("fantasy_")
+        if grid_split:
+            extract = partial(split_tileset, sheet, output_dir, style)
+        else:
+            extract = partial(extract_hex_tiles, sheet, output_dir, None, False)
+        stages.append(Stage(f"tiles:{branch}", lambda workers, extract=extract: extract(workers=workers),
+                            inputs=[sheet, lattice_path(sheet), LUT_PATH], outputs=[output_dir],
+                            warm=None if grid_split else partial(warm_cells, sheet)))
+        fill = partial(create_missing_tiles, output_dir, variants=variants, seed=seed)
+        stages.append(Stage(f"fill:{branch}", lambda workers, fill=fill: fill(),
+                            inputs=[output_dir], outputs=[output_dir]))
+
+    # River tiles are drawn over every style's base tiles, filled ones included
+    stages.append(Stage("rivers", lambda workers: composite_styles(parse_shapes(DEFAULT_SHAPES), workers=workers),
+                        inputs=list(TILESET_STYLES.values()), outputs=list(TILESET_STYLES.values())))
+    stages.append(Stage("dedupe", lambda workers: dedupe_styles(threshold),
+                        inputs=[pattern for style in TILESET_STYLES for pattern in style_inputs(style)[:1]],
+                        outputs=[os.path.join(directory, REDIRECTS_FILENAME) for directory in TILESET_STYLES.values()]))
+    stages.append(Stage("catalog", catalog_tiles,
+                        inputs=list(TILESET_STYLES.values()), outputs=[CATALOG_PATH]))
+    for style in TILESET_STYLES:
+        stages.append(Stage(f"atlas:{style}", lambda workers, style=style: pack_style(style, TILESET_STYLES[style]),
+                            inputs=style_inputs(style),
+                            outputs=[os.path.join(ATLAS_DIR, f"{style}{ext}") for ext in (".png", ".json")]))
+        stages.append(Stage(f"palette:{style}", lambda workers, style=style: index_style(style, TILESET_STYLES[style]),
+                            inputs=style_inputs(style), outputs=[os.path.join(INDEXED_DIR, style)]))
+    stages.append(Stage("cards", lambda workers: process_card_art(workers=workers),
+                        inputs=[ILLUSTRATIONS_DIR], outputs=[TIERS_DIR]))
+    stages.append(Stage("preloader", lambda workers: report_unused(generate_preloader()),
+                        inputs=[TILE_ART_DIR, CARD_ART_DIR], outputs=[PRELOADER_PATH]))
+    # Last, so every PNG the stages above wrote has its sidecar
+    stages.append(Stage("imports", lambda workers: write_sidecars(),
+                        inputs=[TILE_ART_DIR, CARD_ART_DIR], outputs=[TILE_ART_DIR, CARD_ART_DIR]))
+    return link_stages(stages)
+
+def select_stages(stages, only=None, start=None):
+    """Names of the stages to run: matches of --only, or matches of --from and everything downstream."""
+    names = [stage.name for stage in stages]
+    if only is None and start is None:
+        return set(names)
+
+    def matching(patterns):
+        matched = {name for pattern in patterns for name in fnmatch.filter(names, pattern)}
+        unknown = [pattern for pattern in patterns if not fnmatch.filter(names, pattern)]
+        if unknown:
+            raise ValueError(f"no stage matches {', '.join(unknown)} (stages: {', '.join(names)})")
+        return matched
+
+    if only is not None:
+        return matching(only)
+    selected = matching(start)
+    for stage in stages:
+        if stage.needs & selected:
+            selected.add(stage.name)
+    return selected
+
+class _StageOutput(io.TextIOBase):
+    """sys.stdout stand-in that sends each stage thread's prints to its own buffer."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        return (self.stream if buffer is None else buffer).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+def _run_stage(stage, workers, output):
+    """Run one stage with its prints captured; returns (seconds, log, exception or None)."""
+    output.local.buffer = io.StringIO()
+    began = time.perf_counter()
+    error = None
+    try:
+        with telemetry.span(f"stage:{stage.name}", workers=workers):
+            stage.run(workers)
+    except Exception as exception:
+        error = exception
+    log = output.local.buffer.getvalue()
+    output.local.buffer = None
+    return time.perf_counter() - began, log, error
+
+def run_stages(stages, selected, workers=1):
+    """Run the selected stages, each as soon as the selected stages it needs are done; returns failed names."""
+    pending = [stage for stage in stages if stage.name in selected]
+    done, failed = set(), set()
+    output = _StageOutput(sys.stdout)
+    sys.stdout = output
+    try:
+        with shared_sheets(), ThreadPoolExecutor(max_workers=max(1, len(pending))) as pool:
+            running = {}
+            while pending or running:
+                # A stage is ready once every selected stage it needs has finished; unselected ones count as done
+                ready = []
+                for stage in [stage for stage in pending if not (stage.needs & selected) - done - failed]:
+                    pending.remove(stage)
+                    if stage.needs & failed:
+                        failed.add(stage.name)
+                        print(f"[{stage.name}] skipped: {', '.join(sorted(stage.needs & failed))} failed",
+                              file=output.stream)
+                    else:
+                        ready.append(stage)
+
+                # The worker processes are split between the stages running at the same time
+                share = max(1, workers // max(1, len(running) + len(ready)))
+                for stage in ready:
+                    running[pool.submit(_run_stage, stage, share, output)] = stage
+                if not running:
+                    continue
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    seconds, log, error = future.result()
+                    output.stream.write(log)
+                    if error is not None:
+                        failed.add(stage.name)
+                        print(f"[{stage.name}] FAILED after {seconds:.2f}s: {error!r}", file=output.stream)
+                    else:
+                        done.add(stage.name)
+                        print(f"[{stage.name}] done in {seconds:.2f}s", file=output.stream)
+    finally:
+        sys.stdout = output.stream
+    return failed
+
+def snapshot(paths):
+    """{file: (mtime_ns, size)} of every file a list of declared paths covers: files, directory trees and globs."""
+    stats = {}
+    for pattern in paths:
+        for path in glob.glob(pattern) if glob.has_magic(pattern) else [pattern]:
+            files = [path]
+            if os.path.isdir(path):
+                files = [os.path.join(root, name) for root, _, names in os.walk(path) for name in names]
+            for file in files:
+                try:
+                    stat = os.stat(file)
+                except FileNotFoundError:
+                    continue
+                stats[file] = (stat.st_mtime_ns, stat.st_size)
+    return stats
+
+def changed_files(before, after):
+    """Files added, removed or modified between two snapshots."""
+    return sorted(path for path in before.keys() | after.keys() if before.get(path) != after.get(path))
+
+def affected_stages(stages, changed, skipped=()):
+    """Names of the stages reading any changed file and everything downstream, minus what only skipped stages reach."""
+    affected = set()
+    # Stages come after everything they need, so one pass carries a change all the way down
+    for stage in stages:
+        if stage.name in skipped:
+            continue
+        if stage.needs & affected or any(paths_overlap(path, input_path)
+                                         for path in changed for input_path in stage.inputs):
+            affected.add(stage.name)
+    return affected
+
+def watch(stages, selected, workers=1, interval=0.25, max_bytes=None, retrain=False):
+    """Run the selected stages, then rerun the affected ones whenever an input changes, until interrupted."""
+    skipped = set() if retrain else set(WATCH_SKIPPED)
+    watched = sorted({path for stage in stages if stage.name in selected for path in stage.inputs})
+    with shared_sheets(max_bytes):
+        run_stages(stages, selected, workers)
+        # Stages the build cache skipped never touched the warm cache, so the first edit would start cold
+        for stage in stages:
+            if stage.name in selected and stage.warm is not None:
+                stage.warm()
+        # Taken after each run, so files the stages just wrote don't count as edits
+        last = snapshot(watched)
+        print(f"\nWatching {len(last)} file(s), Ctrl-C to stop")
+        while True:
+            time.sleep(interval)
+            current = snapshot(watched)
+            if current == last:
+                continue
+            # Wait for the files to settle, so a half-written save isn't read
+            while True:
+                time.sleep(interval)
+                settled = snapshot(watched)
+                if settled == current:
+                    break
+                current = settled
+            changed = changed_files(last, current)
+            rerun = affected_stages(stages, changed, skipped) & selected
+            shown = ", ".join(changed[:3]) + (f" and {len(changed) - 3} more" if len(changed) > 3 else "")
+            print(f"\nChanged: {shown}")
+            began = time.perf_counter()
+            warm = warm_cache()
+            hits, misses = warm.hits, warm.misses
+            failed = run_stages(stages, rerun, workers)
+            print(f"Rebuilt {len(rerun) - len(failed)} of {len(rerun)} stage(s) in {time.perf_counter() - began:.2f}s; "
+                  f"warm cache {len(warm.entries)} entries, {warm.nbytes / 2**20:.1f} MiB, "
+                  f"{warm.hits - hits} hits, {warm.misses - misses} misses")
+            last = snapshot(watched)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the tile asset pipeline as one dependency graph.")
+    parser.add_argument("--only", nargs="+", metavar="STAGE", help="run just these stages (globs allowed)")
+    parser.add_argument("--from", dest="start", nargs="+", metavar="STAGE",
+                        help="run these stages and everything that depends on them")
+    parser.add_argument("--list", action="store_true", help="print the stages and their dependencies, then exit")
+    parser.add_argument("--grid-split", action="store_true",
+                        help="cut the sheets on the fixed 32px grid (split_fantasy_tileset.py) instead of the lattice")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help=f"dedupe threshold in hash bits (default {DEFAULT_THRESHOLD})")
+    parser.add_argument("--variants", type=int, default=1, help="procedural variants per missing terrain (default 1)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for procedural variants (default 0)")
+    parser.add_argument("--watch", action="store_true", help="keep running, rebuilding what a changed input affects")
+    parser.add_argument("--interval", type=float, default=0.25, help="seconds between --watch polls (default 0.25)")
+    parser.add_argument("--cache-mb", type=int, default=512,
+                        help="memory for decoded sheets and cells kept warm by --watch (default 512)")
+    parser.add_argument("--retrain-lut", action="store_true",
+                        help="let --watch rebuilds refit the terrain table too (skipped by default)")
+    add_workers_argument(parser)
+    telemetry.add_telemetry_arguments(parser)
+    args = parser.parse_args()
+    telemetry.configure_from_args(args)
+    if args.only and args.start:
+        parser.error("--only and --from can't be combined")
+
+    print("=" * 70)
+    print("TILE PIPELINE")
+    print("=" * 70)
+
+    stages = build_stages(args.grid_split, args.threshold, args.variants, args.seed)
+    try:
+        selected = select_stages(stages, args.only, args.start)
+    except ValueError as error:
+        parser.error(str(error))
+
+    if args.list:
+        for stage in stages:
+            needs = f" <- {', '.join(sorted(stage.needs))}" if stage.needs else ""
+            print(f"  {'*' if stage.name in selected else ' '} {stage.name}{needs}")
+        return
+
+    print(f"Running {len(selected)} of {len(stages)} stage(s)\n")
+    if args.watch:
+        try:
+            watch(stages, selected, resolve_workers(args.workers), args.interval, args.cache_mb << 20,
+                  args.retrain_lut)
+        except KeyboardInterrupt:
+            print("\n" + "=" * 70)
+            print("Stopped watching")
+            print("=" * 70)
+        return
+
+    began = time.perf_counter()
+    failed = run_stages(stages, selected, resolve_workers(args.workers))
+
+    print("\n" + "=" * 70)
+    if failed:
+        print(f"Pipeline failed: {', '.join(sorted(failed))}")
+        print("=" * 70)
+        sys.exit(1)
+    print(f"Pipeline done in {time.perf_counter() - began:.2f}s")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
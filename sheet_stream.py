@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Decode tileset sheets in horizontal strips instead of all at once.
+
+Non-interlaced 8-bit PNGs are inflated incrementally: each strip's filtered
+scanlines are rewrapped as a small stored PNG, prefixed with the previous
+strip's last raw row so PIL's unfiltering sees the row above, and decoded on
+their own. Peak memory then follows the strip height rather than the sheet
+area. Other images fall back to one full decode, sliced into the same strips.
+
+Whole-sheet decodes go through decode_sheet, which inside a shared_sheets()
+block decodes each sheet once and hands every later caller the same array.
+The block's WarmCache also holds other arrays derived from the sheets (the
+extractor's resampled hex cells), least recently used first out once it is
+over its byte budget; run_pipeline.py --watch keeps one block open across
+rebuilds, so an edit only decodes and resamples what it touched.
+"""
+import contextlib
+from collections import OrderedDict
+import io
+import os
+import struct
+import threading
+import zlib
+import numpy as np
+from PIL import Image
+
+import telemetry
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Bytes per pixel of each 8-bit PNG color type
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# Chunks a strip needs to decode the same way as the whole sheet
+STRIP_CHUNKS = {b"PLTE", b"tRNS", b"gAMA", b"sRGB"}
+
+READ_SIZE = 1 << 16
+
+# The WarmCache of the open shared_sheets() block, else None
+_shared = None
+_shared_lock = threading.Lock()
+_decode_locks = {}
+
+def value_nbytes(value):
+    """Bytes held by the arrays in a value, looking inside tuples, lists and dicts."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(value_nbytes(item) for item in value)
+    return 0
+
+class WarmCache:
+    """Arrays kept in memory between uses, dropping the least recently used past max_bytes."""
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (value, bytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """The value stored under key, or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries over budget; returns the value."""
+        size = value_nbytes(value)
+        with self.lock:
+            if key in self.entries:
+                self.nbytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.nbytes += size
+            # The newest entry stays even when it alone is over budget
+            while self.max_bytes is not None and self.nbytes > self.max_bytes and len(self.entries) > 1:
+                self.nbytes -= self.entries.popitem(last=False)[1][1]
+        return value
+
+def _read_chunk_header(f):
+    """Read a chunk's (type, length), or (None, 0) at end of file."""
+    header = f.read(8)
+    if len(header) < 8:
+        return None, 0
+    length, chunk_type = struct.unpack(">I4s", header)
+    return chunk_type, length
+
+def _chunk(chunk_type, data):
+    """Serialize one PNG chunk."""
+    crc = zlib.crc32(chunk_type + data) & 0xffffffff
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", crc)
+
+def read_png_header(path):
+    """Return (width, height, bit_depth, color_type, interlace) of a PNG, or None for other files."""
+    with open(path, "rb") as f:
+        if f.read(8) != PNG_SIGNATURE:
+            return None
+        chunk_type, length = _read_chunk_header(f)
+        if chunk_type != b"IHDR":
+            return None
+        width, height, bit_depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", f.read(length))
+    return width, height, bit_depth, color_type, interlace
+
+def sheet_size(path):
+    """(width, height) of a sheet without decoding it or tripping PIL's size guard."""
+    header = read_png_header(path)
+    if header is not None:
+        return header[0], header[1]
+    with Image.open(path) as img:
+        return img.size
+
+def can_stream(path):
+    """True if the sheet can be decoded strip by strip."""
+    header = read_png_header(path)
+    return header is not None and header[2] == 8 and header[3] in PNG_CHANNELS and header[4] == 0
+
+def _decode_strip(ihdr, extra_chunks, previous_row, raw_rows, width, rows):
+    """Decode `rows` filtered scanlines to RGBA, seeding the filters with the row above them."""
+    prefix = b"" if previous_row is None else b"\x00" + previous_row
+    total_rows = rows + (previous_row is not None)
+    header = struct.pack(">II", width, total_rows) + ihdr[8:]
+    png = b"".join([
+        PNG_SIGNATURE,
+        _chunk(b"IHDR", header),
+        *extra_chunks,
+        _chunk(b"IDAT", zlib.compress(prefix + raw_rows, 0)),
+        _chunk(b"IEND", b""),
+    ])
+    with telemetry.span("decode"), Image.open(io.BytesIO(png)) as img:
+        telemetry.count(pixels=width * rows)
+        # The raw bytes of the last row seed the next strip; 8-bit mode bytes are exactly those
+        last_row = img.crop((0, total_rows - 1, width, total_rows)).tobytes()
+        strip = np.asarray(img.convert("RGBA"))
+    return strip[total_rows - rows:], last_row
+
+def _iter_png_strips(path, strip_rows):
+    """Yield (top, RGBA strip) from a non-interlaced 8-bit PNG, inflating only what each strip needs."""
+    with open(path, "rb") as f:
+        f.read(8)
+        extra_chunks = []
+        ihdr = None
+        width = height = row_bytes = 0
+        inflater = zlib.decompressobj()
+        pending = bytearray()
+        previous_row = None
+        top = 0
+
+        while top < height or ihdr is None:
+            chunk_type, length = _read_chunk_header(f)
+            if chunk_type is None or chunk_type == b"IEND":
+                break
+            if chunk_type != b"IDAT":
+                data = f.read(length)
+                f.read(4)  # CRC
+                if chunk_type == b"IHDR":
+                    ihdr = data
+                    width, height = struct.unpack(">II", data[:8])
+                    row_bytes = 1 + width * PNG_CHANNELS[data[9]]
+                elif chunk_type in STRIP_CHUNKS:
+                    extra_chunks.append(_chunk(chunk_type, data))
+                continue
+
+            # IDAT payloads are read and inflated in bounded pieces, however large the chunk
+            remaining = length
+            while remaining:
+                compressed = f.read(min(READ_SIZE, remaining))
+                remaining -= len(compressed)
+                while compressed:
+                    pending += inflater.decompress(compressed, strip_rows * row_bytes)
+                    compressed = inflater.unconsumed_tail
+                    while top < height and len(pending) >= min(strip_rows, height - top) * row_bytes:
+                        rows = min(strip_rows, height - top)
+                        strip, previous_row = _decode_strip(ihdr, extra_chunks, previous_row,
+                                                            bytes(pending[:rows * row_bytes]), width, rows)
+                        del pending[:rows * row_bytes]
+                        yield top, strip
+                        top += rows
+            f.read(4)  # CRC
+
+        if top < height:
+            raise ValueError(f"{path}: image data ends at row {top} of {height}")
+
+def _decode(path):
+    """Decode a whole sheet to an (H, W, 4) uint8 RGBA array."""
+    with telemetry.span("decode", sheet=os.path.basename(path)), Image.open(path) as img:
+        telemetry.count(pixels=img.width * img.height)
+        return np.asarray(img.convert("RGBA"))
+
+def decode_sheet(path):
+    """Decode a whole sheet to RGBA, once per shared_sheets() block and file version; the array is read-only."""
+    if _shared is None:
+        return _decode(path)
+    stat = os.stat(path)
+    key = ("sheet", os.path.abspath(path))
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _shared_lock:
+        lock = _decode_locks.setdefault(key, threading.Lock())
+    # Threads asking for the same sheet wait for one decode instead of each doing their own
+    with lock:
+        cached = _shared.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        # An edited sheet replaces its old decode rather than sitting beside it
+        sheet = _decode(path)
+        sheet.flags.writeable = False
+        return _shared.put(key, (version, sheet))[1]
+
+def warm_cache():
+    """The open shared_sheets() block's WarmCache, or None outside one."""
+    return _shared
+
+@contextlib.contextmanager
+def shared_sheets(max_bytes=None):
+    """Share whole-sheet decodes and warm arrays between every stage run inside the block."""
+    global _shared
+    outer = _shared
+    if outer is None:
+        _shared = WarmCache(max_bytes)
+    try:
+        yield _shared
+    finally:
+        if outer is None:
+            _shared = None
+            _decode_locks.clear()
+
+def iter_sheet_strips(path, strip_rows):
+    """Yield (top, RGBA strip) covering the sheet top to bottom, at most strip_rows rows each."""
+    if can_stream(path):
+        yield from _iter_png_strips(path, strip_rows)
+        return
+
+    # Interlaced, 16-bit or non-PNG sheets can't be split before decoding
+    sheet = decode_sheet(path)
+    for top in range(0, sheet.shape[0], strip_rows):
+        yield top, sheet[top:top + strip_rows]
+
+def read_sheet_rows(path, rows, strip_rows=256):
+    """Decode only the top `rows` rows of a sheet."""
+    strips = []
+    for top, strip in iter_sheet_strips(path, strip_rows):
+        strips.append(strip[:rows - top])
+        if top + len(strip) >= rows:
+            break
+    return np.concatenate(strips)
+
+def iter_row_bands(path, bands, strip_rows):
+    """Yield (index, band) for sorted (top, bottom) row ranges, holding only the rows still needed."""
+    strips = iter_sheet_strips(path, strip_rows)
+    buffer = np.zeros((0, 0, 4), dtype=np.uint8)
+    buffer_top = 0
+    for index, (top, bottom) in enumerate(bands):
+        # Rows above this band are done with
+        drop = min(max(0, top - buffer_top), len(buffer))
+        buffer, buffer_top = buffer[drop:], buffer_top + drop
+
+        # Decode strips until the band is covered, skipping any that end above it
+        while buffer_top + len(buffer) < bottom:
+            strip_top, strip = next(strips, (None, None))
+            if strip is None:
+                break
+            if len(buffer) == 0:
+                start = min(max(0, top - strip_top), len(strip))
+                buffer, buffer_top = strip[start:], strip_top + start
+            else:
+                buffer = np.concatenate([buffer, strip])
+        yield index, buffer[top - buffer_top:bottom - buffer_top]
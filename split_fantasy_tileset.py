@@ -2,9 +2,19 @@
 """
 Script to split fantasy hex tileset images into individual tile files.
 """
+import argparse
 import os
+import numpy as np
 from PIL import Image
 
+from build_cache import BuildCache, code_version, encode_png, hash_bytes, hash_file
+from lod_pyramid import LOD_SIZES, build_pyramid, pyramid_up_to_date, write_pyramid
+from parallel import add_workers_argument, parallel_map, resolve_workers, run_jobs
+from sheet_stream import decode_sheet
+import telemetry
+
+CODE_VERSION = code_version(__file__)
+
 # Tile dimensions (determined from the 256x288 source image)
 TILE_SIZE = 32  # Each tile is 32x32 pixels
 TILES_PER_ROW = 8
@@ -83,82 +93,125 @@ def create_output_dirs():
     print(f"  - {OUTPUT_DIR_BORDERED}")
     print(f"  - {OUTPUT_DIR_BORDERLESS}")
 
-def split_tileset(input_path, output_dir, tileset_name):
+def split_tileset(input_path, output_dir, tileset_name, workers=1):
     """Split a tileset image into individual tiles."""
     print(f"\nProcessing {tileset_name}...")
 
-    # Load the image
-    img = Image.open(input_path)
+    # Nothing to do if neither the sheet, the mapping nor this script changed
+    cache = BuildCache(output_dir, "split_fantasy_tileset")
+    inputs_key = hash_bytes(CODE_VERSION, hash_file(input_path), TILE_SIZE, sorted(TILE_MAPPING.items()), LOD_SIZES)
+    if pyramid_up_to_date(output_dir, "split_fantasy_tileset", inputs_key) and cache.inputs_unchanged(inputs_key):
+        cache.finish(inputs_key)
+        print(f"  Up to date: {len(cache.outputs)} tiles unchanged")
+        return len(cache.outputs)
+
+    # Load the image, shared with any other stage decoding the same sheet
+    img = Image.fromarray(decode_sheet(input_path))
     img_width, img_height = img.size
 
     print(f"  Image size: {img_width}x{img_height}")
 
     tiles_extracted = 0
     terrain_counters = {}  # Track how many of each terrain type we've saved
+    tiles = []
 
     # Extract tiles (9 rows total based on 288px height / 32px tiles)
     max_rows = img_height // TILE_SIZE
-    for row in range(max_rows):
-        for col in range(TILES_PER_ROW):
-            # Calculate position
-            x = col * TILE_SIZE
-            y = row * TILE_SIZE
-
-            # Skip if position is out of bounds
-            if y + TILE_SIZE > img_height or x + TILE_SIZE > img_width:
-                continue
-
-            # Skip if no mapping exists for this tile
-            if (row, col) not in TILE_MAPPING:
-                continue
-
-            # Extract tile
-            tile_box = (x, y, x + TILE_SIZE, y + TILE_SIZE)
-            tile = img.crop(tile_box)
-
-            # Get base terrain name from mapping
-            base_name = TILE_MAPPING.get((row, col))
-
-            # Track variants of the same terrain type
-            if base_name in terrain_counters:
-                terrain_counters[base_name] += 1
-                tile_name = f"{base_name}_{terrain_counters[base_name]}"
-            else:
-                terrain_counters[base_name] = 0
-                tile_name = base_name
-
-            # Save tile
-            output_path = os.path.join(output_dir, f"{tile_name}.png")
-            tile.save(output_path)
+    with telemetry.span("crop"):
+        for row in range(max_rows):
+            for col in range(TILES_PER_ROW):
+                # Calculate position
+                x = col * TILE_SIZE
+                y = row * TILE_SIZE
+
+                # Skip if position is out of bounds
+                if y + TILE_SIZE > img_height or x + TILE_SIZE > img_width:
+                    continue
+
+                # Skip if no mapping exists for this tile
+                if (row, col) not in TILE_MAPPING:
+                    continue
+
+                # Extract tile
+                tile_box = (x, y, x + TILE_SIZE, y + TILE_SIZE)
+                tile = img.crop(tile_box)
+
+                # Get base terrain name from mapping
+                base_name = TILE_MAPPING.get((row, col))
+
+                # Track variants of the same terrain type
+                if base_name in terrain_counters:
+                    terrain_counters[base_name] += 1
+                    tile_name = f"{base_name}_{terrain_counters[base_name]}"
+                else:
+                    terrain_counters[base_name] = 0
+                    tile_name = base_name
+
+                # Key the tile on its own pixels and mapping entry
+                key = hash_bytes(CODE_VERSION, tile.mode, tile.size, tile.tobytes(), (row, col), tile_name)
+                tiles.append((tile_name, row, col, key, tile, cache.keep(f"{tile_name}.png", key)))
+        telemetry.count(pixels=len(tiles) * TILE_SIZE * TILE_SIZE)
+
+    # Encode the stale tiles across the workers, then save them in grid order
+    stale = [tile for tile_name, row, col, key, tile, fresh in tiles if not fresh]
+    with telemetry.span("encode"):
+        telemetry.count(pixels=len(stale) * TILE_SIZE * TILE_SIZE)
+        encoded = iter(parallel_map(encode_png, stale, workers))
+    with telemetry.span("write"):
+        for tile_name, row, col, key, tile, fresh in tiles:
+            written = not fresh and cache.store(f"{tile_name}.png", key, next(encoded))
+            cache.describe(f"{tile_name}.png", source={"sheet": input_path, "row": row, "col": col})
             tiles_extracted += 1
-            print(f"    Saved: {tile_name}.png (row {row}, col {col})")
-
-    print(f"  Extracted {tiles_extracted} tiles to {output_dir}")
+            if written:
+                telemetry.detail(f"    Saved: {tile_name}.png (row {row}, col {col})")
+            else:
+                telemetry.detail(f"    Unchanged: {tile_name}.png (row {row}, col {col})")
+
+    cache.finish(inputs_key)
+
+    # LOD levels come from the one decoded sheet; 64px is upsampled, smaller levels halve the 32px tile
+    if tiles:
+        with telemetry.span("resample"):
+            pyramid = build_pyramid(np.stack([np.asarray(tile.convert('RGBA')) for *_, tile, fresh in tiles]))
+        lod_written = write_pyramid(output_dir, "split_fantasy_tileset",
+                                    [f"{tile_name}.png" for tile_name, *_ in tiles],
+                                    [key for tile_name, row, col, key, tile, fresh in tiles],
+                                    pyramid, inputs_key, workers)
+        print(f"  LOD pyramid: {', '.join(f'{size}px' for size in pyramid)} ({lod_written} files written)")
+    print(f"  Extracted {tiles_extracted} tiles to {output_dir} ({cache.written} written, {cache.skipped} unchanged)")
     print(f"  Terrain types covered: {sorted(set(TILE_MAPPING.values()))}")
     return tiles_extracted
 
 def main():
     """Main function to split both tilesets."""
+    parser = argparse.ArgumentParser(description="Split the fantasy hex tilesets into individual tiles.")
+    add_workers_argument(parser)
+    telemetry.add_telemetry_arguments(parser)
+    args = parser.parse_args()
+    telemetry.configure_from_args(args)
+
     print("Fantasy Hex Tileset Splitter")
     print("=" * 50)
 
     # Create output directories
     create_output_dirs()
 
-    # Split bordered tileset
+    jobs = []
     bordered_input = "godot_project/assets/fantasyhextiles_v3.png"
     if os.path.exists(bordered_input):
-        split_tileset(bordered_input, OUTPUT_DIR_BORDERED, "Bordered Tileset")
+        jobs.append((bordered_input, OUTPUT_DIR_BORDERED, "Bordered Tileset"))
     else:
         print(f"Warning: {bordered_input} not found!")
 
-    # Split borderless tileset
     borderless_input = "godot_project/assets/fantasyhextiles_v3_borderless.png"
     if os.path.exists(borderless_input):
-        split_tileset(borderless_input, OUTPUT_DIR_BORDERLESS, "Borderless Tileset")
+        jobs.append((borderless_input, OUTPUT_DIR_BORDERLESS, "Borderless Tileset"))
     else:
         print(f"Warning: {borderless_input} not found!")
 
+    # Split both tilesets side by side
+    run_jobs(split_tileset, jobs, resolve_workers(args.workers))
+
     print("\n" + "=" * 50)
     print("Tileset splitting complete!")
     print("\nNext steps:")
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing and throughput records for the tile pipeline scripts.
+
+Code under measurement runs inside span("name"), and adds what it processed
+with count(pixels=..., bytes_written=...). Each span records wall time, CPU
+time (its thread's, plus worker processes that exited during it), the counts,
+and peak memory: the process's max RSS (None where the resource module is
+missing, as on Windows), and with --trace-memory the peak of Python and numpy
+allocations inside the span. Worker CPU and the allocation peak are process
+wide, so they only hold for spans that ran alone: a span that overlapped one
+on another thread (run_pipeline's parallel stages) is marked concurrent, its
+CPU is its own thread's, and its peak_alloc_bytes is None. Bytes and files written
+roll up into the spans around them; pixels stay with the step that counted
+them, so each step's throughput is its own. Spans from run_jobs() worker
+processes are sent back to the parent with their logs. At exit the spans are written as JSON lines and/or
+a Chrome trace (chrome://tracing, Perfetto), and --profile prints a summary.
+
+detail() is for per-tile progress lines; --quiet drops them, which also saves
+their cost on large packs.
+"""
+import atexit
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows has no getrusage
+    resource = None
+
+# Set by configure(); the defaults record spans but write nothing
+_settings = {"quiet": False, "jsonl": None, "trace": None, "summary": False}
+_records = []
+_records_lock = threading.Lock()
+_local = threading.local()
+_open_spans = {}  # Spans open on any thread by id, to spot the ones that overlap
+_origin = time.perf_counter()  # The monotonic clock is system-wide, so worker processes' spans line up
+
+# Counters that add up across nested spans; others (pixels) stay with the span that counted them
+ROLLUP_COUNTERS = ("bytes_written", "files_written")
+
+def add_telemetry_arguments(parser):
+    """Add the standard --quiet and profiling options to a script's argument parser."""
+    parser.add_argument("--quiet", action="store_true", help="drop per-tile progress lines")
+    parser.add_argument("--profile", action="store_true", help="print a per-stage time and throughput summary")
+    parser.add_argument("--profile-jsonl", metavar="PATH", help="write one JSON record per stage span to PATH")
+    parser.add_argument("--profile-trace", metavar="PATH", help="write a Chrome trace of the stage spans to PATH")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="track each span's peak Python/numpy allocations (slower)")
+
+def configure(quiet=False, jsonl=None, trace=None, summary=False, trace_memory=False):
+    """Set up output and memory tracking; reports are written when the process exits."""
+    _settings.update(quiet=quiet, jsonl=jsonl, trace=trace, summary=summary)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if jsonl or trace or summary:
+        atexit.register(finish)
+
+def configure_from_args(args):
+    """configure() from options added by add_telemetry_arguments."""
+    configure(args.quiet, args.profile_jsonl, args.profile_trace, args.profile, args.trace_memory)
+
+def settings():
+    """The current settings, for handing to worker processes."""
+    return {"quiet": _settings["quiet"], "trace_memory": tracemalloc.is_tracing()}
+
+def apply_settings(worker_settings):
+    """Adopt the parent's settings in a worker process; it reports its spans back rather than writing them."""
+    _settings["quiet"] = worker_settings["quiet"]
+    # A forked worker starts with copies of the parent's spans, which aren't its to report
+    _local.stack = []
+    with _records_lock:
+        _records.clear()
+        _open_spans.clear()
+    if worker_settings["trace_memory"] and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def quiet():
+    """True if per-tile progress lines are being dropped."""
+    return _settings["quiet"]
+
+def detail(text):
+    """Print a per-tile progress line unless running quiet."""
+    if not _settings["quiet"]:
+        print(text)
+
+def _stack():
+    """This thread's open spans, innermost last."""
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+def count(**counters):
+    """Add to the counters of this thread's innermost open span; a no-op outside any span."""
+    stack = _stack()
+    if stack:
+        totals = stack[-1]["counters"]
+        for name, value in counters.items():
+            totals[name] = totals.get(name, 0) + value
+
+def _max_rss_bytes():
+    """The process's peak resident set size so far, or None where getrusage isn't available."""
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+def _children_cpu():
+    """CPU seconds of reaped child processes."""
+    times = os.times()
+    return times.children_user + times.children_system
+
+def _take_peak():
+    """tracemalloc's peak since the last call, restarting the measurement from current usage."""
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    return peak
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """Record the time, counts and memory of a block as one named span."""
+    stack = _stack()
+    record = {"name": name, "attributes": attributes, "counters": {}, "depth": len(stack),
+              "parent": stack[-1]["name"] if stack else None, "pid": os.getpid(),
+              "thread": threading.current_thread().name}
+    with _records_lock:
+        # Overlapping spans on different threads would each count the other's worker CPU and allocations
+        others = [other for other in _open_spans.values() if other["thread"] != record["thread"]]
+        for overlapped in others + ([record] if others else []):
+            overlapped["concurrent"] = True
+        _open_spans[id(record)] = record
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # tracemalloc has one peak; each span restarts it and hands what it saw to the span around it
+        peak = _take_peak()
+        if stack:
+            stack[-1]["peak_seen"] = max(stack[-1].get("peak_seen", 0), peak)
+        base = tracemalloc.get_traced_memory()[0]
+    stack.append(record)
+    began, cpu, children = time.perf_counter(), time.thread_time(), _children_cpu()
+    try:
+        yield record
+    finally:
+        record["clock_s"] = began
+        record["wall_s"] = time.perf_counter() - began
+        with _records_lock:
+            del _open_spans[id(record)]
+        concurrent = record.setdefault("concurrent", False)
+        record["cpu_s"] = time.thread_time() - cpu + (0 if concurrent else _children_cpu() - children)
+        record["max_rss_bytes"] = _max_rss_bytes()
+        stack.pop()
+        if tracing:
+            peak = max(_take_peak(), record.pop("peak_seen", 0))
+            record["peak_alloc_bytes"] = None if concurrent else peak - base
+            if stack:
+                stack[-1]["peak_seen"] = max(stack[-1].get("peak_seen", 0), peak)
+        if stack:
+            count(**{name: value for name, value in record["counters"].items() if name in ROLLUP_COUNTERS})
+        with _records_lock:
+            _records.append(record)
+
+def traced(name):
+    """Decorator running each call of a function inside span(name)."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def records():
+    """Every span finished so far, in the order they finished."""
+    with _records_lock:
+        return list(_records)
+
+def take_records():
+    """Remove and return the spans finished so far; workers send these back to the parent."""
+    with _records_lock:
+        taken = list(_records)
+        _records.clear()
+    return taken
+
+def merge_records(worker_records):
+    """Add spans recorded in a worker process, rolling their written bytes into the open span."""
+    with _records_lock:
+        _records.extend(worker_records)
+    for record in worker_records:
+        if record["depth"] == 0:
+            count(**{name: value for name, value in record["counters"].items() if name in ROLLUP_COUNTERS})
+
+def _as_json(record):
+    """Flatten a span record into one JSON-friendly dict."""
+    flat = {key: value for key, value in record.items() if key not in ("attributes", "counters", "clock_s")}
+    flat["start_s"] = record["clock_s"] - _origin
+    flat.update(record["attributes"])
+    flat.update(record["counters"])
+    if record["wall_s"] > 0 and "pixels" in record["counters"]:
+        flat["megapixels_per_s"] = record["counters"]["pixels"] / 1e6 / record["wall_s"]
+    return flat
+
+def write_jsonl(path, spans):
+    """Write one JSON object per span, with the run's command line first."""
+    with open(path, "w") as f:
+        f.write(json.dumps({"event": "run", "argv": sys.argv, "time": time.time(), "pid": os.getpid()}) + "\n")
+        for record in spans:
+            f.write(json.dumps(dict(_as_json(record), event="span"), sort_keys=True) + "\n")
+
+def write_chrome_trace(path, spans):
+    """Write spans as complete ("X") events of the Chrome trace event format."""
+    tracks = list(dict.fromkeys((record["pid"], record["thread"]) for record in spans))
+    tids = {track: index for index, track in enumerate(tracks)}
+    # Metadata events name each thread's track
+    events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tids[(pid, thread)], "args": {"name": thread}}
+              for pid, thread in tracks]
+    for record in spans:
+        flat = _as_json(record)
+        args = {key: value for key, value in flat.items()
+                if key not in ("name", "start_s", "wall_s", "pid", "thread", "depth", "parent")}
+        events.append({"name": record["name"], "cat": "pipeline", "ph": "X", "pid": record["pid"],
+                       "tid": tids[(record["pid"], record["thread"])], "ts": flat["start_s"] * 1e6,
+                       "dur": record["wall_s"] * 1e6, "args": args})
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+def print_summary(spans):
+    """Print wall, CPU, pixels and bytes per span name."""
+    totals = {}
+    for record in spans:
+        entry = totals.setdefault(record["name"], {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "pixels": 0,
+                                                   "bytes_written": 0, "peak": 0})
+        entry["calls"] += 1
+        entry["wall_s"] += record["wall_s"]
+        entry["cpu_s"] += record["cpu_s"]
+        entry["pixels"] += record["counters"].get("pixels", 0)
+        entry["bytes_written"] += record["counters"].get("bytes_written", 0)
+        entry["peak"] = max(entry["peak"], record.get("peak_alloc_bytes", record["max_rss_bytes"]) or 0)
+
+    print("\n" + "=" * 70)
+    print("PROFILE")
+    print("=" * 70)
+    print(f"  {'span':34s} {'calls':>5s} {'wall s':>8s} {'cpu s':>8s} {'Mpix/s':>8s} {'KiB out':>9s} {'peak MiB':>9s}")
+    for name, entry in sorted(totals.items(), key=lambda item: -item[1]["wall_s"]):
+        rate = entry["pixels"] / 1e6 / entry["wall_s"] if entry["pixels"] and entry["wall_s"] > 0 else 0
+        print(f"  {name[:34]:34s} {entry['calls']:5d} {entry['wall_s']:8.3f} {entry['cpu_s']:8.3f} {rate:8.2f} "
+              f"{entry['bytes_written'] / 1024:9.1f} {entry['peak'] / 2 ** 20:9.1f}")
+
+def finish():
+    """Write the configured reports; runs once at exit."""
+    spans = records()
+    if _settings["jsonl"]:
+        write_jsonl(_settings["jsonl"], spans)
+    if _settings["trace"]:
+        write_chrome_trace(_settings["trace"], spans)
+    if _settings["summary"] and spans:
+        print_summary(spans)
+    _settings.update(jsonl=None, trace=None, summary=False)
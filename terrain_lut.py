@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Terrain classification by a quantized 3D color lookup table.
+
+The table maps every color, quantized to LUT_BITS bits per channel, to the
+terrain whose labeled hexes most often show it. A hex is classified by a vote:
+each opaque pixel inside the hex outline looks its color up and the terrain
+with the most pixels wins, so a village or a tree on a hills cell doesn't
+decide its terrain the way a single center pixel does. The vote is one table
+lookup and one bincount over all hexes at once.
+
+train_terrain_lut.py fits the table from the hand-labeled cells; this module
+only holds the table itself, so the extractors can use it without the training
+code.
+"""
+import io
+import os
+import numpy as np
+
+from terrain_types import TERRAIN_NAMES
+
+LUT_BITS = 5  # Bits kept per channel; 5 gives a 32x32x32 table
+LUT_PATH = "godot_project/assets/terrain_lut.npz"
+NO_TERRAIN = 255  # Table entry for colors no labeled hex showed (only in unfilled tables)
+MIN_ALPHA = 128  # Pixels at least this opaque vote
+
+def quantize(rgb, bits=LUT_BITS):
+    """Flat LUT index of each color of an (..., 3) uint8 array."""
+    shift = 8 - bits
+    rgb = rgb.astype(np.int32) >> shift
+    return (rgb[..., 0] << (2 * bits)) | (rgb[..., 1] << bits) | rgb[..., 2]
+
+def hex_mask(size):
+    """(size, size) bool mask of the flat-top hexagon filling a square crop (Godot's vertical offset axis)."""
+    u = np.abs((np.arange(size) + 0.5) / size * 2 - 1)
+    return u[None, :] + u[:, None] / 2 <= 1
+
+def vote_weights(stack):
+    """(N, S, S) weight of each pixel's vote: opaque pixels inside the hex outline."""
+    return (stack[..., 3] >= MIN_ALPHA) & hex_mask(stack.shape[1])
+
+def class_histograms(stack, labels, classes, bits=LUT_BITS):
+    """(classes, 2**(3*bits)) count of voting pixels per class and quantized color."""
+    bins = quantize(stack[..., :3], bits)
+    weights = vote_weights(stack)
+    index = np.asarray(labels, dtype=np.int64)[:, None, None] * (1 << (3 * bits)) + bins
+    return np.bincount(index[weights], minlength=classes << (3 * bits)).reshape(classes, -1).astype(np.float64)
+
+def smooth_cube(counts, bits, radius):
+    """Box-filter each class's histogram over the color cube, so nearby colors share evidence."""
+    side = 1 << bits
+    cube = counts.reshape(len(counts), side, side, side)
+    for axis in (1, 2, 3):
+        total = np.zeros_like(cube)
+        for offset in range(-radius, radius + 1):
+            # Shifted copies, zero beyond the cube's edges
+            shifted = np.roll(cube, offset, axis=axis)
+            edge = [slice(None)] * 4
+            edge[axis] = slice(0, offset) if offset > 0 else slice(side + offset, side)
+            if offset:
+                shifted[tuple(edge)] = 0
+            total += shifted
+        cube = total
+    return cube.reshape(len(counts), -1)
+
+def fill_nearest(lut, bits):
+    """Give every NO_TERRAIN entry the terrain of a nearest labeled color, growing the labeled cells outward."""
+    side = 1 << bits
+    cube = lut.reshape(side, side, side).copy()
+    if (cube == NO_TERRAIN).all():
+        return lut
+    while (cube == NO_TERRAIN).any():
+        grown = cube.copy()
+        for axis in range(3):
+            for step in (1, -1):
+                # A neighbor one cell along the axis, with nothing wrapping around the cube's edge
+                neighbor = np.roll(cube, step, axis=axis)
+                edge = [slice(None)] * 3
+                edge[axis] = 0 if step == 1 else side - 1
+                neighbor[tuple(edge)] = NO_TERRAIN
+                take = (grown == NO_TERRAIN) & (neighbor != NO_TERRAIN)
+                grown[take] = neighbor[take]
+        cube = grown
+    return cube.ravel()
+
+def fit_lut(counts, bits=LUT_BITS, radius=1, fill=True):
+    """Compile per-class color histograms into a table of terrain ids, one uint8 per quantized color."""
+    # Each class's histogram sums to one, so terrains with many labeled cells don't swallow the rest
+    totals = counts.sum(axis=1, keepdims=True)
+    density = smooth_cube(np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0), bits, radius)
+    lut = np.where(density.max(axis=0) > 0, np.argmax(density, axis=0), NO_TERRAIN).astype(np.uint8)
+    return fill_nearest(lut, bits) if fill else lut
+
+def vote_counts(stack, lut, bits=LUT_BITS):
+    """(N, 256) votes per terrain id of each hex of an (N, S, S, 4) stack."""
+    labels = lut[quantize(stack[..., :3], bits)].astype(np.int64)
+    hexes = np.broadcast_to(np.arange(len(stack))[:, None, None], labels.shape)
+    weights = vote_weights(stack)
+    return np.bincount((hexes * 256 + labels)[weights], minlength=len(stack) * 256).reshape(len(stack), 256)
+
+def classify_hexes(stack, lut, bits=LUT_BITS):
+    """Terrain name of each hex of an (N, S, S, 4) stack by majority vote, or None for hexes with no votes."""
+    votes = vote_counts(stack, lut, bits)
+    votes[:, NO_TERRAIN] = 0
+    winners = np.argmax(votes, axis=1)
+    return [TERRAIN_NAMES.get(int(winner)) if votes[i, winner] > 0 else None for i, winner in enumerate(winners)]
+
+def encode_lut(lut, bits=LUT_BITS):
+    """The table as .npz bytes, with its bit depth and terrain names."""
+    buffer = io.BytesIO()
+    names = np.array([TERRAIN_NAMES.get(i, "") for i in range(max(TERRAIN_NAMES) + 1)])
+    np.savez_compressed(buffer, lut=lut, bits=np.int32(bits), names=names)
+    return buffer.getvalue()
+
+def load_lut(path=LUT_PATH):
+    """(table, bits) from a file written by train_terrain_lut.py, or None if there is none."""
+    if not path or not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        names = [str(name) for name in data["names"]]
+        if any(name and TERRAIN_NAMES.get(i) != name for i, name in enumerate(names)):
+            raise ValueError(f"{path} was trained with different terrain ids; run train_terrain_lut.py again")
+        return data["lut"], int(data["bits"])
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Terrain and tileset definitions shared by the asset pipeline scripts.
+
+These mirror the constants in godot_project/scripts/world_map.gd and must be
+kept in sync with it.
+"""
+
+# Names corresponding to terrain_id for file naming (TERRAIN_NAMES in world_map.gd)
+TERRAIN_NAMES = {
+    0: "water", 1: "sand", 2: "grass", 3: "forest", 4: "hills",
+    5: "stone", 6: "mountains", 7: "deep_sea", 8: "chasm", 9: "lava",
+    10: "snow_peak", 11: "ice_water", 12: "cold_water", 13: "jungle",
+    14: "dry_grassland", 15: "rocky_peak"
+}
+
+# Rivers are allowed on these terrain_ids (ALLOWS_RIVERS in world_map.gd)
+ALLOWS_RIVERS = [2, 3, 4, 5, 6, 10, 13, 14, 15]
+
+# Tile art directory per TilesetStyle in world_map.gd
+TILE_ART_DIR = "godot_project/assets/tile_art"
+TILESET_STYLES = {
+    "original": TILE_ART_DIR,
+    "fantasy_bordered": f"{TILE_ART_DIR}/fantasy_bordered",
+    "fantasy_borderless": f"{TILE_ART_DIR}/fantasy_borderless",
+}
+
+# Size of one terrain tile in the TileSet
+TILE_SIZE = 16
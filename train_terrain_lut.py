@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Fit the terrain color lookup table from the hand-labeled tileset cells.
+
+TILE_MAPPING in split_fantasy_tileset.py labels the cells of the fantasy
+sheets by (row, col). Those are read here as hex lattice cells (the lattice
+from analyze_hex_tileset.py), so every labeled hex is cropped and resampled
+exactly as extract_fantasy_hex_tiles.py does, and its voting pixels feed one
+color histogram per terrain. The histograms are normalized, smoothed over the
+color cube and compiled into terrain_lut.npz, with colors no cell showed given
+the terrain of the nearest color that was labeled.
+
+A confusion report is written beside the table. It scores the table on the
+labeled hexes, scores a table fit on each sheet alone against the other sheet
+(the fairer estimate for a new pack), and scores the center pixel color rules
+for comparison.
+"""
+import argparse
+import json
+import os
+import numpy as np
+
+import terrain_lut
+from analyze_hex_tileset import load_lattice
+from build_cache import BuildCache, code_version, hash_bytes, hash_file
+from extract_fantasy_hex_tiles import (DEFAULT_LATTICE, classify_terrain_batch, find_occupied_cells, hex_crop_size,
+                                       load_sheet, resample_cells)
+from lod_pyramid import LOD_SIZES
+from split_fantasy_tileset import TILE_MAPPING
+from terrain_lut import LUT_BITS, LUT_PATH, class_histograms, classify_hexes, encode_lut, fit_lut
+from terrain_types import TERRAIN_NAMES
+
+CODE_VERSION = hash_bytes(code_version(terrain_lut.__file__), code_version(__file__))[:16]
+
+TRAINING_SHEETS = [
+    "godot_project/assets/fantasyhextiles_v3.png",
+    "godot_project/assets/fantasyhextiles_v3_borderless.png",
+]
+SAMPLE_SIZE = max(LOD_SIZES)  # Hexes are classified at the extractor's top LOD level
+DEFAULT_RADIUS = 1  # Box smoothing radius over the color cube, in table cells
+
+def report_path(lut_path):
+    """The confusion report written beside a lookup table."""
+    return os.path.splitext(lut_path)[0] + "_report.json"
+
+def labeled_hexes(sheet_path):
+    """(stack, terrain ids, center pixels) of the labeled hexes of one sheet."""
+    lattice = load_lattice(sheet_path) or DEFAULT_LATTICE
+    hex_width, hex_height = hex_crop_size(lattice)
+    sheet = load_sheet(sheet_path)
+    rows, cols, xs, ys = find_occupied_cells(sheet, lattice, hex_width, hex_height)
+    ids = {name: terrain_id for terrain_id, name in TERRAIN_NAMES.items()}
+    cells = [i for i, cell in enumerate(zip(rows.tolist(), cols.tolist())) if cell in TILE_MAPPING]
+    labels = np.array([ids[TILE_MAPPING[(int(rows[i]), int(cols[i]))]] for i in cells], dtype=np.int64)
+    # The extractor's top LOD level, shared with it through the warm cache inside a shared_sheets() block
+    stack = resample_cells(sheet, xs[cells], ys[cells], hex_width, hex_height)[SAMPLE_SIZE]
+    return stack, labels, sheet[ys[cells], xs[cells]]
+
+def confusion(truth, predicted):
+    """Confusion counts {true name: {predicted name: hexes}} and the share of hexes right."""
+    matrix = {}
+    for true, guess in zip(truth, predicted):
+        row = matrix.setdefault(true, {})
+        row[str(guess)] = row.get(str(guess), 0) + 1
+    correct = sum(true == guess for true, guess in zip(truth, predicted))
+    return {"accuracy": correct / max(1, len(truth)), "hexes": len(truth), "matrix": matrix}
+
+def train(sheets, bits=LUT_BITS, radius=DEFAULT_RADIUS):
+    """Fit the table from every sheet's labeled hexes; returns (table, report)."""
+    classes = max(TERRAIN_NAMES) + 1
+    samples = {path: labeled_hexes(path) for path in sheets}
+    counts = {path: class_histograms(stack, labels, classes, bits) for path, (stack, labels, _) in samples.items()}
+    lut = fit_lut(sum(counts.values()), bits, radius)
+
+    truth = [TERRAIN_NAMES[int(label)] for _, labels, _ in samples.values() for label in labels]
+    report = {
+        "bits": bits,
+        "radius": radius,
+        "sheets": sheets,
+        "training": confusion(truth, [name for stack, _, _ in samples.values()
+                                      for name in classify_hexes(stack, lut, bits)]),
+        "color_rules": confusion(truth, [name for _, _, centers in samples.values()
+                                         for name in classify_terrain_batch(centers)]),
+        "cross_sheet": {},
+    }
+    # Fit on one sheet, score on each other: how the table does on art it hasn't seen
+    for held_out in sheets if len(sheets) > 1 else []:
+        others = fit_lut(sum(counts[path] for path in sheets if path != held_out), bits, radius)
+        stack, labels, _ = samples[held_out]
+        report["cross_sheet"][os.path.basename(held_out)] = confusion(
+            [TERRAIN_NAMES[int(label)] for label in labels], classify_hexes(stack, others, bits))
+    return lut, report
+
+def print_report(report):
+    """Print the accuracies and the terrains the table confuses."""
+    print(f"  Training hexes: {report['training']['accuracy']:.0%} of {report['training']['hexes']} "
+          f"(center pixel rules: {report['color_rules']['accuracy']:.0%})")
+    for sheet, scores in report["cross_sheet"].items():
+        print(f"  Held-out {sheet}: {scores['accuracy']:.0%} of {scores['hexes']}")
+    for true, row in sorted(report["training"]["matrix"].items()):
+        wrong = {guess: count for guess, count in row.items() if guess != true}
+        if wrong:
+            print(f"    {true:14s} -> {', '.join(f'{guess} x{count}' for guess, count in sorted(wrong.items()))}")
+
+def train_terrain_lut(sheets=TRAINING_SHEETS, lut_path=LUT_PATH, bits=LUT_BITS, radius=DEFAULT_RADIUS):
+    """Fit and write the lookup table and its report, unless nothing they depend on changed."""
+    sheets = [path for path in sheets if os.path.exists(path)]
+    if not sheets:
+        print("No training sheets found")
+        return None
+
+    cache = BuildCache(os.path.dirname(lut_path), "train_terrain_lut")
+    inputs_key = hash_bytes(CODE_VERSION, bits, radius, SAMPLE_SIZE, sorted(TILE_MAPPING.items()),
+                            [(hash_file(path), load_lattice(path)) for path in sheets])
+    if cache.inputs_unchanged(inputs_key):
+        cache.finish(inputs_key)
+        print(f"Up to date: {lut_path}")
+        return None
+
+    lut, report = train(sheets, bits, radius)
+    cache.write(os.path.basename(lut_path), inputs_key, encode_lut(lut, bits))
+    cache.write(os.path.basename(report_path(lut_path)), inputs_key,
+                (json.dumps(report, indent=2, sort_keys=True) + "\n").encode())
+    cache.finish(inputs_key)
+    side = 1 << bits
+    print(f"{lut_path}: {side}x{side}x{side} table, {len(np.unique(lut))} terrains")
+    print_report(report)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the terrain color lookup table from the labeled tileset cells.")
+    parser.add_argument("--bits", type=int, default=LUT_BITS, choices=range(3, 8),
+                        help=f"bits per channel of the table (default {LUT_BITS})")
+    parser.add_argument("--radius", type=int, default=DEFAULT_RADIUS,
+                        help=f"color smoothing radius in table cells (default {DEFAULT_RADIUS})")
+    parser.add_argument("--output", default=LUT_PATH, help=f"table path (default {LUT_PATH})")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("TERRAIN LOOKUP TABLE TRAINER")
+    print("=" * 70)
+
+    train_terrain_lut(TRAINING_SHEETS, args.output, args.bits, args.radius)
+
+    print("\n" + "=" * 70)
+    print(f"Confusion report: {report_path(args.output)}")
+    print("=" * 70)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Compact binary format for pre-baked worlds and the tables derived from them.
+
+Layout (all integers little-endian):
+    8 bytes   magic, b"STRATWLD" for worlds
+    u32       format version
+    u32       header length in bytes
+    header    UTF-8 JSON: dimensions, seed, lookup tables, and for each array
+              its dtype, shape, uncompressed size and offset
+    padding   zeros up to a 16-byte boundary, where the data section starts
+    arrays    zlib streams, each starting on a 16-byte boundary; offsets in
+              the header are relative to the start of the data section
+
+zlib streams are what Godot's PackedByteArray.decompress() reads with
+FileAccess.COMPRESSION_DEFLATE, given the uncompressed size from the header.
+"""
+import json
+import struct
+import zlib
+import numpy as np
+
+from terrain_types import TERRAIN_NAMES
+from world_generator import LANDMARK_TYPES, RESOURCE_TYPES, TERRAIN_MOVEMENT_COSTS
+
+WORLD_MAGIC = b"STRATWLD"
+WORLD_FORMAT_VERSION = 1
+WORLD_EXTENSION = ".world"
+ALIGNMENT = 16
+
+# Stored arrays and their on-disk types; resource amounts are (resource, y, x) with 0 for none
+WORLD_ARRAYS = {
+    "terrain": "<u1",
+    "river": "<u1",
+    "civ": "<i1",
+    "landmark": "<i1",
+    "elevation": "<f4",
+    "movement_cost": "<f4",
+    "resources": "<u2",
+}
+
+def _pad(length):
+    """Zero bytes that take length up to the next ALIGNMENT boundary."""
+    return b"\0" * (-length % ALIGNMENT)
+
+def pack_arrays(magic, version, header, arrays):
+    """Lay out a header dict and named arrays as magic, version, JSON header and aligned zlib streams."""
+    entries = {}
+    blobs = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        blob = zlib.compress(array.tobytes(), 9)
+        entries[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset,
+                         "nbytes": array.nbytes, "compressed_nbytes": len(blob)}
+        blobs.append(blob + _pad(len(blob)))
+        offset += len(blobs[-1])
+
+    header = dict(header, arrays=entries)
+    header_bytes = json.dumps(header, sort_keys=True, separators=(",", ":")).encode()
+    preamble = magic + struct.pack("<II", version, len(header_bytes)) + header_bytes
+    return b"".join([preamble, _pad(len(preamble))] + blobs)
+
+def unpack_arrays(data, magic, version):
+    """Parse pack_arrays output into (header dict, {name: numpy array})."""
+    if data[:len(magic)] != magic:
+        raise ValueError(f"not a {magic.decode()} file")
+    file_version, header_length = struct.unpack_from("<II", data, len(magic))
+    if file_version != version:
+        raise ValueError(f"unsupported {magic.decode()} version {file_version}")
+    start = len(magic) + 8
+    header = json.loads(data[start:start + header_length])
+    data_start = start + header_length
+    data_start += -data_start % ALIGNMENT
+
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        begin = data_start + entry["offset"]
+        raw = zlib.decompress(data[begin:begin + entry["compressed_nbytes"]])
+        arrays[name] = np.frombuffer(raw, dtype=entry["dtype"]).reshape(entry["shape"])
+    return header, arrays
+
+def encode_world(world, generator_version=""):
+    """Serialize a world from world_generator.generate_world to bytes."""
+    header = {
+        "width": world["width"],
+        "height": world["height"],
+        "seed": world["seed"],
+        "generator_version": generator_version,
+        "terrain_names": {str(terrain_id): name for terrain_id, name in TERRAIN_NAMES.items()},
+        # JSON has no infinity; impassable terrain is null
+        "movement_costs": {str(terrain_id): (cost if cost != float("inf") else None)
+                           for terrain_id, cost in TERRAIN_MOVEMENT_COSTS.items()},
+        "resource_types": RESOURCE_TYPES,
+        "landmark_types": LANDMARK_TYPES,
+        "civ_capitals": {str(civ_id): list(coords) for civ_id, coords in world["civ_capitals"].items()},
+    }
+    arrays = {name: np.asarray(world[name], dtype=dtype) for name, dtype in WORLD_ARRAYS.items()}
+    return pack_arrays(WORLD_MAGIC, WORLD_FORMAT_VERSION, header, arrays)
+
+def write_world(path, world, generator_version=""):
+    """Write a world file."""
+    with open(path, "wb") as f:
+        f.write(encode_world(world, generator_version))
+
+def decode_world(data):
+    """Parse world bytes into (header dict, {name: numpy array})."""
+    return unpack_arrays(data, WORLD_MAGIC, WORLD_FORMAT_VERSION)
+
+def read_world(path):
+    """Read a world file into (header dict, {name: numpy array})."""
+    with open(path, "rb") as f:
+        return decode_world(f.read())
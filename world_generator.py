@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Offline port of godot_project/scripts/world_generator.gd.
+
+Noise sampling and the terrain classification rules run over the whole grid
+as arrays. Everything that draws from the seeded RandomNumberGenerator then
+runs in one scan in the runtime's order (y outer, x inner), so jungle, chasm
+and lava rolls and resource amounts come out of the same stream positions as
+in Godot. Civs, landmarks and rivers are ported call for call.
+
+The runtime shuffles with Godot's global, unseeded RNG (Array.shuffle), so no
+two runs agree there; the bake draws those shuffles from a second stream
+seeded with world_seed + SHUFFLE_SEED_OFFSET to keep baked worlds reproducible.
+
+These tables mirror world_generator.gd and must be kept in sync with it.
+"""
+from collections import deque
+import numpy as np
+
+from fast_noise import FRACTAL_RIDGED, TYPE_PERLIN, TYPE_SIMPLEX, FastNoiseLite
+from godot_rng import RandomPCG
+
+# TERRAIN_MOVEMENT_COSTS in world_generator.gd
+TERRAIN_MOVEMENT_COSTS = {
+    0: 100.0, 1: 2.0, 2: 1.0, 3: 1.5, 4: 2.0, 5: 3.0, 6: 4.0, 7: 200.0,
+    8: float("inf"), 9: float("inf"), 10: 5.0, 11: float("inf"), 12: 100.0,
+    13: 1.2, 14: 1.1, 15: 4.5,
+}
+
+# RESOURCE_SPAWNING_RULES in world_generator.gd; key order is draw order
+RESOURCE_SPAWNING_RULES = {
+    2: {
+        "food": {"chance": 0.25, "min_amount": 20, "max_amount": 60},
+        "wood": {"chance": 0.05, "min_amount": 5, "max_amount": 15},
+        "water": {"chance": 0.15, "min_amount": 10, "max_amount": 40},
+    },
+    3: {
+        "wood": {"chance": 0.35, "min_amount": 40, "max_amount": 120},
+        "food": {"chance": 0.1, "min_amount": 15, "max_amount": 40},
+    },
+    4: {
+        "stone": {"chance": 0.3, "min_amount": 30, "max_amount": 80},
+        "metal_ore": {"chance": 0.05, "min_amount": 3, "max_amount": 10},
+    },
+    5: {
+        "stone": {"chance": 0.4, "min_amount": 60, "max_amount": 150},
+        "metal_ore": {"chance": 0.15, "min_amount": 5, "max_amount": 20},
+    },
+    6: {
+        "stone": {"chance": 0.35, "min_amount": 80, "max_amount": 200},
+        "metal_ore": {"chance": 0.25, "min_amount": 10, "max_amount": 40},
+    },
+    0: {
+        "water": {"chance": 0.4, "min_amount": 200, "max_amount": 400},
+    },
+    1: {
+        "water": {"chance": 0.05, "min_amount": 5, "max_amount": 20},
+    },
+}
+
+# Every resource type, in order of first appearance in the rules
+RESOURCE_TYPES = list(dict.fromkeys(name for rules in RESOURCE_SPAWNING_RULES.values() for name in rules))
+
+# Sand, Grass, Forest, Hills, Stone, Mountains, Snow Peak, Jungle, Dry Grassland, Rocky Peak
+LAND_TERRAINS = [1, 2, 3, 4, 5, 6, 10, 13, 14, 15]
+
+# Landmark ids placed on the landmarks TileMap
+LANDMARK_TYPES = {"castle": 0, "village": 1, "ruins": 2}
+
+MIN_DIST_BETWEEN_CIVS = 15
+MAX_RIVERS = 10
+MAX_RIVER_LENGTH = 100
+
+SHUFFLE_SEED_OFFSET = 2
+
+# Tiles whose classification depends on an RNG roll
+ROLL_NONE, ROLL_JUNGLE, ROLL_CHASM, ROLL_LAVA = 0, 1, 2, 3
+
+def make_noises(world_seed):
+    """The four FastNoiseLite instances generate_terrain samples, configured as in _init."""
+    return {
+        "terrain": FastNoiseLite(seed=world_seed, fractal_octaves=4, frequency=0.015),
+        "continental": FastNoiseLite(seed=world_seed, noise_type=TYPE_PERLIN, fractal_octaves=5),
+        "latitude": FastNoiseLite(seed=world_seed + 3, noise_type=TYPE_SIMPLEX, frequency=0.0005),
+        "jungle": FastNoiseLite(seed=world_seed + 4, frequency=0.01, fractal_octaves=2,
+                                fractal_type=FRACTAL_RIDGED),
+    }
+
+def get_hex_neighbors(coords):
+    """The six neighbors of an offset hex coordinate, in world_generator.gd's order."""
+    x, y = coords
+    if y % 2 != 0:
+        dirs = [(1, 0), (0, -1), (1, -1), (0, 1), (1, 1), (-1, 0)]
+    else:
+        dirs = [(1, 0), (-1, -1), (0, -1), (-1, 1), (0, 1), (-1, 0)]
+    return [(x + dx, y + dy) for dx, dy in dirs]
+
+def classify_terrain(final, temp, terrain_val, jungle_val):
+    """Vectorized terrain rules, assuming every RNG roll fails; returns (terrain, roll kind)."""
+    water = np.where(temp < 0.2, 11, np.where(temp < 0.4, 12, 0))
+    deep_water = np.where(temp < 0.2, 11, np.where(temp < 0.4, 12, 7))
+    cold = temp < 0.4
+    grass = np.where(cold, 10, np.where((temp > 0.4) & (temp < 0.7) & (terrain_val < -0.1), 14, 2))
+    mountains = np.where(cold, 10, 6)
+    peaks = np.where(final >= 0.8, np.where(temp < 0.5, 10, 15), mountains)
+
+    bands = [final < -0.25, final < -0.2, final < -0.15, final < 0.2, final < 0.4,
+             final < 0.6, final < 0.61, final < 0.7, final < 0.72, final < 0.85]
+    terrain = np.select(bands, [deep_water, water, np.where(cold, 10, 1), grass, np.where(cold, 5, 3),
+                                4, 5, 5, mountains, peaks], 10)
+    # Failed jungle rolls fall through to Grass (too hot for Dry Grassland), failed chasm rolls to Stone,
+    # failed lava rolls to the mountain rules
+    jungle = bands[3] & ~bands[2] & ~cold & (temp > 0.8) & (jungle_val > 0.4)
+    chasm = bands[6] & ~bands[5]
+    lava = bands[8] & ~bands[7]
+    rolls = np.select([jungle, chasm, lava], [ROLL_JUNGLE, ROLL_CHASM, ROLL_LAVA], ROLL_NONE)
+    return terrain.astype(np.uint8), rolls.astype(np.uint8)
+
+def generate_terrain(width, height, world_seed):
+    """Port of generate_terrain(); returns (world arrays dict, land_tiles in scan order)."""
+    noises = make_noises(world_seed)
+    ys, xs = np.mgrid[0:height, 0:width]
+    # get_noise_2d returns float32; everything after it is GDScript float (double) math
+    terrain_val = noises["terrain"].get_noise_2d(xs, ys).astype(np.float64)
+    continental_val = noises["continental"].get_noise_2d(xs, ys).astype(np.float64)
+    latitude_val = noises["latitude"].get_noise_2d(xs, ys).astype(np.float64)
+    jungle_val = noises["jungle"].get_noise_2d(xs, ys).astype(np.float64)
+
+    normalized_y = ys / (height - 1)
+    latitude_factor = 1.0 - np.abs(normalized_y - 0.5) * 2.0
+    temp = np.clip(latitude_factor + latitude_val * 0.1, 0.0, 1.0)
+    continental_val += (temp - 0.5) * 0.5
+    blended = terrain_val + continental_val * 2.5 - 0.3
+    final = blended + (1.0 - temp) * 0.2
+
+    terrain, rolls = classify_terrain(final, temp, terrain_val, jungle_val)
+    lava_chance = 0.005 * (1.0 + temp)
+
+    # Per-terrain rules as (resource index, chance, min, max), in draw order
+    rules = {terrain_id: [(RESOURCE_TYPES.index(name), rule["chance"], rule["min_amount"], rule["max_amount"])
+                          for name, rule in terrain_rules.items()]
+             for terrain_id, terrain_rules in RESOURCE_SPAWNING_RULES.items()}
+    resources = np.zeros((len(RESOURCE_TYPES), height * width), dtype=np.uint16)
+
+    # One pass in scan order over just the tiles that draw from the RNG
+    rng = RandomPCG(world_seed + 1)
+    flat_terrain = terrain.reshape(-1)
+    flat_rolls = rolls.reshape(-1).tolist()
+    flat_lava_chance = lava_chance.reshape(-1).tolist()
+    for index in np.flatnonzero(np.isin(terrain, list(rules)) | (rolls != ROLL_NONE)).tolist():
+        terrain_id = int(flat_terrain[index])
+        roll = flat_rolls[index]
+        if roll == ROLL_JUNGLE:
+            if rng.randf() < 0.1:
+                terrain_id = 13
+        elif roll == ROLL_CHASM:
+            if rng.randf() < 0.2:
+                terrain_id = 8
+        elif roll == ROLL_LAVA:
+            if rng.randf() < flat_lava_chance[index]:
+                terrain_id = 9
+        flat_terrain[index] = terrain_id
+
+        for resource, chance, min_amount, max_amount in rules.get(terrain_id, ()):
+            if rng.randf() < chance:
+                resources[resource, index] = rng.randi_range(min_amount, max_amount)
+
+    costs = np.array([TERRAIN_MOVEMENT_COSTS[terrain_id] for terrain_id in range(len(TERRAIN_MOVEMENT_COSTS))])
+    world = {
+        "width": width,
+        "height": height,
+        "seed": world_seed,
+        "terrain": terrain,
+        "elevation": blended,
+        "movement_cost": costs[terrain],
+        "resources": resources.reshape(len(RESOURCE_TYPES), height, width),
+        "civ": np.full((height, width), -1, dtype=np.int8),
+        "river": np.zeros((height, width), dtype=bool),
+        "landmark": np.full((height, width), -1, dtype=np.int8),
+        "civ_capitals": {},
+    }
+    land_ys, land_xs = np.nonzero(np.isin(terrain, LAND_TERRAINS))
+    land_tiles = list(zip(land_xs.tolist(), land_ys.tolist()))
+    return world, land_tiles
+
+def _in_bounds(world, coords):
+    """tile_data.has(coords)."""
+    return 0 <= coords[0] < world["width"] and 0 <= coords[1] < world["height"]
+
+def generate_civs(world, land_tiles, shuffle_rng):
+    """Port of generate_civs(); fills world["civ"] and returns {civ_id: territory coords}."""
+    rng = RandomPCG(world["seed"])
+    terrain, civ = world["terrain"], world["civ"]
+    territories = {}
+    capitals = world["civ_capitals"]
+
+    num_civs = rng.randi_range(4, 6)
+    shuffle_rng.shuffle(land_tiles)
+
+    for start in land_tiles:
+        if len(capitals) >= num_civs:
+            break
+        if civ[start[1], start[0]] != -1:
+            continue
+        if any((start[0] - x) ** 2 + (start[1] - y) ** 2 < MIN_DIST_BETWEEN_CIVS ** 2 for x, y in capitals.values()):
+            continue
+
+        civ_id = len(capitals)
+        capitals[civ_id] = start
+        territory = territories[civ_id] = []
+        civ_size = rng.randi_range(5, 10)
+        queue = deque([start])
+        visited = {start}
+        while queue and len(territory) < civ_size:
+            x, y = current = queue.popleft()
+            if _in_bounds(world, current) and civ[y, x] == -1 and terrain[y, x] > 1:
+                civ[y, x] = civ_id
+                territory.append(current)
+                neighbors = get_hex_neighbors(current)
+                shuffle_rng.shuffle(neighbors)
+                for neighbor in neighbors:
+                    if neighbor not in visited:
+                        visited.add(neighbor)
+                        queue.append(neighbor)
+    return territories
+
+def generate_landmarks(world, land_tiles, territories, shuffle_rng):
+    """Port of generate_landmarks(); fills world["landmark"] with LANDMARK_TYPES ids."""
+    rng = RandomPCG(world["seed"])
+    landmark = world["landmark"]
+    occupied = set()
+
+    for territory in territories.values():
+        if not territory:
+            continue
+        capital = territory[0]
+        landmark[capital[1], capital[0]] = LANDMARK_TYPES["castle"]
+        occupied.add(capital)
+
+        num_villages = rng.randi_range(0, int(len(territory) / 3.0))
+        for _ in range(num_villages):
+            coords = territory[rng.randi_range(0, len(territory) - 1)]
+            if coords not in occupied:
+                landmark[coords[1], coords[0]] = LANDMARK_TYPES["village"]
+                occupied.add(coords)
+
+    num_ruins = rng.randi_range(10, 25)
+    civ = world["civ"]
+    potential_ruins = [(x, y) for x, y in land_tiles if civ[y, x] == -1]
+    shuffle_rng.shuffle(potential_ruins)
+    for x, y in potential_ruins[:num_ruins]:
+        if (x, y) not in occupied:
+            landmark[y, x] = LANDMARK_TYPES["ruins"]
+
+def generate_rivers(world, land_tiles, shuffle_rng):
+    """Port of generate_rivers(); fills world["river"] by steepest descent from mountain sources."""
+    terrain, elevation, river = world["terrain"], world["elevation"], world["river"]
+    sources = [(x, y) for x, y in land_tiles if terrain[y, x] in (6, 10)]
+    num_rivers = min(MAX_RIVERS, len(sources))
+    shuffle_rng.shuffle(sources)
+
+    for current in sources[:num_rivers]:
+        if terrain[current[1], current[0]] < 2 or river[current[1], current[0]]:
+            continue
+
+        path = [current]
+        while len(path) < MAX_RIVER_LENGTH:
+            lowest = elevation[current[1], current[0]]
+            next_coords = None
+            for neighbor in get_hex_neighbors(current):
+                if _in_bounds(world, neighbor) and elevation[neighbor[1], neighbor[0]] < lowest and neighbor not in path:
+                    lowest = elevation[neighbor[1], neighbor[0]]
+                    next_coords = neighbor
+
+            river[current[1], current[0]] = True
+            # Rivers end on reaching Water, or where nothing lies lower
+            if next_coords is None or terrain[next_coords[1], next_coords[0]] == 0:
+                break
+            path.append(next_coords)
+            current = next_coords
+
+def generate_world(width, height, world_seed):
+    """Run the generator stages in world_map.gd's order and return the world's arrays."""
+    world, land_tiles = generate_terrain(width, height, world_seed)
+    shuffle_rng = RandomPCG(world_seed + SHUFFLE_SEED_OFFSET)
+    territories = generate_civs(world, land_tiles, shuffle_rng)
+    generate_landmarks(world, land_tiles, territories, shuffle_rng)
+    generate_rivers(world, land_tiles, shuffle_rng)
+    return world